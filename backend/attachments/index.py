@@ -0,0 +1,445 @@
+import base64
+import json
+import os
+import secrets
+import sys
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import get_pool
+from shared.http import Router, json_response, error_response
+from shared.auth import authenticate
+from shared.blobs import THUMBNAIL_SIZES, is_sha256, has_blob, fetch_readable_blob
+from shared.blobs import write_chunk, upload_size, discard_upload, commit_upload, read_range, parse_range, thumbnail
+
+MAX_ATTACHMENT_BYTES = int(os.environ.get('MAX_ATTACHMENT_BYTES', str(1024 * 1024 * 1024)))
+CHUNK_SIZE = 4 * 1024 * 1024
+DOWNLOAD_MAX_BYTES = 4 * 1024 * 1024
+MAX_FILE_NAME_LENGTH = 255
+BLOB_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+INLINE_MIME_TYPES = frozenset({
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+    'video/mp4', 'video/webm', 'audio/mpeg', 'audio/ogg', 'audio/mp4', 'audio/webm'
+})
+
+router = Router('OfChat Attachments API', allow_headers='Content-Type, Range, If-None-Match, X-Auth-Token')
+
+def handler(event: dict, context) -> dict:
+    '''API для загрузки вложений по частям, дедупликации по SHA-256 и отдачи файлов с поддержкой Range'''
+    return router(event, context)
+
+def request_headers(event: dict) -> dict:
+    return {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+
+def binary_response(status: int, data: bytes, headers: dict) -> dict:
+    return {
+        'statusCode': status,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'Content-Range, ETag',
+            'X-Content-Type-Options': 'nosniff',
+            **headers
+        },
+        'body': base64.b64encode(data).decode(),
+        'isBase64Encoded': True
+    }
+
+def not_modified(event: dict, etag: str):
+    if request_headers(event).get('if-none-match') == etag:
+        return {'statusCode': 304, 'headers': {'ETag': etag, 'Access-Control-Allow-Origin': '*'}, 'body': '', 'isBase64Encoded': False}
+    return None
+
+def restart_upload(cursor, upload_id: str) -> dict:
+    discard_upload(upload_id)
+    cursor.execute(
+        "UPDATE attachment_uploads SET received = 0, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+        (upload_id,)
+    )
+    return json_response(409, {'error': 'Uploaded bytes were lost, start again from offset 0', 'received': 0})
+
+@router.route('POST', 'init')
+def init_upload(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        body = json.loads(event.get('body', '{}'))
+        user_id = claims['user_id']
+        size = body.get('size')
+        mime_type = (body.get('mime_type') or 'application/octet-stream').strip()[:100]
+        file_name = (body.get('file_name') or '').strip()[:MAX_FILE_NAME_LENGTH] or None
+        sha256 = (body.get('sha256') or '').lower() or None
+        
+        if not isinstance(size, int) or size < 1:
+            return error_response(400, 'size must be a positive integer')
+        
+        if size > MAX_ATTACHMENT_BYTES:
+            return error_response(413, f'Attachments are limited to {MAX_ATTACHMENT_BYTES} bytes')
+        
+        if sha256 is not None and not is_sha256(sha256):
+            return error_response(400, 'sha256 must be 64 hex characters')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        if sha256 is not None and has_blob(sha256):
+            blob = fetch_readable_blob(cursor, sha256, user_id)
+            if blob and blob['size'] == size:
+                cursor.close()
+                get_pool(dsn).putconn(conn)
+                return json_response(200, {
+                    'success': True,
+                    'complete': True,
+                    'attachment': {'sha256': sha256, 'size': blob['size'], 'mime_type': blob['mime_type']}
+                })
+        
+        upload_id = secrets.token_hex(16)
+        cursor.execute(
+            """
+            INSERT INTO attachment_uploads (id, user_id, size, mime_type, file_name, expected_sha256)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (upload_id, user_id, size, mime_type, file_name, sha256)
+        )
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(201, {
+            'success': True,
+            'complete': False,
+            'upload_id': upload_id,
+            'chunk_size': CHUNK_SIZE,
+            'received': 0
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'upload')
+def get_upload(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        upload_id = (event.get('queryStringParameters', {}) or {}).get('upload_id', '')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            "SELECT id, size, received, mime_type, file_name FROM attachment_uploads WHERE id = %s AND user_id = %s",
+            (upload_id, claims['user_id'])
+        )
+        
+        upload = cursor.fetchone()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        if not upload:
+            return error_response(404, 'Upload not found')
+        
+        return json_response(200, {'success': True, 'upload': dict(upload), 'chunk_size': CHUNK_SIZE})
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('PUT', 'chunk')
+def upload_chunk(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        upload_id = query_params.get('upload_id', '')
+        body = event.get('body') or ''
+        data = base64.b64decode(body) if event.get('isBase64Encoded') else body.encode()
+        
+        try:
+            offset = int(query_params.get('offset', ''))
+        except ValueError:
+            return error_response(400, 'offset must be an integer')
+        
+        if not data:
+            return error_response(400, 'Chunk body is empty')
+        
+        if len(data) > CHUNK_SIZE:
+            return error_response(413, f'Chunks are limited to {CHUNK_SIZE} bytes')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            "SELECT size, received FROM attachment_uploads WHERE id = %s AND user_id = %s FOR UPDATE",
+            (upload_id, claims['user_id'])
+        )
+        
+        upload = cursor.fetchone()
+        
+        if not upload or offset != upload['received'] or offset + len(data) > upload['size']:
+            conn.rollback()
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            if not upload:
+                return error_response(404, 'Upload not found')
+            if offset + len(data) > upload['size']:
+                return error_response(400, 'Chunk goes past the declared size')
+            return json_response(409, {'error': 'Offset does not match received bytes', 'received': upload['received']})
+        
+        if upload_size(upload_id) != offset:
+            response = restart_upload(cursor, upload_id)
+            conn.commit()
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            return response
+        
+        write_chunk(upload_id, offset, data)
+        cursor.execute(
+            "UPDATE attachment_uploads SET received = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (offset + len(data), upload_id)
+        )
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {'success': True, 'received': offset + len(data), 'size': upload['size']})
+        
+    except Exception as e:
+        if conn:
+            conn.rollback()
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('POST', 'complete')
+def complete_upload(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        body = json.loads(event.get('body', '{}'))
+        upload_id = body.get('upload_id', '')
+        user_id = claims['user_id']
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            """
+            SELECT size, received, mime_type, file_name, expected_sha256
+            FROM attachment_uploads
+            WHERE id = %s AND user_id = %s
+            FOR UPDATE
+            """,
+            (upload_id, user_id)
+        )
+        
+        upload = cursor.fetchone()
+        
+        if not upload or upload['received'] != upload['size']:
+            conn.rollback()
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            if not upload:
+                return error_response(404, 'Upload not found')
+            return json_response(409, {'error': 'Upload is incomplete', 'received': upload['received']})
+        
+        if upload_size(upload_id) != upload['size']:
+            response = restart_upload(cursor, upload_id)
+            conn.commit()
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            return response
+        
+        try:
+            sha256, deduplicated = commit_upload(upload_id, upload['expected_sha256'])
+        except ValueError:
+            cursor.execute("DELETE FROM attachment_uploads WHERE id = %s", (upload_id,))
+            conn.commit()
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            return error_response(422, 'Uploaded bytes do not match sha256')
+        
+        cursor.execute(
+            """
+            WITH blob AS (
+                INSERT INTO attachment_blobs (sha256, size, mime_type)
+                VALUES (%(sha256)s, %(size)s, %(mime_type)s)
+                ON CONFLICT (sha256) DO UPDATE SET sha256 = EXCLUDED.sha256
+                RETURNING sha256, size, mime_type
+            ),
+            grant_row AS (
+                INSERT INTO attachment_grants (sha256, user_id, file_name)
+                SELECT sha256, %(user_id)s, %(file_name)s FROM blob
+                ON CONFLICT (sha256, user_id) DO UPDATE SET file_name = COALESCE(EXCLUDED.file_name, attachment_grants.file_name)
+            ),
+            finished AS (
+                DELETE FROM attachment_uploads WHERE id = %(upload_id)s
+            )
+            SELECT sha256, size, mime_type FROM blob
+            """,
+            {
+                'sha256': sha256,
+                'size': upload['size'],
+                'mime_type': upload['mime_type'],
+                'user_id': user_id,
+                'file_name': upload['file_name'],
+                'upload_id': upload_id
+            }
+        )
+        
+        blob = dict(cursor.fetchone())
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(201, {
+            'success': True,
+            'deduplicated': deduplicated,
+            'attachment': {**blob, 'file_name': upload['file_name']}
+        })
+        
+    except Exception as e:
+        if conn:
+            conn.rollback()
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'download')
+def download(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        sha256 = (event.get('queryStringParameters', {}) or {}).get('sha256', '').lower()
+        
+        if not is_sha256(sha256):
+            return error_response(400, 'sha256 must be 64 hex characters')
+        
+        etag = f'"{sha256}"'
+        cached = not_modified(event, etag)
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        blob = fetch_readable_blob(cursor, sha256, claims['user_id'])
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        if not blob:
+            return error_response(404, 'Attachment not found')
+        
+        if cached:
+            return cached
+        
+        size = blob['size']
+        requested = parse_range(request_headers(event).get('range', ''), size, DOWNLOAD_MAX_BYTES)
+        
+        if requested is False:
+            return {
+                'statusCode': 416,
+                'headers': {'Content-Range': f'bytes */{size}', 'Access-Control-Allow-Origin': '*'},
+                'body': '',
+                'isBase64Encoded': False
+            }
+        
+        if requested is None and size > DOWNLOAD_MAX_BYTES:
+            requested = (0, DOWNLOAD_MAX_BYTES - 1)
+        
+        headers = {
+            'Content-Type': blob['mime_type'],
+            'Accept-Ranges': 'bytes',
+            'ETag': etag,
+            'Cache-Control': BLOB_CACHE_CONTROL
+        }
+        
+        if blob['mime_type'] not in INLINE_MIME_TYPES:
+            headers['Content-Disposition'] = 'attachment'
+        
+        if requested is None:
+            return binary_response(200, read_range(sha256, 0, size), headers)
+        
+        start, end = requested
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return binary_response(206, read_range(sha256, start, end - start + 1), headers)
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'thumbnail')
+def get_thumbnail(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        sha256 = query_params.get('sha256', '').lower()
+        
+        try:
+            size = int(query_params.get('size', THUMBNAIL_SIZES[1]))
+        except ValueError:
+            size = None
+        
+        if not is_sha256(sha256):
+            return error_response(400, 'sha256 must be 64 hex characters')
+        
+        if size not in THUMBNAIL_SIZES:
+            return error_response(400, f'size must be one of: {", ".join(str(value) for value in THUMBNAIL_SIZES)}')
+        
+        etag = f'"{sha256}-{size}"'
+        cached = not_modified(event, etag)
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        blob = fetch_readable_blob(cursor, sha256, claims['user_id'])
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        if not blob:
+            return error_response(404, 'Attachment not found')
+        
+        if not blob['mime_type'].startswith('image/'):
+            return error_response(415, 'Thumbnails are only available for images')
+        
+        if cached:
+            return cached
+        
+        with open(thumbnail(sha256, size), 'rb') as source:
+            data = source.read()
+        
+        return binary_response(200, data, {'Content-Type': 'image/jpeg', 'ETag': etag, 'Cache-Control': BLOB_CACHE_CONTROL})
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
@@ -1,52 +1,29 @@
 import json
 import os
+import sys
 import hashlib
 import secrets
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import get_pool
+from shared.http import Router, json_response, error_response
+from shared.auth import issue_token, authenticate, revoke_token
+from shared.phones import normalize_phone
+from shared.ratelimit import LOGIN_PER_IDENTIFIER, LOGIN_PER_IP, check_rate_limits, client_ip
+from shared.presence import online_column, record_heartbeat, flush_heartbeats
+from shared.profiles import PROFILE_COLUMNS, load_profiles, invalidate_profiles, profile_cache_stats
+
+PROFILES_MAX_IDS = 300
+PROFILE_EDITABLE_FIELDS = ('username', 'avatar_url', 'bio')
+USERNAME_MAX_LENGTH = 50
+
+router = Router('OfChat Auth API', allow_headers='Content-Type, X-User-Id, X-Auth-Token')
+
 def handler(event: dict, context) -> dict:
     '''API для регистрации и авторизации пользователей OfChat'''
-    
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    dsn = os.environ.get('DATABASE_URL')
-    if not dsn:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Database connection not configured'}),
-            'isBase64Encoded': False
-        }
-    
-    query_params = event.get('queryStringParameters', {}) or {}
-    action = query_params.get('action', '')
-    
-    if method == 'POST' and action == 'register':
-        return register_user(event, dsn)
-    elif method == 'POST' and action == 'login':
-        return login_user(event, dsn)
-    elif method == 'GET' and action == 'profile':
-        return get_profile(event, dsn)
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'message': 'OfChat Auth API', 'endpoints': ['/register', '/login', '/profile']}),
-        'isBase64Encoded': False
-    }
+    return router(event, context)
 
 def generate_unique_id() -> str:
     return secrets.token_hex(5).upper()
@@ -54,31 +31,23 @@ def generate_unique_id() -> str:
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
+@router.route('POST', 'register')
 def register_user(event: dict, dsn: str) -> dict:
+    conn = None
     try:
         body = json.loads(event.get('body', '{}'))
         username = body.get('username', '').strip()
         email = body.get('email', '').strip()
-        phone = body.get('phone', '').strip()
+        phone = normalize_phone(body.get('phone', ''))
         password = body.get('password', '').strip()
         
         if not username or not password:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Username and password are required'}),
-                'isBase64Encoded': False
-            }
+            return error_response(400, 'Username and password are required')
         
         if not email and not phone:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Email or phone is required'}),
-                'isBase64Encoded': False
-            }
-        
-        conn = psycopg2.connect(dsn)
+            return error_response(400, 'Email or phone is required')
+        
+        conn = get_pool(dsn).getconn()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         unique_id = generate_unique_id()
@@ -90,31 +59,29 @@ def register_user(event: dict, dsn: str) -> dict:
         )
         
         user = dict(cursor.fetchone())
+        session = issue_token(user['id'])
         conn.commit()
         
         cursor.close()
-        conn.close()
-        
-        return {
-            'statusCode': 201,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'user': {
-                    'id': user['id'],
-                    'unique_id': user['unique_id'],
-                    'username': user['username'],
-                    'email': user['email'],
-                    'phone': user['phone']
-                }
-            }, default=str),
-            'isBase64Encoded': False
-        }
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(201, {
+            'success': True,
+            'user': {
+                'id': user['id'],
+                'unique_id': user['unique_id'],
+                'username': user['username'],
+                'email': user['email'],
+                'phone': user['phone']
+            },
+            'token': session['token'],
+            'token_expires_at': session['expires_at']
+        })
         
     except psycopg2.IntegrityError as e:
         if conn:
             conn.rollback()
-            conn.close()
+            get_pool(dsn).putconn(conn)
         
         error_msg = str(e)
         if 'username' in error_msg:
@@ -126,134 +93,214 @@ def register_user(event: dict, dsn: str) -> dict:
         else:
             msg = 'Registration failed'
         
-        return {
-            'statusCode': 409,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': msg}),
-            'isBase64Encoded': False
-        }
+        return error_response(409, msg)
         
     except Exception as e:
         if conn:
-            conn.close()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
 
+@router.route('POST', 'login')
 def login_user(event: dict, dsn: str) -> dict:
+    conn = None
     try:
         body = json.loads(event.get('body', '{}'))
         identifier = body.get('identifier', '').strip()
         password = body.get('password', '').strip()
         
         if not identifier or not password:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Identifier and password are required'}),
-                'isBase64Encoded': False
-            }
-        
-        conn = psycopg2.connect(dsn)
+            return error_response(400, 'Identifier and password are required')
+        
+        conn = get_pool(dsn).getconn()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
+        allowed, retry_after = check_rate_limits(conn, (LOGIN_PER_IP, client_ip(event)), (LOGIN_PER_IDENTIFIER, identifier.lower()))
+        if not allowed:
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            return error_response(429, 'Too many login attempts. Try again later', {'Retry-After': str(retry_after)})
+        
         password_hash = hash_password(password)
         
         cursor.execute(
             "SELECT id, unique_id, username, email, phone, avatar_url, bio FROM users WHERE (username = %s OR email = %s OR phone = %s) AND password_hash = %s",
-            (identifier, identifier, identifier, password_hash)
+            (identifier, identifier, normalize_phone(identifier) or None, password_hash)
         )
         
         user = cursor.fetchone()
         
         if not user:
             cursor.close()
-            conn.close()
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Invalid credentials'}),
-                'isBase64Encoded': False
-            }
+            get_pool(dsn).putconn(conn)
+            return error_response(401, 'Invalid credentials')
         
-        cursor.execute(
-            "UPDATE users SET is_online = true, last_seen = CURRENT_TIMESTAMP WHERE id = %s",
-            (user['id'],)
-        )
+        session = issue_token(user['id'])
+        
+        record_heartbeat(user['id'])
+        flush_heartbeats(cursor)
         conn.commit()
         
         cursor.close()
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'user': dict(user)
-            }),
-            'isBase64Encoded': False
-        }
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {
+            'success': True,
+            'user': dict(user),
+            'token': session['token'],
+            'token_expires_at': session['expires_at']
+        })
         
     except Exception as e:
         if conn:
-            conn.close()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
 
+@router.route('GET', 'profile')
 def get_profile(event: dict, dsn: str) -> dict:
+    conn = None
     try:
-        user_id = event.get('queryStringParameters', {}).get('user_id')
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        user_id = (event.get('queryStringParameters') or {}).get('user_id') or claims['user_id']
+        
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return error_response(400, 'user_id must be an integer')
         
-        if not user_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'User ID is required'}),
-                'isBase64Encoded': False
-            }
+        columns = f"{PROFILE_COLUMNS}, email, phone" if user_id == claims['user_id'] else PROFILE_COLUMNS
         
-        conn = psycopg2.connect(dsn)
+        conn = get_pool(dsn).getconn()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         cursor.execute(
-            "SELECT id, unique_id, username, email, phone, avatar_url, bio, is_online, last_seen FROM users WHERE id = %s",
+            f"SELECT {columns}, {online_column()}, last_seen FROM users WHERE id = %s",
             (user_id,)
         )
         
         user = cursor.fetchone()
         
         cursor.close()
-        conn.close()
+        get_pool(dsn).putconn(conn)
+        
+        if not user:
+            return error_response(404, 'User not found')
+        
+        return json_response(200, {'user': dict(user)})
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'profiles')
+def get_profiles(event: dict, dsn: str) -> dict:
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        
+        try:
+            ids = list(dict.fromkeys(int(value) for value in query_params.get('ids', '').split(',') if value.strip()))
+        except ValueError:
+            return error_response(400, 'ids must be a comma-separated list of integers')
+        
+        if not ids:
+            return error_response(400, 'ids are required')
+        
+        if len(ids) > PROFILES_MAX_IDS:
+            return error_response(400, f'At most {PROFILES_MAX_IDS} ids are allowed')
+        
+        profiles = load_profiles(dsn, ids)
+        
+        return json_response(200, {
+            'success': True,
+            'users': [profiles[user_id] for user_id in ids if user_id in profiles],
+            'missing': [user_id for user_id in ids if user_id not in profiles],
+            'cache': profile_cache_stats()
+        })
+        
+    except Exception as e:
+        return error_response(500, str(e))
+
+@router.route('POST', 'update_profile')
+def update_profile(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        body = json.loads(event.get('body', '{}'))
+        changes = {field: body[field] for field in PROFILE_EDITABLE_FIELDS if field in body}
+        
+        if not changes:
+            return error_response(400, f'Nothing to update. Allowed fields: {", ".join(PROFILE_EDITABLE_FIELDS)}')
+        
+        if 'username' in changes:
+            changes['username'] = (changes['username'] or '').strip()
+            if not changes['username'] or len(changes['username']) > USERNAME_MAX_LENGTH:
+                return error_response(400, f'Username must be 1 to {USERNAME_MAX_LENGTH} characters')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            f"UPDATE users SET {', '.join(f'{field} = %({field})s' for field in changes)} WHERE id = %(user_id)s RETURNING {PROFILE_COLUMNS}",
+            {**changes, 'user_id': claims['user_id']}
+        )
+        
+        user = cursor.fetchone()
+        conn.commit()
+        invalidate_profiles(claims['user_id'])
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
         
         if not user:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'User not found'}),
-                'isBase64Encoded': False
-            }
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'user': dict(user)}, default=str),
-            'isBase64Encoded': False
-        }
+            return error_response(404, 'User not found')
+        
+        return json_response(200, {'success': True, 'user': dict(user)})
+        
+    except psycopg2.IntegrityError:
+        if conn:
+            conn.rollback()
+            get_pool(dsn).putconn(conn)
+        return error_response(409, 'Username already exists')
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('POST', 'logout')
+def logout_user(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        revoke_token(cursor, claims)
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {'success': True})
         
     except Exception as e:
         if conn:
-            conn.close()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
\ No newline at end of file
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
\ No newline at end of file
@@ -0,0 +1,86 @@
+import argparse
+import os
+import secrets
+import sys
+
+from bench.harness import (Client, Recorder, compare_reports, format_table, install_pool, load_report,
+                           make_report, run_workload, save_report)
+from bench.workloads import WORKLOADS, Fixture
+from shared import telemetry
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Replay handler workloads in-process against a local Postgres')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='Postgres DSN, defaults to DATABASE_URL')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS), help='comma-separated workloads: ' + ', '.join(WORKLOADS))
+    parser.add_argument('--requests', type=int, default=500, help='measured requests per workload')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent in-process callers')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests before each workload')
+    parser.add_argument('--users', type=int, default=200, help='fixture users registered before the run')
+    parser.add_argument('--contacts', type=int, default=20, help='contacts added per fixture user')
+    parser.add_argument('--run-id', default=secrets.token_hex(3), help='hex tag that keeps fixture rows unique between runs')
+    parser.add_argument('--log', action='store_true', help='keep the per-request JSON log lines on stdout')
+    parser.add_argument('--save', help='write the report to this JSON file')
+    parser.add_argument('--compare', help='compare against a saved baseline and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 growth against the baseline')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.dsn:
+        print('DATABASE_URL or --dsn is required', file=sys.stderr)
+        return 2
+    try:
+        int(args.run_id, 16)
+    except ValueError:
+        print('--run-id must be hexadecimal', file=sys.stderr)
+        return 2
+
+    os.environ['DATABASE_URL'] = args.dsn
+    os.environ.setdefault('AUTH_TOKEN_SECRET', secrets.token_hex(32))
+    telemetry.REQUEST_LOG_ENABLED = args.log
+
+    names = [name.strip() for name in args.workloads.split(',') if name.strip()]
+    unknown = [name for name in names if name not in WORKLOADS]
+    if unknown:
+        print(f'Unknown workloads: {", ".join(unknown)}', file=sys.stderr)
+        return 2
+
+    workloads = [WORKLOADS[name]() for name in names]
+    pool = install_pool(args.dsn, max(args.concurrency, 1))
+    client = Client(sorted({'auth', 'users'} | {function for workload in workloads for function in workload.functions}))
+    fixture = Fixture(client, args.run_id, args.users, args.contacts)
+    recorder = Recorder()
+
+    for workload in workloads:
+        print(f'== {workload.name}', file=sys.stderr)
+        workload.prepare(client, fixture)
+        run_workload(client, recorder, workload, args.requests, args.concurrency, args.warmup)
+
+    summary = recorder.summary()
+    print(format_table(summary))
+    print(f'pool: {pool.stats()}')
+
+    report = make_report(summary, {
+        'workloads': names,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'warmup': args.warmup,
+        'users': args.users,
+        'contacts': args.contacts
+    })
+    if args.save:
+        save_report(report, args.save)
+
+    if args.compare:
+        lines, regressions = compare_reports(load_report(args.compare), report, args.tolerance)
+        print('\n'.join(lines))
+        if regressions:
+            print('Regressions:\n  ' + '\n  '.join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import json
+import math
+import os
+import platform
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlsplit
+
+from shared import telemetry
+from shared.db import ConnectionPool, register_pool
+from shared.functions import BACKEND_DIR, load_function
+
+PERCENTILES = (50, 95, 99)
+
+
+def install_pool(dsn: str, max_size: int) -> ConnectionPool:
+    pool = ConnectionPool(dsn, max_size=max_size)
+    register_pool(dsn, pool)
+    return pool
+
+
+def load_scenarios(name: str) -> list:
+    with open(os.path.join(BACKEND_DIR, name, 'tests.json')) as source:
+        return json.load(source)['tests']
+
+
+def make_event(method: str, path: str, body=None, headers: dict = None, ip: str = '127.0.0.1') -> dict:
+    parts = urlsplit(path)
+    return {
+        'httpMethod': method,
+        'path': parts.path or '/',
+        'queryStringParameters': dict(parse_qsl(parts.query, keep_blank_values=True)),
+        'headers': {'Content-Type': 'application/json', **(headers or {})},
+        'body': json.dumps(body) if body is not None else None,
+        'requestContext': {'identity': {'sourceIp': ip}},
+        'isBase64Encoded': False
+    }
+
+
+def client_address(index: int) -> str:
+    return f'10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}'
+
+
+class Client:
+    '''Вызывает обработчики функций в процессе, как это делает шлюз'''
+
+    def __init__(self, functions: list):
+        self.modules = {name: load_function(name) for name in functions}
+
+    def call(self, function: str, event: dict) -> tuple:
+        previous = telemetry.last_request()
+        started = time.perf_counter()
+        response = self.modules[function].handler(event, None)
+        elapsed = time.perf_counter() - started
+        stats = telemetry.last_request()
+        return response, elapsed, stats if stats is not previous else None
+
+    def request(self, function: str, method: str, path: str, body=None, headers: dict = None, ip: str = '127.0.0.1'):
+        response, _, _ = self.call(function, make_event(method, path, body, headers, ip))
+        payload = json.loads(response['body']) if response.get('body') and not response.get('isBase64Encoded') else None
+        return response['statusCode'], payload
+
+
+class Recorder:
+    '''Собирает задержки, статусы и обращения к БД по действиям'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._walls = {}
+
+    def record(self, key: str, elapsed: float, status: int, expected, stats):
+        with self._lock:
+            sample = self._samples.setdefault(key, {'latencies': [], 'statuses': Counter(), 'trips': [], 'db': [], 'unexpected': 0})
+            sample['latencies'].append(elapsed)
+            sample['statuses'][status] += 1
+            sample['trips'].append(stats.round_trips if stats else 0)
+            sample['db'].append(stats.db_time if stats else 0.0)
+            if expected is not None and status != expected:
+                sample['unexpected'] += 1
+
+    def add_wall_time(self, keys, seconds: float):
+        with self._lock:
+            for key in keys:
+                self._walls[key] = self._walls.get(key, 0.0) + seconds
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {key: _summarize(sample, self._walls.get(key, 0.0)) for key, sample in sorted(self._samples.items())}
+
+
+def percentile(values: list, rank: int) -> float:
+    ordered = sorted(values)
+    index = max(0, math.ceil(rank / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _summarize(sample: dict, wall: float) -> dict:
+    latencies = sample['latencies']
+    count = len(latencies)
+    result = {
+        'count': count,
+        'throughput': round(count / wall, 1) if wall else None,
+        'mean_ms': round(sum(latencies) / count * 1000, 3),
+        'db_ms': round(sum(sample['db']) / count * 1000, 3),
+        'round_trips': round(sum(sample['trips']) / count, 2),
+        'max_round_trips': max(sample['trips']),
+        'errors': sum(n for status, n in sample['statuses'].items() if status >= 500),
+        'throttled': sample['statuses'].get(429, 0),
+        'unexpected': sample['unexpected'],
+        'statuses': {str(status): n for status, n in sorted(sample['statuses'].items())}
+    }
+    for rank in PERCENTILES:
+        result[f'p{rank}_ms'] = round(percentile(latencies, rank) * 1000, 3)
+    return result
+
+
+def run_workload(client: Client, recorder: Recorder, workload, requests: int, concurrency: int, warmup: int = 0):
+    for index in range(warmup):
+        key, function, event, expected = workload.build(index)
+        client.call(function, event)
+
+    def worker(index: int):
+        key, function, event, expected = workload.build(warmup + index)
+        response, elapsed, stats = client.call(function, event)
+        recorder.record(key, elapsed, response['statusCode'], expected, stats)
+        return key
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        keys = set(executor.map(worker, range(requests)))
+    recorder.add_wall_time(keys, time.perf_counter() - started)
+
+
+def make_report(summary: dict, settings: dict) -> dict:
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'settings': settings,
+        'actions': summary
+    }
+
+
+def save_report(report: dict, path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'w') as target:
+        json.dump(report, target, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def load_report(path: str) -> dict:
+    with open(path) as source:
+        return json.load(source)
+
+
+def format_table(summary: dict) -> str:
+    columns = ('count', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'db_ms', 'round_trips', 'errors', 'throttled', 'unexpected')
+    width = max([len('action')] + [len(key) for key in summary])
+    lines = ['action'.ljust(width) + ''.join(column.rjust(12) for column in columns)]
+    for key, stats in summary.items():
+        lines.append(key.ljust(width) + ''.join(str(stats[column] if stats[column] is not None else '-').rjust(12) for column in columns))
+    return '\n'.join(lines)
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float) -> tuple:
+    lines = []
+    regressions = []
+    for key, stats in current['actions'].items():
+        base = baseline['actions'].get(key)
+        if base is None:
+            lines.append(f'{key}: new action, no baseline')
+            continue
+        deltas = []
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'round_trips'):
+            change = (stats[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+            deltas.append(f'{metric} {base[metric]} -> {stats[metric]} ({change:+.0%})')
+        lines.append(f'{key}: ' + ', '.join(deltas))
+        if base['p95_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{key}: p95 {base["p95_ms"]} ms -> {stats["p95_ms"]} ms')
+        if stats['round_trips'] > base['round_trips'] + 0.5:
+            regressions.append(f'{key}: round trips {base["round_trips"]} -> {stats["round_trips"]}')
+    for key in sorted(set(baseline['actions']) - set(current['actions'])):
+        lines.append(f'{key}: missing from this run')
+    return lines, regressions
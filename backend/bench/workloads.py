@@ -0,0 +1,229 @@
+import json
+from urllib.parse import quote, urlsplit, parse_qsl
+
+from bench.harness import client_address, load_scenarios, make_event
+
+BENCH_PASSWORD = 'bench-password-1'
+
+
+class Fixture:
+    '''Набор тестовых пользователей и контактов, создаваемый через сами обработчики'''
+
+    def __init__(self, client, run_id: str, users: int, contacts: int):
+        self.client = client
+        self.run_id = run_id
+        self.size = users
+        self.contacts = contacts
+        self.users = None
+
+    def ensure(self) -> list:
+        if self.users is None:
+            self.users = [self._register(index) for index in range(self.size)]
+            for index, user in enumerate(self.users):
+                for step in range(min(self.contacts, self.size - 1)):
+                    target = self.users[(index + 1 + step) % self.size]
+                    self.client.request('users', 'POST', '/?action=add_contact', {'contact_user_id': target['id']},
+                                        {'X-Auth-Token': user['token']})
+        return self.users
+
+    def _register(self, index: int) -> dict:
+        username = f'bench{self.run_id}u{index}'
+        status, payload = self.client.request('auth', 'POST', '/?action=register', {
+            'username': username,
+            'email': f'{username}@bench.ofchat.local',
+            'password': BENCH_PASSWORD
+        }, ip=client_address(index))
+        if status != 201:
+            raise RuntimeError(f'Fixture registration failed with {status}: {payload}')
+        return {**payload['user'], 'token': payload['token']}
+
+
+class Workload:
+    name = ''
+    functions = ()
+
+    def prepare(self, client, fixture: Fixture):
+        pass
+
+    def build(self, index: int) -> tuple:
+        raise NotImplementedError
+
+
+class ScenarioReplay(Workload):
+    '''Повторяет сценарии из tests.json функций auth, users и sms'''
+
+    name = 'scenarios'
+    functions = ('auth', 'users', 'sms')
+
+    def prepare(self, client, fixture: Fixture):
+        self.scenarios = []
+        for function in self.functions:
+            for scenario in load_scenarios(function):
+                if '{{' in json.dumps(scenario) or 'capture' in scenario:
+                    continue
+                action = dict(parse_qsl(urlsplit(scenario['path']).query)).get('action', '')
+                self.scenarios.append((f'{function}.{action}: {scenario["name"]}', function, scenario))
+
+    def build(self, index: int) -> tuple:
+        key, function, scenario = self.scenarios[index % len(self.scenarios)]
+        event = make_event(scenario['method'], scenario['path'], scenario.get('body'), scenario.get('headers'),
+                           client_address(index))
+        return key, function, event, scenario.get('expectedStatus')
+
+
+class Register(Workload):
+    name = 'register'
+    functions = ('auth',)
+
+    def prepare(self, client, fixture: Fixture):
+        self.prefix = f'bench{fixture.run_id}r'
+
+    def build(self, index: int) -> tuple:
+        username = f'{self.prefix}{index}'
+        event = make_event('POST', '/?action=register', {
+            'username': username,
+            'email': f'{username}@bench.ofchat.local',
+            'password': BENCH_PASSWORD
+        }, ip=client_address(index))
+        return 'auth.register', 'auth', event, 201
+
+
+class Login(Workload):
+    name = 'login'
+    functions = ('auth',)
+
+    def prepare(self, client, fixture: Fixture):
+        self.users = fixture.ensure()
+
+    def build(self, index: int) -> tuple:
+        user = self.users[index % len(self.users)]
+        event = make_event('POST', '/?action=login', {'identifier': user['username'], 'password': BENCH_PASSWORD},
+                           ip=client_address(index))
+        return 'auth.login', 'auth', event, 200
+
+
+class Profile(Workload):
+    name = 'profile'
+    functions = ('auth',)
+
+    def prepare(self, client, fixture: Fixture):
+        self.users = fixture.ensure()
+
+    def build(self, index: int) -> tuple:
+        user = self.users[index % len(self.users)]
+        target = self.users[(index * 31 + 7) % len(self.users)]
+        event = make_event('GET', f'/?action=profile&user_id={target["id"]}', headers={'X-Auth-Token': user['token']},
+                           ip=client_address(index))
+        return 'auth.profile', 'auth', event, 200
+
+
+class Profiles(Workload):
+    '''Пакетная загрузка профилей, как при отрисовке списка участников'''
+
+    name = 'profiles'
+    functions = ('auth',)
+
+    def __init__(self, batch: int = 50):
+        self.batch = batch
+
+    def prepare(self, client, fixture: Fixture):
+        self.users = fixture.ensure()
+
+    def build(self, index: int) -> tuple:
+        user = self.users[index % len(self.users)]
+        start = (index * 17) % len(self.users)
+        ids = ','.join(str(self.users[(start + offset) % len(self.users)]['id']) for offset in range(self.batch))
+        event = make_event('GET', f'/?action=profiles&ids={ids}', headers={'X-Auth-Token': user['token']},
+                           ip=client_address(index))
+        return 'auth.profiles', 'auth', event, 200
+
+
+class Search(Workload):
+    '''Поиск по всем трём ярусам: точный ID, префикс имени и похожие имена'''
+
+    name = 'search'
+    functions = ('users',)
+
+    def prepare(self, client, fixture: Fixture):
+        self.users = fixture.ensure()
+        self.run_id = fixture.run_id
+
+    def build(self, index: int) -> tuple:
+        user = self.users[index % len(self.users)]
+        kind = ('exact', 'prefix', 'similar')[index % 3]
+        if kind == 'exact':
+            query = f'#{user["unique_id"]}'
+        elif kind == 'prefix':
+            query = f'@{user["username"][:len(user["username"]) - 1]}'
+        else:
+            query = f'ench{self.run_id}'
+        event = make_event('GET', f'/?action=search&q={quote(query)}', ip=client_address(index))
+        return f'users.search:{kind}', 'users', event, 200
+
+
+class Contacts(Workload):
+    name = 'contacts'
+    functions = ('users',)
+
+    def prepare(self, client, fixture: Fixture):
+        self.users = fixture.ensure()
+
+    def build(self, index: int) -> tuple:
+        user = self.users[index % len(self.users)]
+        event = make_event('GET', '/?action=contacts', headers={'X-Auth-Token': user['token']}, ip=client_address(index))
+        return 'users.contacts', 'users', event, 200
+
+
+class Heartbeat(Workload):
+    name = 'heartbeat'
+    functions = ('users',)
+
+    def prepare(self, client, fixture: Fixture):
+        self.users = fixture.ensure()
+
+    def build(self, index: int) -> tuple:
+        user = self.users[index % len(self.users)]
+        event = make_event('POST', '/?action=heartbeat', {}, {'X-Auth-Token': user['token']}, client_address(index))
+        return 'users.heartbeat', 'users', event, 200
+
+
+class SmsSend(Workload):
+    name = 'sms_send'
+    functions = ('sms',)
+
+    def prepare(self, client, fixture: Fixture):
+        self.prefix = f'+7900{int(fixture.run_id, 16) % 1000:03d}'
+
+    def build(self, index: int) -> tuple:
+        event = make_event('POST', '/?action=send', {'phone': f'{self.prefix}{index:04d}'}, ip=client_address(index))
+        return 'sms.send', 'sms', event, 200
+
+
+class SmsVerify(Workload):
+    '''Проверяет заранее отправленные коды, по одному на номер'''
+
+    name = 'sms_verify'
+    functions = ('sms',)
+
+    def __init__(self, phones: int = 500):
+        self.phones = phones
+
+    def prepare(self, client, fixture: Fixture):
+        prefix = f'+7901{int(fixture.run_id, 16) % 1000:03d}'
+        self.codes = []
+        for index in range(self.phones):
+            phone = f'{prefix}{index:04d}'
+            status, payload = client.request('sms', 'POST', '/?action=send', {'phone': phone}, ip=client_address(index))
+            if status == 200:
+                self.codes.append((phone, payload['dev_code']))
+
+    def build(self, index: int) -> tuple:
+        phone, code = self.codes[index % len(self.codes)]
+        first = index < len(self.codes)
+        event = make_event('POST', '/?action=verify', {'phone': phone, 'code': code}, ip=client_address(index))
+        return 'sms.verify', 'sms', event, 200 if first else 404
+
+
+WORKLOADS = {workload.name: workload for workload in (
+    ScenarioReplay, Register, Login, Profile, Profiles, Search, Contacts, Heartbeat, SmsSend, SmsVerify
+)}
@@ -0,0 +1,257 @@
+import json
+import os
+import sys
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import get_pool
+from shared.http import Router, json_response, error_response
+from shared.auth import authenticate
+from shared.pagination import encode_cursor, decode_cursor, clamp_limit
+
+CALL_TYPES = ('audio', 'video')
+CALL_START_STATUS = 'ringing'
+CALL_END_STATUSES = ('completed', 'missed', 'declined', 'cancelled', 'failed')
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 366
+CALL_COLUMNS = "id, caller_id, receiver_id, call_type, status, duration, started_at, ended_at"
+
+router = Router('OfChat Calls API')
+
+def handler(event: dict, context) -> dict:
+    '''API для журнала звонков, истории и статистики разговоров'''
+    return router(event, context)
+
+@router.route('POST', 'log')
+def log_call(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        body = json.loads(event.get('body', '{}'))
+        user_id = claims['user_id']
+        call_id = body.get('call_id')
+        
+        if call_id:
+            try:
+                call_id = int(call_id)
+            except (ValueError, TypeError):
+                return error_response(400, 'call_id must be an integer')
+            
+            status = body.get('status') or 'completed'
+            if status not in CALL_END_STATUSES:
+                return error_response(400, f'status must be one of: {", ".join(CALL_END_STATUSES)}')
+            
+            conn = get_pool(dsn).getconn()
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cursor.execute(
+                f"""
+                UPDATE calls
+                SET status = %(status)s,
+                    ended_at = CURRENT_TIMESTAMP,
+                    duration = CASE WHEN %(status)s = 'completed'
+                        THEN GREATEST(0, EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - started_at))::integer ELSE 0 END
+                WHERE id = %(call_id)s AND ended_at IS NULL AND %(user_id)s IN (caller_id, receiver_id)
+                RETURNING {CALL_COLUMNS}
+                """,
+                {'status': status, 'call_id': call_id, 'user_id': user_id}
+            )
+            
+            call = cursor.fetchone()
+            conn.commit()
+            
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            
+            if not call:
+                return error_response(404, 'Active call not found')
+            
+            return json_response(200, {'success': True, 'call': dict(call)})
+        
+        receiver_id = body.get('receiver_id')
+        call_type = body.get('call_type') or 'audio'
+        
+        if not receiver_id:
+            return error_response(400, 'receiver_id is required')
+        
+        try:
+            receiver_id = int(receiver_id)
+        except (ValueError, TypeError):
+            return error_response(400, 'receiver_id must be an integer')
+        
+        if receiver_id == user_id:
+            return error_response(400, 'You cannot call yourself')
+        
+        if call_type not in CALL_TYPES:
+            return error_response(400, f'call_type must be one of: {", ".join(CALL_TYPES)}')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            f"INSERT INTO calls (caller_id, receiver_id, call_type, status) VALUES (%s, %s, %s, %s) RETURNING {CALL_COLUMNS}",
+            (user_id, receiver_id, call_type, CALL_START_STATUS)
+        )
+        
+        call = dict(cursor.fetchone())
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(201, {'success': True, 'call': call})
+        
+    except psycopg2.IntegrityError:
+        if conn:
+            conn.rollback()
+            get_pool(dsn).putconn(conn)
+        return error_response(404, 'Receiver not found')
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'history')
+def get_call_history(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        
+        try:
+            limit = clamp_limit(query_params.get('limit'), HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
+            before = decode_cursor(query_params['cursor'], 2) if query_params.get('cursor') else None
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid limit or cursor')
+        
+        page_condition = "AND (started_at, id) < (%(before_started_at)s, %(before_id)s)" if before else ""
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            f"""
+            (
+                SELECT {CALL_COLUMNS}, 'outgoing' AS direction, receiver_id AS peer_id
+                FROM calls
+                WHERE caller_id = %(user_id)s {page_condition}
+                ORDER BY started_at DESC, id DESC
+                LIMIT %(limit)s
+            )
+            UNION ALL
+            (
+                SELECT {CALL_COLUMNS}, 'incoming' AS direction, caller_id AS peer_id
+                FROM calls
+                WHERE receiver_id = %(user_id)s AND caller_id IS DISTINCT FROM %(user_id)s {page_condition}
+                ORDER BY started_at DESC, id DESC
+                LIMIT %(limit)s
+            )
+            ORDER BY started_at DESC, id DESC
+            LIMIT %(limit)s
+            """,
+            {
+                'user_id': claims['user_id'],
+                'before_started_at': before[0] if before else None,
+                'before_id': before[1] if before else None,
+                'limit': limit + 1
+            }
+        )
+        
+        calls = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        next_cursor = None
+        if len(calls) > limit:
+            calls = calls[:limit]
+            next_cursor = encode_cursor(calls[-1]['started_at'].isoformat(), calls[-1]['id'])
+        
+        return json_response(200, {
+            'success': True,
+            'calls': calls,
+            'count': len(calls),
+            'next_cursor': next_cursor
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'stats')
+def get_call_stats(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        
+        try:
+            days = clamp_limit(query_params.get('days'), STATS_DEFAULT_DAYS, STATS_MAX_DAYS)
+        except (ValueError, TypeError):
+            return error_response(400, 'days must be a positive integer')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            """
+            SELECT day, direction, call_type, status, calls, duration
+            FROM call_daily_stats
+            WHERE user_id = %s AND day > CURRENT_DATE - %s
+            ORDER BY day DESC
+            """,
+            (claims['user_id'], days)
+        )
+        
+        rows = cursor.fetchall()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        totals = {'calls': 0, 'talk_time': 0, 'missed': 0, 'outgoing': 0, 'incoming': 0}
+        by_type = {}
+        daily = {}
+        for row in rows:
+            totals['calls'] += row['calls']
+            totals['talk_time'] += row['duration']
+            totals[row['direction']] += row['calls']
+            if row['direction'] == 'incoming' and row['status'] == 'missed':
+                totals['missed'] += row['calls']
+            call_type = by_type.setdefault(row['call_type'], {'calls': 0, 'talk_time': 0})
+            call_type['calls'] += row['calls']
+            call_type['talk_time'] += row['duration']
+            day = daily.setdefault(row['day'].isoformat(), {'calls': 0, 'talk_time': 0, 'missed': 0})
+            day['calls'] += row['calls']
+            day['talk_time'] += row['duration']
+            if row['direction'] == 'incoming' and row['status'] == 'missed':
+                day['missed'] += row['calls']
+        
+        return json_response(200, {
+            'success': True,
+            'days': days,
+            'totals': totals,
+            'by_type': by_type,
+            'daily': [{'day': day, **values} for day, values in daily.items()]
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
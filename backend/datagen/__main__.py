@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+
+from datagen.loader import load
+from datagen.rows import DATAGEN_PASSWORD, Dataset
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m datagen', description='Stream a deterministic synthetic dataset into Postgres with COPY')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='Postgres DSN, defaults to DATABASE_URL')
+    parser.add_argument('--users', type=int, default=1000000, help='users to generate')
+    parser.add_argument('--chats', type=int, default=200000, help='chats to generate, a fifth of them groups')
+    parser.add_argument('--messages', type=int, default=10000000, help='messages spread over chats by size')
+    parser.add_argument('--calls', type=int, help='calls to generate, defaults to one per user')
+    parser.add_argument('--verification-codes', type=int, help='SMS codes to generate, defaults to a tenth of users')
+    parser.add_argument('--contacts', type=int, default=10, help='mean contacts per user, power-law distributed')
+    parser.add_argument('--max-contacts', type=int, default=2000, help='cap on a single user\'s contacts')
+    parser.add_argument('--max-group-size', type=int, default=5000, help='cap on a single group\'s members')
+    parser.add_argument('--months', type=int, default=12, help='history span for timestamps')
+    parser.add_argument('--seed', type=int, default=42, help='random seed, the same seed gives the same rows')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='parallel COPY streams')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.dsn:
+        print('DATABASE_URL or --dsn is required', file=sys.stderr)
+        return 2
+    if min(args.users, args.chats) < 1:
+        print('--users and --chats must be positive', file=sys.stderr)
+        return 2
+
+    dataset = Dataset(
+        users=args.users, chats=args.chats, messages=args.messages, calls=args.calls,
+        verification_codes=args.verification_codes, contacts=args.contacts, max_contacts=args.max_contacts,
+        max_group_size=args.max_group_size, months=args.months, seed=args.seed
+    )
+    reported = {}
+
+    def progress(table: str, rows: int):
+        if rows - reported.get(table, 0) >= 1000000:
+            reported[table] = rows
+            print(f'{table}: {rows} rows', file=sys.stderr)
+
+    stats = load(args.dsn, dataset, max(args.workers, 1), progress)
+    for table, values in stats.items():
+        rate = int(values['rows'] / values['seconds']) if values['seconds'] else '-'
+        print(f'{table:<20}{values["rows"]:>12}{values["seconds"]:>10}s{rate:>12}/s')
+    print(f'Generated users log in with password {DATAGEN_PASSWORD!r}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
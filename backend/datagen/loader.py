@@ -0,0 +1,141 @@
+import multiprocessing
+import time
+
+import psycopg2
+
+from datagen.rows import TABLES, CopyStream, stamp
+
+STAGES = (('users',), ('contacts', 'chats', 'calls', 'verification_codes'), ('chat_members',), ('messages',))
+SEQUENCES = {
+    'users': 'users_id_seq',
+    'chats': 'chats_id_seq',
+    'messages': 'messages_id_seq'
+}
+COPY_READ_SIZE = 1 << 20
+DEFERRED_TRIGGERS = (
+    ('messages', 'trg_messages_notify'),
+    ('chat_members', 'trg_chat_members_insert_changes'),
+    ('contacts', 'trg_contacts_insert_changes')
+)
+
+_worker = {}
+
+
+def prepare(dsn: str, dataset):
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        for table, sequence in SEQUENCES.items():
+            cursor.execute(f"SELECT GREATEST((SELECT COALESCE(MAX(id), 0) FROM {table}), (SELECT last_value FROM {sequence}))")
+            dataset.bases[table] = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            SELECT ensure_messages_partition(month::DATE)
+            FROM generate_series(date_trunc('month', %s::timestamp), date_trunc('month', %s::timestamp), INTERVAL '1 month') AS month
+            """,
+            (stamp(dataset.since), stamp(dataset.until))
+        )
+        for table, trigger in DEFERRED_TRIGGERS:
+            cursor.execute(f"ALTER TABLE {table} DISABLE TRIGGER {trigger}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def finish(dsn: str, dataset):
+    last_ids = {
+        'users': dataset.user_id(dataset.users - 1),
+        'chats': dataset.chat_id(dataset.chats - 1),
+        'messages': dataset.last_message_id(dataset.chats - 1)
+    }
+    chat_range = {'first': dataset.chat_id(0), 'last': last_ids['chats']}
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        for table, sequence in SEQUENCES.items():
+            cursor.execute(f"SELECT setval('{sequence}', GREATEST(%s, (SELECT last_value FROM {sequence})))", (last_ids[table],))
+        cursor.execute(
+            """
+            UPDATE chats c
+            SET last_message_at = m.created_at, last_activity_at = m.created_at
+            FROM messages m
+            WHERE m.id = c.last_message_id AND m.chat_id = c.id AND c.id BETWEEN %(first)s AND %(last)s
+            """,
+            chat_range
+        )
+        cursor.execute(
+            """
+            UPDATE chat_members cm
+            SET last_activity_at = c.last_activity_at
+            FROM chats c
+            WHERE c.id = cm.chat_id AND c.id BETWEEN %(first)s AND %(last)s
+            """,
+            chat_range
+        )
+        conn.commit()
+        conn.autocommit = True
+        cursor.execute("VACUUM ANALYZE")
+    finally:
+        conn.close()
+
+
+def enable_triggers(dsn: str):
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        for table, trigger in DEFERRED_TRIGGERS:
+            cursor.execute(f"ALTER TABLE {table} ENABLE TRIGGER {trigger}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _init_worker(dsn: str, dataset):
+    _worker['dsn'] = dsn
+    _worker['dataset'] = dataset
+    _worker['conn'] = None
+
+
+def _copy_chunk(task: tuple) -> tuple:
+    table, start, stop = task
+    if _worker['conn'] is None or _worker['conn'].closed:
+        _worker['conn'] = psycopg2.connect(_worker['dsn'])
+    conn = _worker['conn']
+    target, rows = TABLES[table]
+    stream = CopyStream(rows(_worker['dataset'], start, stop))
+    cursor = conn.cursor()
+    try:
+        cursor.copy_expert(f'COPY {target} FROM STDIN', stream, COPY_READ_SIZE)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return table, stream.rows
+
+
+def load(dsn: str, dataset, workers: int, progress=None) -> dict:
+    prepare(dsn, dataset)
+    dataset.layout()
+    stats = {table: {'rows': 0, 'seconds': 0.0} for table in TABLES}
+    started = time.perf_counter()
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(dsn, dataset)) as pool:
+            for stage in STAGES:
+                tasks = [(table, start, stop) for table in stage for start, stop in dataset.chunks(table)]
+                stage_started = time.perf_counter()
+                for table, rows in pool.imap_unordered(_copy_chunk, tasks):
+                    stats[table]['rows'] += rows
+                    if progress:
+                        progress(table, stats[table]['rows'])
+                for table in stage:
+                    stats[table]['seconds'] = round(time.perf_counter() - stage_started, 1)
+    finally:
+        enable_triggers(dsn)
+    finish(dsn, dataset)
+    stats['total'] = {
+        'rows': sum(table['rows'] for table in stats.values()),
+        'seconds': round(time.perf_counter() - started, 1)
+    }
+    return stats
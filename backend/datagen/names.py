@@ -0,0 +1,31 @@
+FIRST_NAMES = (
+    ('александр', 'alexander'), ('алексей', 'alexey'), ('анна', 'anna'), ('дмитрий', 'dmitry'),
+    ('екатерина', 'ekaterina'), ('елена', 'elena'), ('иван', 'ivan'), ('ирина', 'irina'),
+    ('максим', 'maxim'), ('мария', 'maria'), ('михаил', 'mikhail'), ('наталья', 'natalia'),
+    ('никита', 'nikita'), ('ольга', 'olga'), ('павел', 'pavel'), ('сергей', 'sergey'),
+    ('светлана', 'svetlana'), ('татьяна', 'tatiana'), ('юлия', 'yulia'), ('артём', 'artem'),
+    ('дарья', 'daria'), ('кирилл', 'kirill'), ('полина', 'polina'), ('роман', 'roman')
+)
+LAST_NAMES = (
+    ('иванов', 'ivanov'), ('смирнов', 'smirnov'), ('кузнецов', 'kuznetsov'), ('попов', 'popov'),
+    ('васильев', 'vasiliev'), ('петров', 'petrov'), ('соколов', 'sokolov'), ('михайлов', 'mikhailov'),
+    ('новиков', 'novikov'), ('фёдоров', 'fedorov'), ('морозов', 'morozov'), ('волков', 'volkov'),
+    ('алексеев', 'alekseev'), ('лебедев', 'lebedev'), ('семёнов', 'semenov'), ('егоров', 'egorov'),
+    ('павлов', 'pavlov'), ('козлов', 'kozlov'), ('степанов', 'stepanov'), ('николаев', 'nikolaev')
+)
+SEPARATORS = ('', '.', '_')
+WORDS = (
+    'привет', 'как', 'дела', 'да', 'нет', 'спасибо', 'хорошо', 'сегодня', 'завтра', 'вечером',
+    'встреча', 'проект', 'отчёт', 'документ', 'звонок', 'офис', 'погода', 'кофе', 'обед', 'выходные',
+    'фото', 'ссылка', 'договорились', 'позвони', 'напиши', 'когда', 'где', 'сколько', 'отлично', 'пока',
+    'hello', 'ok', 'thanks', 'meeting', 'tomorrow', 'project', 'report', 'release', 'deploy', 'review',
+    'lunch', 'weekend', 'link', 'call', 'later', 'done', 'great', 'sure', 'please', 'today'
+)
+BIOS = (
+    'люблю путешествия', 'работаю в IT', 'на связи с 9 до 18', 'пишите в личку',
+    'coffee first', 'product manager', 'designer', 'student'
+)
+GROUP_TOPICS = (
+    'семья', 'работа', 'друзья', 'дача', 'футбол', 'книжный клуб', 'соседи', 'класс',
+    'team', 'backend', 'design', 'travel', 'music', 'gaming'
+)
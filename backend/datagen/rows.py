@@ -0,0 +1,274 @@
+import hashlib
+import itertools
+import random
+import time
+
+from datagen.names import BIOS, FIRST_NAMES, GROUP_TOPICS, LAST_NAMES, SEPARATORS, WORDS
+
+DATAGEN_PASSWORD = 'datagen-password-1'
+PASSWORD_HASH = hashlib.sha256(DATAGEN_PASSWORD.encode()).hexdigest()
+CHUNK_ROWS = 50000
+UNIQUE_ID_MULTIPLIER = 0x9E3779B1
+UNIQUE_ID_SPACE = 1 << 40
+GROUP_SHARE = 0.2
+DAY = 86400
+NULL = '\\N'
+ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+WORD_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(WORDS) + 1)))
+
+
+class Dataset:
+    '''Размеры и зерно синтетического набора; одни и те же параметры дают одни и те же строки'''
+
+    def __init__(self, users: int = 1000000, chats: int = 200000, messages: int = 10000000, calls: int = None,
+                 verification_codes: int = None, contacts: int = 10, max_contacts: int = 2000,
+                 max_group_size: int = 5000, months: int = 12, seed: int = 42, until: float = None):
+        self.users = users
+        self.chats = chats
+        self.messages = messages
+        self.calls = users if calls is None else calls
+        self.verification_codes = users // 10 if verification_codes is None else verification_codes
+        self.contacts = contacts
+        self.max_contacts = max_contacts
+        self.max_group_size = max_group_size
+        self.months = months
+        self.seed = seed
+        self.until = until if until is not None else time.time() // DAY * DAY
+        self.since = self.until - months * 30 * DAY
+        self.bases = {'users': 0, 'chats': 0, 'messages': 0}
+        self._layout = None
+
+    def rng(self, *key) -> random.Random:
+        return random.Random(':'.join(str(part) for part in (self.seed,) + key))
+
+    def layout(self) -> tuple:
+        if self._layout is None:
+            rng = self.rng('chat_sizes')
+            sizes = []
+            for _ in range(self.chats):
+                if rng.random() < GROUP_SHARE:
+                    sizes.append(min(self.max_group_size, self.users, int(3 * rng.paretovariate(1.2))))
+                else:
+                    sizes.append(min(2, self.users))
+            total = sum(sizes) or 1
+            counts = [self.messages * size // total for size in sizes]
+            for index in range(self.messages - sum(counts)):
+                counts[index % len(counts)] += 1
+            offsets = [0] + list(itertools.accumulate(counts))
+            self._layout = (sizes, counts, offsets)
+        return self._layout
+
+    def chunks(self, table: str) -> list:
+        if table == 'messages':
+            sizes, counts, offsets = self.layout()
+            bounds = [0]
+            for index in range(1, self.chats):
+                if offsets[index] - offsets[bounds[-1]] >= CHUNK_ROWS:
+                    bounds.append(index)
+            bounds.append(self.chats)
+            return list(zip(bounds, bounds[1:]))
+        total = {'users': self.users, 'contacts': self.users, 'chats': self.chats, 'chat_members': self.chats,
+                 'calls': self.calls, 'verification_codes': self.verification_codes}[table]
+        step = CHUNK_ROWS if table not in ('contacts', 'chat_members') else max(1, CHUNK_ROWS // max(self.contacts, 4))
+        return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+    def user_id(self, index: int) -> int:
+        return self.bases['users'] + 1 + index
+
+    def chat_id(self, index: int) -> int:
+        return self.bases['chats'] + 1 + index
+
+    def pick_users(self, rng: random.Random, count: int, skew: float, exclude: int = None) -> list:
+        count = min(count, self.users - (1 if exclude is not None else 0))
+        picked = {}
+        attempts = 0
+        while len(picked) < count and attempts < count * 4:
+            attempts += 1
+            user_id = self.user_id(int(self.users * rng.random() ** skew))
+            if user_id != exclude:
+                picked[user_id] = None
+        candidate = self.user_id(0)
+        while len(picked) < count:
+            if candidate != exclude:
+                picked.setdefault(candidate, None)
+            candidate += 1
+        return list(picked)
+
+    def chat_members(self, index: int) -> list:
+        sizes, _, _ = self.layout()
+        return self.pick_users(self.rng('members', index), sizes[index], 1.5)
+
+    def last_message_id(self, index: int) -> int:
+        _, _, offsets = self.layout()
+        return self.bases['messages'] + offsets[index + 1]
+
+    def timestamp(self, rng: random.Random, since: float = None) -> float:
+        since = self.since if since is None else since
+        return since + (self.until - since) * rng.random()
+
+
+def text(value) -> str:
+    return NULL if value is None else str(value).translate(ESCAPES)
+
+
+def stamp(seconds: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(seconds))
+
+
+def line(*values) -> str:
+    return '\t'.join(values) + '\n'
+
+
+def user_rows(dataset: Dataset, start: int, stop: int):
+    rng = dataset.rng('users', start)
+    for index in range(start, stop):
+        user_id = dataset.user_id(index)
+        first, first_latin = rng.choice(FIRST_NAMES)
+        last, last_latin = rng.choice(LAST_NAMES)
+        separator = rng.choice(SEPARATORS)
+        suffix = _base36(user_id)
+        if rng.random() < 0.6:
+            username = f'{first}{separator}{last}{suffix}'
+        else:
+            username = f'{first_latin}{separator}{last_latin}{suffix}'
+        if rng.random() < 0.3:
+            username = username.capitalize()
+        created_at = dataset.timestamp(rng)
+        yield line(
+            str(user_id),
+            f'{(user_id * UNIQUE_ID_MULTIPLIER + dataset.seed) % UNIQUE_ID_SPACE:010X}',
+            text(username),
+            f'{first_latin}.{last_latin}.{user_id}@datagen.ofchat.local',
+            f'+7{9000000000 + user_id}',
+            PASSWORD_HASH,
+            text(rng.choice(BIOS)) if rng.random() < 0.3 else NULL,
+            stamp(created_at),
+            stamp(dataset.until - DAY * rng.expovariate(0.5))
+        )
+
+
+def contact_rows(dataset: Dataset, start: int, stop: int):
+    rng = dataset.rng('contacts', start)
+    for index in range(start, stop):
+        user_id = dataset.user_id(index)
+        degree = min(dataset.max_contacts, int(dataset.contacts * 0.25 * rng.paretovariate(1.33)))
+        for contact_user_id in dataset.pick_users(rng, degree, 2.5, exclude=user_id):
+            yield line(str(user_id), str(contact_user_id), stamp(dataset.timestamp(rng)))
+
+
+def chat_rows(dataset: Dataset, start: int, stop: int):
+    rng = dataset.rng('chats', start)
+    sizes, counts, _ = dataset.layout()
+    for index in range(start, stop):
+        group = sizes[index] > 2
+        yield line(
+            str(dataset.chat_id(index)),
+            'group' if group else 'private',
+            text(f'{rng.choice(GROUP_TOPICS)} {index}') if group else NULL,
+            str(dataset.chat_members(index)[0]) if sizes[index] else NULL,
+            stamp(dataset.timestamp(rng)),
+            str(dataset.last_message_id(index)) if counts[index] else NULL
+        )
+
+
+def chat_member_rows(dataset: Dataset, start: int, stop: int):
+    rng = dataset.rng('chat_members', start)
+    sizes, counts, _ = dataset.layout()
+    for index in range(start, stop):
+        chat_id = str(dataset.chat_id(index))
+        last_message_id = dataset.last_message_id(index) if counts[index] else 0
+        for position, user_id in enumerate(dataset.chat_members(index)):
+            role = 'admin' if position == 0 and sizes[index] > 2 else 'member'
+            unread = 0 if rng.random() < 0.75 else min(counts[index], 1 + int(rng.expovariate(0.1)))
+            yield line(chat_id, str(user_id), role, str(last_message_id - unread if unread else last_message_id), str(unread))
+
+
+def message_rows(dataset: Dataset, start: int, stop: int):
+    _, counts, offsets = dataset.layout()
+    for index in range(start, stop):
+        if not counts[index]:
+            continue
+        rng = dataset.rng('messages', index)
+        members = dataset.chat_members(index)
+        chat_id = str(dataset.chat_id(index))
+        first_id = dataset.bases['messages'] + offsets[index] + 1
+        for position, created_at in enumerate(sorted(dataset.timestamp(rng) for _ in range(counts[index]))):
+            words = rng.choices(WORDS, cum_weights=WORD_WEIGHTS, k=1 + int(rng.expovariate(0.25)))
+            yield line(
+                str(first_id + position),
+                chat_id,
+                str(rng.choice(members)),
+                text(' '.join(words)),
+                stamp(created_at),
+                stamp(created_at + rng.uniform(10, 600)) if rng.random() < 0.03 else NULL
+            )
+
+
+def call_rows(dataset: Dataset, start: int, stop: int):
+    rng = dataset.rng('calls', start)
+    for _ in range(start, stop):
+        caller_id, receiver_id = dataset.pick_users(rng, 2, 2.0)
+        status = rng.choice(('completed', 'completed', 'completed', 'missed', 'declined', 'cancelled'))
+        started_at = dataset.timestamp(rng)
+        duration = int(rng.expovariate(1 / 240)) if status == 'completed' else 0
+        yield line(
+            str(caller_id), str(receiver_id), 'audio' if rng.random() < 0.7 else 'video', status,
+            str(duration), stamp(started_at), stamp(started_at + max(duration, 15))
+        )
+
+
+def verification_code_rows(dataset: Dataset, start: int, stop: int):
+    rng = dataset.rng('verification_codes', start)
+    for _ in range(start, stop):
+        created_at = dataset.timestamp(rng, dataset.until - 7 * DAY)
+        yield line(
+            f'+7{9000000000 + dataset.user_id(rng.randrange(dataset.users))}',
+            f'{rng.randrange(1000000):06d}',
+            stamp(created_at),
+            stamp(created_at + 600),
+            'true' if rng.random() < 0.8 else 'false',
+            str(rng.randrange(3))
+        )
+
+
+def _base36(value: int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    result = ''
+    while value:
+        value, remainder = divmod(value, 36)
+        result = digits[remainder] + result
+    return result or '0'
+
+
+TABLES = {
+    'users': ('users (id, unique_id, username, email, phone, password_hash, bio, created_at, last_seen)', user_rows),
+    'contacts': ('contacts (user_id, contact_user_id, added_at)', contact_rows),
+    'chats': ('chats (id, chat_type, name, created_by, created_at, last_message_id)', chat_rows),
+    'chat_members': ('chat_members (chat_id, user_id, role, last_read_message_id, unread_count)', chat_member_rows),
+    'messages': ('messages (id, chat_id, sender_id, content, created_at, edited_at)', message_rows),
+    'calls': ('calls (caller_id, receiver_id, call_type, status, duration, started_at, ended_at)', call_rows),
+    'verification_codes': ('verification_codes (phone, code, created_at, expires_at, verified, attempts)', verification_code_rows)
+}
+
+
+class CopyStream:
+    '''Файловый объект для COPY FROM STDIN, который читает строки из генератора по мере надобности'''
+
+    def __init__(self, lines, batch: int = 2000):
+        self._lines = iter(lines)
+        self._batch = batch
+        self._buffer = bytearray()
+        self.rows = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            rows = list(itertools.islice(self._lines, self._batch))
+            if not rows:
+                break
+            self.rows += len(rows)
+            self._buffer += ''.join(rows).encode()
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
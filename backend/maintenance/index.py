@@ -0,0 +1,283 @@
+import hmac
+import os
+import sys
+import time
+from datetime import date
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import get_pool
+from shared.http import Router, json_response, error_response
+from shared.archive import BlockWriter, ARCHIVE_FIELDS
+from shared.blobs import discard_upload
+from shared.fanout import drain_fanout
+from shared.suggestions import refresh_suggestions
+
+SWEEP_BATCH_SIZE = int(os.environ.get('SWEEP_BATCH_SIZE', '5000'))
+SWEEP_TIME_BUDGET = float(os.environ.get('SWEEP_TIME_BUDGET', '20'))
+VERIFICATION_RETENTION_HOURS = int(os.environ.get('VERIFICATION_RETENTION_HOURS', '24'))
+RATE_LIMIT_RETENTION_HOURS = int(os.environ.get('RATE_LIMIT_RETENTION_HOURS', '24'))
+UPLOAD_RETENTION_HOURS = int(os.environ.get('UPLOAD_RETENTION_HOURS', '48'))
+CHANGE_RETENTION_HOURS = int(os.environ.get('CHANGE_RETENTION_HOURS', str(30 * 24)))
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('MESSAGE_ARCHIVE_AFTER_MONTHS', '6'))
+PARTITIONS_AHEAD = 2
+ARCHIVE_FETCH_SIZE = 5000
+
+SWEEPS = [
+    (
+        'verification_codes',
+        """
+        DELETE FROM verification_codes
+        WHERE id IN (
+            SELECT id FROM verification_codes
+            WHERE created_at < CURRENT_TIMESTAMP - make_interval(hours => %(retention)s)
+            ORDER BY created_at
+            LIMIT %(batch)s
+            FOR UPDATE SKIP LOCKED
+        )
+        """,
+        VERIFICATION_RETENTION_HOURS,
+        None
+    ),
+    (
+        'rate_limit_buckets',
+        """
+        DELETE FROM rate_limit_buckets
+        WHERE bucket_key IN (
+            SELECT bucket_key FROM rate_limit_buckets
+            WHERE updated_at < CURRENT_TIMESTAMP - make_interval(hours => %(retention)s)
+            LIMIT %(batch)s
+            FOR UPDATE SKIP LOCKED
+        )
+        """,
+        RATE_LIMIT_RETENTION_HOURS,
+        None
+    ),
+    (
+        'revoked_tokens',
+        """
+        DELETE FROM revoked_tokens
+        WHERE token_id IN (
+            SELECT token_id FROM revoked_tokens
+            WHERE expires_at < CURRENT_TIMESTAMP - make_interval(hours => %(retention)s)
+            LIMIT %(batch)s
+            FOR UPDATE SKIP LOCKED
+        )
+        """,
+        0,
+        None
+    ),
+    (
+        'attachment_uploads',
+        """
+        DELETE FROM attachment_uploads
+        WHERE id IN (
+            SELECT id FROM attachment_uploads
+            WHERE updated_at < CURRENT_TIMESTAMP - make_interval(hours => %(retention)s)
+            ORDER BY updated_at
+            LIMIT %(batch)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id
+        """,
+        UPLOAD_RETENTION_HOURS,
+        discard_upload
+    ),
+    (
+        'user_changes',
+        """
+        WITH candidates AS (
+            SELECT DISTINCT user_id FROM user_changes
+            WHERE changed_at < CURRENT_TIMESTAMP - make_interval(hours => %(retention)s)
+            LIMIT %(batch)s
+        ),
+        locked AS (
+            SELECT h.user_id
+            FROM user_change_heads h
+            JOIN candidates c ON c.user_id = h.user_id
+            ORDER BY h.user_id
+            FOR UPDATE OF h SKIP LOCKED
+        ),
+        advanced AS (
+            UPDATE user_change_heads h
+            SET snapshot_seq = GREATEST(h.snapshot_seq, c.seq)
+            FROM (
+                SELECT uc.user_id, max(uc.seq) AS seq
+                FROM user_changes uc
+                JOIN locked l ON l.user_id = uc.user_id
+                WHERE uc.changed_at < CURRENT_TIMESTAMP - make_interval(hours => %(retention)s)
+                GROUP BY uc.user_id
+            ) c
+            WHERE h.user_id = c.user_id
+        )
+        DELETE FROM user_changes uc
+        USING locked l
+        WHERE uc.user_id = l.user_id
+          AND uc.changed_at < CURRENT_TIMESTAMP - make_interval(hours => %(retention)s)
+        """,
+        CHANGE_RETENTION_HOURS,
+        None
+    ),
+]
+
+def month_offset(today: date, months: int) -> date:
+    index = today.year * 12 + today.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def ensure_partitions(conn):
+    cursor = conn.cursor()
+    today = date.today()
+    for months in range(PARTITIONS_AHEAD + 1):
+        cursor.execute("SELECT ensure_messages_partition(%s)", (month_offset(today, months),))
+    conn.commit()
+    cursor.close()
+
+def require_maintenance_token(event: dict):
+    headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+    expected = os.environ.get('MAINTENANCE_TOKEN', '')
+    if not expected or not hmac.compare_digest(headers.get('x-maintenance-token', ''), expected):
+        return error_response(403, 'Forbidden')
+    return None
+
+router = Router('OfChat Maintenance API', allow_headers='Content-Type, X-Maintenance-Token', guard=require_maintenance_token)
+
+def handler(event: dict, context) -> dict:
+    '''API для фоновых задач по расписанию: очистка, архивирование, рассылка состояния участникам и пересчёт рекомендаций'''
+    return router(event, context)
+
+@router.route('POST', 'sweep')
+def sweep_expired(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        deadline = time.monotonic() + SWEEP_TIME_BUDGET
+        deleted = {}
+        
+        conn = get_pool(dsn).getconn()
+        ensure_partitions(conn)
+        cursor = conn.cursor()
+        
+        for table, statement, retention, cleanup in SWEEPS:
+            deleted[table] = 0
+            while time.monotonic() < deadline:
+                cursor.execute(statement, {'retention': retention, 'batch': SWEEP_BATCH_SIZE})
+                removed = cursor.fetchall() if cleanup else []
+                conn.commit()
+                for row in removed:
+                    cleanup(row[0])
+                deleted[table] += cursor.rowcount
+                if cursor.rowcount < SWEEP_BATCH_SIZE:
+                    break
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {
+            'success': True,
+            'deleted': deleted,
+            'complete': time.monotonic() < deadline
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+def archive_partition(conn, partition: str, month: str) -> int:
+    cursor = conn.cursor()
+    cursor.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(sql.Identifier(partition)))
+    rows = conn.cursor(name=f'archive_{month}', cursor_factory=RealDictCursor)
+    rows.itersize = ARCHIVE_FETCH_SIZE
+    rows.execute(
+        sql.SQL("SELECT {} FROM {} ORDER BY chat_id, created_at DESC, id DESC").format(
+            sql.SQL(', ').join(map(sql.Identifier, ARCHIVE_FIELDS)),
+            sql.Identifier(partition)
+        )
+    )
+    writer = BlockWriter(cursor, month)
+    for row in rows:
+        writer.append(row)
+    rows.close()
+    writer.close()
+    cursor.execute(
+        sql.SQL(
+            """
+            INSERT INTO attachment_grants (sha256, user_id, file_name)
+            SELECT DISTINCT ON (m.attachment_sha256, cm.user_id) m.attachment_sha256, cm.user_id, m.attachment_name
+            FROM {} m
+            JOIN chat_members cm ON cm.chat_id = m.chat_id
+            WHERE m.attachment_sha256 IS NOT NULL
+            ORDER BY m.attachment_sha256, cm.user_id, m.created_at DESC
+            ON CONFLICT (sha256, user_id) DO NOTHING
+            """
+        ).format(sql.Identifier(partition))
+    )
+    cursor.execute(sql.SQL("ALTER TABLE messages DETACH PARTITION {}").format(sql.Identifier(partition)))
+    cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition)))
+    conn.commit()
+    cursor.close()
+    return writer.count
+
+@router.route('POST', 'archive')
+def archive_messages(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        deadline = time.monotonic() + SWEEP_TIME_BUDGET
+        today = date.today()
+        cutoff = month_offset(today, -ARCHIVE_AFTER_MONTHS).strftime('%Y%m')
+        
+        conn = get_pool(dsn).getconn()
+        ensure_partitions(conn)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'messages'::regclass AND c.relname ~ '^messages_p[0-9]{6}$'
+            ORDER BY c.relname
+            """
+        )
+        partitions = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        
+        archived = {}
+        for partition in partitions:
+            month = partition[len('messages_p'):]
+            if month >= cutoff or time.monotonic() >= deadline:
+                continue
+            archived[month] = archive_partition(conn, partition, month)
+        
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {
+            'success': True,
+            'archived': archived,
+            'complete': time.monotonic() < deadline
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('POST', 'fanout')
+def run_fanout(event: dict, dsn: str) -> dict:
+    try:
+        result = drain_fanout(dsn, SWEEP_TIME_BUDGET)
+        
+        return json_response(200, {'success': True, **result})
+        
+    except Exception as e:
+        return error_response(500, str(e))
+
+@router.route('POST', 'suggestions')
+def run_suggestions(event: dict, dsn: str) -> dict:
+    try:
+        result = refresh_suggestions(dsn, SWEEP_TIME_BUDGET)
+        
+        return json_response(200, {'success': True, **result})
+        
+    except Exception as e:
+        return error_response(500, str(e))
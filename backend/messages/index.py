@@ -0,0 +1,482 @@
+import json
+import os
+import sys
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import get_pool
+from shared.http import Router, json_response, error_response
+from shared.auth import authenticate
+from shared.archive import read_archived_history, archived_message_exists
+from shared.blobs import is_sha256, fetch_readable_blob
+from shared.fanout import FANOUT_INLINE_LIMIT, FANOUT_BATCH_SIZE, FANOUT_WORKERS
+from shared.pagination import encode_cursor, decode_cursor, clamp_limit
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+INBOX_PAGE_SIZE = 100
+INBOX_MAX_PAGE_SIZE = 500
+PREVIEW_LENGTH = 200
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+SEARCH_MAX_CANDIDATES = 1000
+SEARCH_HEADLINE_OPTIONS = 'MaxFragments=1, MaxWords=20, MinWords=5, StartSel=<b>, StopSel=</b>'
+MESSAGE_COLUMNS = "id, chat_id, sender_id, content, message_type, created_at, edited_at, is_archived, attachment_sha256, attachment_name"
+ATTACHMENT_MESSAGE_TYPES = ('image', 'video', 'audio')
+
+router = Router('OfChat Messages API')
+
+def handler(event: dict, context) -> dict:
+    '''API для отправки сообщений, списка чатов, поиска и постраничной загрузки истории'''
+    return router(event, context)
+
+def is_chat_member(cursor, chat_id, user_id) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM chat_members WHERE chat_id = %s AND user_id = %s",
+        (chat_id, user_id)
+    )
+    return cursor.fetchone() is not None
+
+@router.route('POST', 'send')
+def send_message(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        body = json.loads(event.get('body', '{}'))
+        chat_id = body.get('chat_id')
+        sender_id = claims['user_id']
+        content = (body.get('content') or '').strip()
+        message_type = body.get('message_type') or 'text'
+        attachment_sha256 = (body.get('attachment_sha256') or '').lower() or None
+        attachment_name = (body.get('attachment_name') or '').strip()[:255] or None
+        
+        if not chat_id or not (content or attachment_sha256):
+            return error_response(400, 'chat_id and content or attachment_sha256 are required')
+        
+        if attachment_sha256 is not None and not is_sha256(attachment_sha256):
+            return error_response(400, 'attachment_sha256 must be 64 hex characters')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        if attachment_sha256 is not None:
+            blob = fetch_readable_blob(cursor, attachment_sha256, sender_id)
+            if not blob:
+                cursor.close()
+                get_pool(dsn).putconn(conn)
+                return error_response(404, 'Attachment not found')
+            kind = blob['mime_type'].split('/')[0]
+            message_type = kind if kind in ATTACHMENT_MESSAGE_TYPES else 'file'
+        
+        cursor.execute(
+            f"""
+            WITH inserted AS (
+                INSERT INTO messages (chat_id, sender_id, content, message_type, attachment_sha256, attachment_name)
+                SELECT %(chat_id)s::integer, %(sender_id)s, %(content)s, %(message_type)s,
+                       %(attachment_sha256)s, %(attachment_name)s
+                WHERE EXISTS (SELECT 1 FROM chat_members WHERE chat_id = %(chat_id)s::integer AND user_id = %(sender_id)s)
+                RETURNING {MESSAGE_COLUMNS}
+            ),
+            target AS (
+                SELECT member_count FROM chats WHERE id = %(chat_id)s::integer
+            ),
+            chat AS (
+                UPDATE chats c
+                SET last_message_id = i.id, last_message_at = i.created_at, last_activity_at = i.created_at
+                FROM inserted i
+                WHERE c.id = i.chat_id
+                  AND (c.last_message_at IS NULL OR (c.last_message_at, c.last_message_id) < (i.created_at, i.id))
+            ),
+            members AS (
+                UPDATE chat_members cm
+                SET last_activity_at = GREATEST(cm.last_activity_at, i.created_at),
+                    unread_count = CASE WHEN cm.user_id = i.sender_id THEN 0 ELSE cm.unread_count + 1 END,
+                    last_read_message_id = CASE WHEN cm.user_id = i.sender_id
+                        THEN GREATEST(cm.last_read_message_id, i.id) ELSE cm.last_read_message_id END
+                FROM inserted i
+                WHERE cm.chat_id = i.chat_id
+                  AND (cm.user_id = i.sender_id OR (SELECT member_count FROM target) <= %(inline_limit)s)
+            ),
+            jobs AS (
+                INSERT INTO fanout_jobs (chat_id, message_id, message_created_at, sender_id, shard, shards)
+                SELECT i.chat_id, i.id, i.created_at, i.sender_id, shard, t.shards
+                FROM inserted i
+                CROSS JOIN (
+                    SELECT LEAST(%(workers)s, CEIL(member_count::numeric / %(batch_size)s))::integer AS shards
+                    FROM target
+                    WHERE member_count > %(inline_limit)s
+                ) t
+                CROSS JOIN generate_series(0, t.shards - 1) AS shard
+            ),
+            feed AS (
+                SELECT record_user_changes('chat', array_agg(cm.user_id), array_agg(cm.chat_id), array_agg(cm.chat_id),
+                                           array_agg(i.id), false) AS recorded
+                FROM inserted i
+                JOIN chat_members cm ON cm.chat_id = i.chat_id
+                WHERE (SELECT member_count FROM target) <= %(inline_limit)s
+            )
+            SELECT inserted.* FROM inserted, feed
+            """,
+            {
+                'chat_id': chat_id,
+                'sender_id': sender_id,
+                'content': content,
+                'message_type': message_type,
+                'attachment_sha256': attachment_sha256,
+                'attachment_name': attachment_name,
+                'inline_limit': FANOUT_INLINE_LIMIT,
+                'workers': FANOUT_WORKERS,
+                'batch_size': FANOUT_BATCH_SIZE
+            }
+        )
+        
+        message = cursor.fetchone()
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        if not message:
+            return error_response(403, 'Not a member of this chat')
+        
+        return json_response(201, {
+            'success': True,
+            'message': dict(message)
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'history')
+def get_history(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        chat_id = query_params.get('chat_id')
+        user_id = claims['user_id']
+        before = query_params.get('before', '')
+        include_archived = query_params.get('include_archived', 'false').lower() in ('1', 'true')
+        
+        if not chat_id:
+            return error_response(400, 'chat_id is required')
+        
+        try:
+            limit = clamp_limit(query_params.get('limit'), HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
+            before_created_at, before_id = decode_cursor(before, 2) if before else (None, None)
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid limit or cursor')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        if not is_chat_member(cursor, chat_id, user_id):
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            return error_response(403, 'Not a member of this chat')
+        
+        conditions = ["chat_id = %s"]
+        params = [chat_id]
+        if before_id is not None:
+            conditions.append("created_at <= %s AND (created_at, id) < (%s, %s)")
+            params.extend([before_created_at, before_created_at, before_id])
+        if not include_archived:
+            conditions.append("is_archived = false")
+        params.append(limit + 1)
+        
+        cursor.execute(
+            f"""
+            SELECT {MESSAGE_COLUMNS}
+            FROM messages
+            WHERE {' AND '.join(conditions)}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+            """,
+            params
+        )
+        
+        messages = [dict(row) for row in cursor.fetchall()]
+        
+        if len(messages) <= limit:
+            if messages:
+                archive_before = (messages[-1]['created_at'].isoformat(), messages[-1]['id'])
+            else:
+                archive_before = (before_created_at, before_id) if before_id is not None else None
+            messages.extend(read_archived_history(cursor, chat_id, archive_before, limit + 1 - len(messages), include_archived))
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = encode_cursor(messages[-1]['created_at'].isoformat(), messages[-1]['id'])
+        
+        return json_response(200, {
+            'success': True,
+            'messages': messages,
+            'count': len(messages),
+            'next_cursor': next_cursor
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'inbox')
+def get_inbox(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        
+        try:
+            limit = clamp_limit(query_params.get('limit'), INBOX_PAGE_SIZE, INBOX_MAX_PAGE_SIZE)
+            after_activity_at, after_chat_id = decode_cursor(query_params['cursor'], 2) if query_params.get('cursor') else (None, None)
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid limit or cursor')
+        
+        conditions = ["cm.user_id = %s"]
+        params = [PREVIEW_LENGTH, claims['user_id']]
+        if after_chat_id is not None:
+            conditions.append("(cm.last_activity_at, cm.chat_id) < (%s, %s)")
+            params.extend([after_activity_at, after_chat_id])
+        params.append(limit + 1)
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            f"""
+            SELECT c.id, c.chat_type, c.name, c.avatar_url, cm.role, cm.unread_count, cm.last_read_message_id,
+                   cm.last_activity_at, c.last_message_id, m.sender_id AS last_message_sender_id,
+                   m.message_type AS last_message_type, left(m.content, %s) AS last_message_preview,
+                   m.created_at AS last_message_at
+            FROM chat_members cm
+            JOIN chats c ON c.id = cm.chat_id
+            LEFT JOIN messages m ON m.id = c.last_message_id AND m.created_at = c.last_message_at
+            WHERE {' AND '.join(conditions)}
+            ORDER BY cm.last_activity_at DESC, cm.chat_id DESC
+            LIMIT %s
+            """,
+            params
+        )
+        
+        chats = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        next_cursor = None
+        if len(chats) > limit:
+            chats = chats[:limit]
+            next_cursor = encode_cursor(chats[-1]['last_activity_at'].isoformat(), chats[-1]['id'])
+        
+        return json_response(200, {
+            'success': True,
+            'chats': chats,
+            'count': len(chats),
+            'next_cursor': next_cursor
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('POST', 'read')
+def mark_read(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        body = json.loads(event.get('body', '{}'))
+        chat_id = body.get('chat_id')
+        message_id = body.get('message_id')
+        user_id = claims['user_id']
+        
+        if not chat_id:
+            return error_response(400, 'chat_id is required')
+        
+        try:
+            message_id = int(message_id) if message_id is not None else None
+        except (ValueError, TypeError):
+            return error_response(400, 'message_id must be an integer')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            """
+            SELECT COALESCE(c.last_message_id, 0) AS last_message_id, cm.last_read_message_id, cm.unread_count
+            FROM chat_members cm
+            JOIN chats c ON c.id = cm.chat_id
+            WHERE cm.chat_id = %s AND cm.user_id = %s
+            FOR UPDATE OF cm
+            """,
+            (chat_id, user_id)
+        )
+        
+        state = cursor.fetchone()
+        
+        if not state:
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            return error_response(403, 'Not a member of this chat')
+        
+        if message_id is not None:
+            cursor.execute(
+                "SELECT EXISTS (SELECT 1 FROM messages WHERE id = %s AND chat_id = %s) AS live",
+                (message_id, chat_id)
+            )
+            if not cursor.fetchone()['live'] and not archived_message_exists(cursor, chat_id, message_id):
+                cursor.close()
+                get_pool(dsn).putconn(conn)
+                return error_response(404, 'Message not found')
+        
+        target = state['last_message_id'] if message_id is None else min(message_id, state['last_message_id'])
+        last_read = state['last_read_message_id']
+        unread = state['unread_count']
+        
+        if target > last_read:
+            if target >= state['last_message_id']:
+                unread = 0
+            else:
+                cursor.execute(
+                    """
+                    SELECT count(*) AS unread
+                    FROM messages
+                    WHERE chat_id = %(chat_id)s AND id > %(target)s AND sender_id IS DISTINCT FROM %(user_id)s
+                      AND created_at >= COALESCE((SELECT created_at FROM messages WHERE id = %(target)s AND chat_id = %(chat_id)s), '-infinity')
+                    """,
+                    {'chat_id': chat_id, 'target': target, 'user_id': user_id}
+                )
+                unread = cursor.fetchone()['unread']
+            cursor.execute(
+                "UPDATE chat_members SET last_read_message_id = %s, unread_count = %s WHERE chat_id = %s AND user_id = %s",
+                (target, unread, chat_id, user_id)
+            )
+            last_read = target
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {
+            'success': True,
+            'chat_id': int(chat_id),
+            'last_read_message_id': last_read,
+            'unread_count': unread
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'search')
+def search_messages(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        search_query = query_params.get('q', '').strip()
+        chat_id = query_params.get('chat_id')
+        
+        if not search_query:
+            return error_response(400, 'Search query is required')
+        
+        try:
+            limit = clamp_limit(query_params.get('limit'), SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+            after = decode_cursor(query_params['cursor'], 3) if query_params.get('cursor') else None
+            chat_id = int(chat_id) if chat_id else None
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid limit, cursor or chat_id')
+        
+        scope = "SELECT chat_id FROM chat_members WHERE user_id = %(user_id)s"
+        if chat_id is not None:
+            scope += " AND chat_id = %(chat_id)s"
+        page_condition = "(rank, created_at, id) < (%(after_rank)s::real, %(after_created_at)s, %(after_id)s)" if after else "true"
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            f"""
+            WITH query AS (
+                SELECT websearch_to_tsquery('russian', %(q)s) || websearch_to_tsquery('simple', %(q)s) AS q
+            ),
+            candidates AS (
+                SELECT m.id, m.chat_id, m.sender_id, m.content, m.message_type, m.created_at, m.edited_at,
+                       m.attachment_sha256, m.attachment_name, ts_rank(m.search_vector, query.q) AS rank
+                FROM messages m, query
+                WHERE m.chat_id = ANY(ARRAY({scope}))
+                  AND m.search_vector @@ query.q
+                  AND m.is_archived = false
+                ORDER BY m.created_at DESC, m.id DESC
+                LIMIT %(candidates)s
+            )
+            SELECT c.id, c.chat_id, c.sender_id, c.message_type, c.created_at, c.edited_at, c.rank,
+                   c.attachment_sha256, c.attachment_name, ts_headline('russian', c.content, query.q, %(headline)s) AS headline
+            FROM candidates c, query
+            WHERE {page_condition}
+            ORDER BY c.rank DESC, c.created_at DESC, c.id DESC
+            LIMIT %(limit)s
+            """,
+            {
+                'q': search_query,
+                'user_id': claims['user_id'],
+                'chat_id': chat_id,
+                'candidates': SEARCH_MAX_CANDIDATES,
+                'headline': SEARCH_HEADLINE_OPTIONS,
+                'after_rank': after[0] if after else None,
+                'after_created_at': after[1] if after else None,
+                'after_id': after[2] if after else None,
+                'limit': limit + 1
+            }
+        )
+        
+        results = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            last = results[-1]
+            next_cursor = encode_cursor(last['rank'], last['created_at'].isoformat(), last['id'])
+        
+        return json_response(200, {
+            'success': True,
+            'messages': results,
+            'count': len(results),
+            'next_cursor': next_cursor
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
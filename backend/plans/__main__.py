@@ -0,0 +1,99 @@
+import argparse
+import os
+import secrets
+import sys
+
+from bench.harness import Client, install_pool, save_report
+from plans.cases import Probe, build_cases, case_event
+from plans.checks import (budget_for, check_action, format_results, load_budgets, load_relations,
+                          recorded_budgets)
+from plans.schema import apply_migrations, seed
+from shared import telemetry
+
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'budgets.json')
+FUNCTIONS = ('auth', 'users', 'sms', 'messages', 'calls', 'updates')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m plans', description='EXPLAIN every statement the handlers issue and check index usage and cost budgets')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='Postgres DSN of a scratch database, defaults to DATABASE_URL')
+    parser.add_argument('--migrate', action='store_true', help='apply db_migrations to the empty database first')
+    parser.add_argument('--seed', action='store_true', help='seed the database at realistic scale first')
+    parser.add_argument('--scale', type=float, default=1.0, help='seed size multiplier, 1.0 is 100k users and 1M messages')
+    parser.add_argument('--budgets', default=BUDGETS_PATH, help='per-action cost budgets')
+    parser.add_argument('--save-budgets', action='store_true', help='rewrite the budgets file from this run')
+    parser.add_argument('--headroom', type=float, default=0.5, help='cost headroom added by --save-budgets')
+    parser.add_argument('--actions', help='comma-separated action prefixes to check, e.g. users.search,sms')
+    parser.add_argument('--run-id', default=secrets.token_hex(3), help='hex tag that keeps probe rows unique between runs')
+    parser.add_argument('--verbose', action='store_true', help='print every violating statement')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.dsn:
+        print('DATABASE_URL or --dsn is required', file=sys.stderr)
+        return 2
+    try:
+        int(args.run_id, 16)
+    except ValueError:
+        print('--run-id must be hexadecimal', file=sys.stderr)
+        return 2
+
+    os.environ['DATABASE_URL'] = args.dsn
+    os.environ.setdefault('AUTH_TOKEN_SECRET', secrets.token_hex(32))
+    telemetry.REQUEST_LOG_ENABLED = False
+
+    if args.migrate:
+        for name in apply_migrations(args.dsn):
+            print(f'applied {name}', file=sys.stderr)
+    if args.seed:
+        counts = seed(args.dsn, args.scale)
+        print('seeded ' + ', '.join(f'{table}={rows}' for table, rows in counts.items()), file=sys.stderr)
+
+    pool = install_pool(args.dsn, 4)
+    client = Client(list(FUNCTIONS))
+    probe = Probe(client, args.dsn, args.run_id)
+    probe.setup()
+    budgets = load_budgets(args.budgets) if os.path.exists(args.budgets) else {}
+    prefixes = [prefix.strip() for prefix in (args.actions or '').split(',') if prefix.strip()]
+
+    captured = {}
+    statuses = {}
+    for index, case in enumerate(build_cases(probe)):
+        action, function = case[0], case[1]
+        if prefixes and not any(action.startswith(prefix) for prefix in prefixes):
+            continue
+        with telemetry.capture_statements() as statements:
+            response, _, _ = client.call(function, case_event(case, index))
+        captured[action] = statements
+        statuses[action] = response['statusCode']
+
+    conn = pool.getconn()
+    try:
+        relations = load_relations(conn)
+        results = {}
+        for action, statements in captured.items():
+            results[action] = check_action(conn, relations, action, statements, budget_for(budgets, action))
+            if statuses[action] >= 500:
+                results[action]['violations'].append(f'handler returned {statuses[action]}')
+    finally:
+        pool.putconn(conn)
+
+    print(format_results(results))
+    if args.save_budgets:
+        save_report(recorded_budgets(results, args.headroom, budgets), args.budgets)
+        print(f'budgets written to {args.budgets}', file=sys.stderr)
+        return 0
+
+    failures = [(action, violation) for action, result in sorted(results.items()) for violation in result['violations']]
+    if failures:
+        print(f'{len(failures)} plan violations:', file=sys.stderr)
+        for action, violation in failures if args.verbose else failures[:20]:
+            print(f'  {action}: {violation}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import hashlib
+from urllib.parse import quote
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from bench.harness import client_address, make_event
+
+PROBE_PASSWORD = 'plans-password-1'
+PROBE_CHATS = 300
+PROBE_CONTACTS = 400
+
+
+class Probe:
+    '''Активный пользователь с сотнями чатов и контактов, от имени которого вызываются действия'''
+
+    def __init__(self, client, dsn: str, run_id: str):
+        self.client = client
+        self.dsn = dsn
+        self.run_id = run_id
+
+    def setup(self):
+        username = f'plans{self.run_id}'
+        status, payload = self.client.request('auth', 'POST', '/?action=register', {
+            'username': username,
+            'email': f'{username}@plans.ofchat.local',
+            'phone': f'+7997{int(self.run_id, 16) % 10000000:07d}',
+            'password': PROBE_PASSWORD
+        })
+        if status != 201:
+            raise RuntimeError(f'Probe registration failed with {status}: {payload}')
+        self.user = payload['user']
+        self.token = payload['token']
+
+        conn = psycopg2.connect(self.dsn)
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(
+                """
+                INSERT INTO chat_members (chat_id, user_id, last_activity_at, last_read_message_id)
+                SELECT id, %s, last_activity_at, 0 FROM chats ORDER BY member_count DESC, id LIMIT %s
+                ON CONFLICT DO NOTHING
+                """,
+                (self.user['id'], PROBE_CHATS)
+            )
+            cursor.execute(
+                """
+                INSERT INTO contacts (user_id, contact_user_id)
+                SELECT %s, id FROM users WHERE id <> %s ORDER BY md5(id::text) LIMIT %s
+                ON CONFLICT DO NOTHING
+                """,
+                (self.user['id'], self.user['id'], PROBE_CONTACTS)
+            )
+            cursor.execute(
+                """
+                SELECT c.id, c.last_message_id
+                FROM chat_members cm
+                JOIN chats c ON c.id = cm.chat_id
+                WHERE cm.user_id = %s AND c.last_message_id IS NOT NULL
+                ORDER BY c.member_count DESC, c.id
+                LIMIT 1
+                """,
+                (self.user['id'],)
+            )
+            chat = cursor.fetchone()
+            cursor.execute(
+                "SELECT id, unique_id, username, phone FROM users WHERE id <> %s ORDER BY md5(id::text) LIMIT 20",
+                (self.user['id'],)
+            )
+            self.others = [dict(row) for row in cursor.fetchall()]
+            conn.commit()
+        finally:
+            conn.close()
+
+        if chat is None:
+            raise RuntimeError('Seeded database has no chats with messages, run with --seed first')
+        self.chat_id = chat['id']
+        self.message_id = chat['last_message_id']
+
+    def headers(self) -> dict:
+        return {'X-Auth-Token': self.token}
+
+
+def build_cases(probe: Probe) -> list:
+    other = probe.others[0]
+    ids = ','.join(str(user['id']) for user in probe.others)
+    phone = f'+7996{int(probe.run_id, 16) % 10000000:07d}'
+    auth = probe.headers()
+    sha256 = hashlib.sha256(probe.run_id.encode()).hexdigest()
+    return [
+        ('auth.register', 'auth', 'POST', '/?action=register', {
+            'username': f'plans{probe.run_id}x',
+            'email': f'plans{probe.run_id}x@plans.ofchat.local',
+            'password': PROBE_PASSWORD
+        }, None),
+        ('auth.login', 'auth', 'POST', '/?action=login', {'identifier': probe.user['username'], 'password': PROBE_PASSWORD}, None),
+        ('auth.profile', 'auth', 'GET', f'/?action=profile&user_id={other["id"]}', None, auth),
+        ('auth.profiles', 'auth', 'GET', f'/?action=profiles&ids={ids}', None, auth),
+        ('auth.update_profile', 'auth', 'POST', '/?action=update_profile', {'bio': 'plans probe'}, auth),
+        ('users.search:exact', 'users', 'GET', f'/?action=search&q={quote("#" + other["unique_id"])}', None, None),
+        ('users.search:prefix', 'users', 'GET', f'/?action=search&q={quote("@" + other["username"][:5])}', None, None),
+        ('users.search:similar', 'users', 'GET', f'/?action=search&q={quote(other["username"][2:8])}', None, None),
+        ('users.add_contact', 'users', 'POST', '/?action=add_contact', {'contact_user_id': other['id']}, auth),
+        ('users.remove_contact', 'users', 'POST', '/?action=remove_contact', {'contact_user_id': other['id']}, auth),
+        ('users.sync_contacts', 'users', 'POST', '/?action=sync_contacts',
+         {'phones': [user['phone'] for user in probe.others if user['phone']]}, auth),
+        ('users.contacts', 'users', 'GET', '/?action=contacts', None, auth),
+        ('users.suggestions', 'users', 'GET', '/?action=suggestions', None, auth),
+        ('users.heartbeat', 'users', 'POST', '/?action=heartbeat', {}, auth),
+        ('users.presence', 'users', 'GET', f'/?action=presence&ids={ids}', None, auth),
+        ('sms.send', 'sms', 'POST', '/?action=send', {'phone': phone}, None),
+        ('sms.verify', 'sms', 'POST', '/?action=verify', {'phone': phone, 'code': '000000'}, None),
+        ('messages.send', 'messages', 'POST', '/?action=send', {'chat_id': probe.chat_id, 'content': 'проверка планов'}, auth),
+        ('messages.history', 'messages', 'GET', f'/?action=history&chat_id={probe.chat_id}', None, auth),
+        ('messages.inbox', 'messages', 'GET', '/?action=inbox', None, auth),
+        ('messages.read', 'messages', 'POST', '/?action=read', {'chat_id': probe.chat_id, 'message_id': probe.message_id}, auth),
+        ('messages.search', 'messages', 'GET', f'/?action=search&q={quote("встреча")}', None, auth),
+        ('calls.log', 'calls', 'POST', '/?action=log', {'receiver_id': other['id'], 'call_type': 'audio'}, auth),
+        ('calls.history', 'calls', 'GET', '/?action=history', None, auth),
+        ('calls.stats', 'calls', 'GET', '/?action=stats&days=90', None, auth),
+        ('attachments.init', 'attachments', 'POST', '/?action=init',
+         {'size': 1024, 'mime_type': 'image/jpeg', 'file_name': 'plans.jpg', 'sha256': sha256}, auth),
+        ('attachments.download', 'attachments', 'GET', f'/?action=download&sha256={sha256}', None, auth),
+        ('updates.poll', 'updates', 'GET', f'/?action=poll&timeout=0&since={max(probe.message_id - 1000, 0)}', None, auth),
+        ('updates.sync:snapshot', 'updates', 'GET', '/?action=sync', None, auth),
+        ('updates.sync:changes', 'updates', 'GET', '/?action=sync&since=1', None, auth),
+        ('auth.logout', 'auth', 'POST', '/?action=logout', {}, auth)
+    ]
+
+
+def case_event(case: tuple, index: int) -> dict:
+    action, function, method, path, body, headers = case
+    return make_event(method, path, body, headers, client_address(index))
@@ -0,0 +1,104 @@
+import json
+
+import psycopg2
+
+SEQ_SCAN_MIN_ROWS = 10000
+EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+
+def load_relations(conn) -> dict:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT c.relname, COALESCE(p.relname, c.relname), GREATEST(c.reltuples, 0)::bigint
+            FROM pg_class c
+            LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+            LEFT JOIN pg_class p ON p.oid = i.inhparent
+            WHERE c.relkind IN ('r', 'p') AND c.relnamespace = 'public'::regnamespace
+            """
+        )
+        return {name: {'table': parent, 'rows': rows} for name, parent, rows in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def explain(conn, statement: str, vars=None):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, vars)
+        plan = cursor.fetchone()[0]
+        return (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']
+    finally:
+        cursor.close()
+        conn.rollback()
+
+
+def walk(node: dict):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk(child)
+
+
+def is_explainable(statement: str) -> bool:
+    return statement.lstrip().lower().startswith(EXPLAINABLE)
+
+
+def check_action(conn, relations: dict, action: str, statements: list, budget: dict) -> dict:
+    allowed = set(budget.get('allow_seq_scan', ()))
+    max_cost = budget.get('max_cost')
+    result = {'statements': 0, 'max_cost': 0.0, 'seq_scans': [], 'violations': []}
+    unique = {}
+    for statement, vars in statements:
+        unique.setdefault(statement, vars)
+    for statement, vars in unique.items():
+        if not is_explainable(statement):
+            continue
+        try:
+            plan = explain(conn, statement, vars)
+        except psycopg2.Error as e:
+            result['violations'].append(f'EXPLAIN failed: {str(e).strip()}: {statement[:200]}')
+            continue
+        result['statements'] += 1
+        cost = plan['Total Cost']
+        result['max_cost'] = max(result['max_cost'], cost)
+        if max_cost is not None and cost > max_cost:
+            result['violations'].append(f'cost {cost:.0f} over budget {max_cost}: {statement[:200]}')
+        for node in walk(plan):
+            if node['Node Type'] != 'Seq Scan':
+                continue
+            relation = relations.get(node.get('Relation Name'), {'table': node.get('Relation Name'), 'rows': 0})
+            if relation['table'] in allowed or relation['rows'] < SEQ_SCAN_MIN_ROWS:
+                continue
+            result['seq_scans'].append(relation['table'])
+            result['violations'].append(
+                f'Seq Scan on {node["Relation Name"]} ({relation["rows"]} rows): {statement[:200]}'
+            )
+    result['max_cost'] = round(result['max_cost'], 2)
+    return result
+
+
+def load_budgets(path: str) -> dict:
+    with open(path) as source:
+        return json.load(source)
+
+
+def budget_for(budgets: dict, action: str) -> dict:
+    return {**budgets.get('default', {}), **budgets.get('actions', {}).get(action, {})}
+
+
+def recorded_budgets(results: dict, headroom: float, previous: dict) -> dict:
+    actions = {action: dict(budget) for action, budget in previous.get('actions', {}).items()}
+    for action, result in results.items():
+        actions.setdefault(action, {})['max_cost'] = round(max(result['max_cost'], 1.0) * (1 + headroom))
+    return {'default': previous.get('default', {}), 'actions': dict(sorted(actions.items()))}
+
+
+def format_results(results: dict) -> str:
+    columns = ('statements', 'max_cost', 'seq_scans', 'violations')
+    width = max([len('action')] + [len(action) for action in results])
+    lines = ['action'.ljust(width) + ''.join(column.rjust(12) for column in columns)]
+    for action, result in sorted(results.items()):
+        values = (result['statements'], result['max_cost'], len(result['seq_scans']), len(result['violations']))
+        lines.append(action.ljust(width) + ''.join(str(value).rjust(12) for value in values))
+    return '\n'.join(lines)
@@ -0,0 +1,49 @@
+import os
+import re
+
+import psycopg2
+
+from datagen.loader import load
+from datagen.rows import Dataset
+from shared.functions import BACKEND_DIR
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(BACKEND_DIR), 'db_migrations')
+MIGRATION_NAME = re.compile(r'^V(\d+)__.+\.sql$')
+SEED_SIZES = {
+    'users': 100000,
+    'chats': 20000,
+    'messages': 1000000
+}
+SEED_MONTHS = 6
+
+
+def migration_files() -> list:
+    names = [name for name in os.listdir(MIGRATIONS_DIR) if MIGRATION_NAME.match(name)]
+    return sorted(names, key=lambda name: int(MIGRATION_NAME.match(name).group(1)))
+
+
+def apply_migrations(dsn: str) -> list:
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT to_regclass('users') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            raise RuntimeError('Database already has a schema, --migrate needs an empty database')
+        applied = []
+        for name in migration_files():
+            with open(os.path.join(MIGRATIONS_DIR, name)) as source:
+                cursor.execute(source.read())
+            applied.append(name)
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def seed(dsn: str, scale: float = 1.0, workers: int = 4) -> dict:
+    dataset = Dataset(**{key: max(1, int(value * scale)) for key, value in SEED_SIZES.items()}, months=SEED_MONTHS)
+    stats = load(dsn, dataset, workers)
+    return {table: values['rows'] for table, values in stats.items() if table != 'total'}
@@ -0,0 +1,77 @@
+import argparse
+import os
+import secrets
+import sys
+import tempfile
+
+from bench.harness import Client, install_pool
+from plans.schema import apply_migrations
+from scenarios.runner import Cast, run_function
+from shared import telemetry
+from shared.functions import BACKEND_DIR, discover_functions
+
+FUNCTION_ORDER = ('auth', 'users', 'sms', 'messages', 'calls', 'attachments', 'updates', 'maintenance')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m scenarios', description='Run every function\'s tests.json in-process against a local Postgres')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='Postgres DSN of a scratch database, defaults to DATABASE_URL')
+    parser.add_argument('--migrate', action='store_true', help='apply db_migrations to the empty database first')
+    parser.add_argument('--functions', help='comma-separated functions to run, all by default')
+    parser.add_argument('--run-id', default=secrets.token_hex(3), help='hex tag that keeps the cast\'s rows unique between runs')
+    parser.add_argument('--verbose', action='store_true', help='print passing scenarios too')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.dsn:
+        print('DATABASE_URL or --dsn is required', file=sys.stderr)
+        return 2
+    try:
+        int(args.run_id, 16)
+    except ValueError:
+        print('--run-id must be hexadecimal', file=sys.stderr)
+        return 2
+
+    os.environ['DATABASE_URL'] = args.dsn
+    os.environ.setdefault('AUTH_TOKEN_SECRET', secrets.token_hex(32))
+    os.environ.setdefault('MAINTENANCE_TOKEN', secrets.token_hex(16))
+    if not os.environ.get('ATTACHMENTS_DIR'):
+        os.environ['ATTACHMENTS_DIR'] = tempfile.mkdtemp(prefix='ofchat-scenarios-')
+    telemetry.REQUEST_LOG_ENABLED = False
+
+    if args.migrate:
+        for name in apply_migrations(args.dsn):
+            print(f'applied {name}', file=sys.stderr)
+
+    available = [name for name in discover_functions() if os.path.isfile(os.path.join(BACKEND_DIR, name, 'tests.json'))]
+    selected = [name.strip() for name in args.functions.split(',')] if args.functions else available
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        print(f'Unknown functions: {", ".join(unknown)}', file=sys.stderr)
+        return 2
+    functions = sorted(selected, key=lambda name: (FUNCTION_ORDER.index(name) if name in FUNCTION_ORDER else len(FUNCTION_ORDER), name))
+
+    install_pool(args.dsn, 4)
+    client = Client(available)
+    variables = Cast(client, args.dsn, args.run_id).setup()
+    variables['maintenance_token'] = os.environ['MAINTENANCE_TOKEN']
+
+    failures = 0
+    for offset, function in enumerate(functions):
+        for name, problems in run_function(client, function, variables, (offset + 1) * 100):
+            if problems:
+                failures += 1
+                print(f'FAIL {name}')
+                for problem in problems:
+                    print(f'  {problem}')
+            elif args.verbose:
+                print(f'ok   {name}')
+
+    print(f'{failures} failed' if failures else 'all scenarios passed', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
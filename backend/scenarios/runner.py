@@ -0,0 +1,163 @@
+import base64
+import json
+import re
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from bench.harness import client_address, load_scenarios, make_event
+
+CAST_PASSWORD = 'scenario-password-1'
+CAST = ('alice', 'bob', 'carol')
+PLACEHOLDER_PATTERN = re.compile(r'\{\{([\w.]+)\}\}')
+TYPE_NAMES = {'string': str, 'number': (int, float), 'boolean': bool, 'array': list, 'object': dict}
+
+
+class Cast:
+    '''Зарегистрированные через сами обработчики пользователи и общий чат, на которые ссылаются сценарии'''
+
+    def __init__(self, client, dsn: str, run_id: str):
+        self.client = client
+        self.dsn = dsn
+        self.run_id = run_id
+
+    def setup(self) -> dict:
+        variables = {'run': self.run_id}
+        for index, name in enumerate(CAST):
+            username = f'{name}{self.run_id}'
+            digits = f'995{int(self.run_id, 16) % 1000000:06d}{index}'
+            status, payload = self.client.request('auth', 'POST', '/?action=register', {
+                'username': username,
+                'email': f'{username}@scenarios.ofchat.local',
+                'phone': f'+7{digits}',
+                'password': CAST_PASSWORD
+            }, ip=client_address(index))
+            if status != 201:
+                raise RuntimeError(f'Registration of {name} failed with {status}: {payload}')
+            variables[name] = {
+                **payload['user'],
+                'token': payload['token'],
+                'password': CAST_PASSWORD,
+                'local_phone': f'8 ({digits[:3]}) {digits[3:6]}-{digits[6:8]}-{digits[8:]}'
+            }
+
+        conn = psycopg2.connect(self.dsn)
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(
+                "INSERT INTO chats (chat_type, created_by) VALUES ('private', %s) RETURNING id",
+                (variables['alice']['id'],)
+            )
+            chat = cursor.fetchone()
+            cursor.execute(
+                "INSERT INTO chat_members (chat_id, user_id) SELECT %s, unnest(%s::integer[])",
+                (chat['id'], [variables['alice']['id'], variables['bob']['id']])
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        variables['chat'] = {'id': chat['id']}
+        return variables
+
+
+def lookup(values, path: str):
+    for part in path.split('.'):
+        values = values[int(part)] if isinstance(values, list) else values[part]
+    return values
+
+
+def substitute(value, variables: dict):
+    if isinstance(value, str):
+        whole = PLACEHOLDER_PATTERN.fullmatch(value)
+        if whole:
+            return lookup(variables, whole.group(1))
+        return PLACEHOLDER_PATTERN.sub(lambda match: str(lookup(variables, match.group(1))), value)
+    if isinstance(value, list):
+        return [substitute(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, variables) for key, item in value.items()}
+    return value
+
+
+def mismatches(expected, actual, partial: bool, path: str = 'body') -> list:
+    if isinstance(expected, str) and expected in TYPE_NAMES:
+        if isinstance(actual, TYPE_NAMES[expected]) and not (expected == 'number' and isinstance(actual, bool)):
+            return []
+        return [f'{path}: expected {expected}, got {actual!r}']
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return [f'{path}: expected an object, got {actual!r}']
+        problems = [f'{path}.{key}: unexpected' for key in actual if not partial and key not in expected]
+        for key, value in expected.items():
+            if key not in actual:
+                problems.append(f'{path}.{key}: missing')
+            else:
+                problems.extend(mismatches(value, actual[key], partial, f'{path}.{key}'))
+        return problems
+    if isinstance(expected, list):
+        if not isinstance(actual, list):
+            return [f'{path}: expected an array, got {actual!r}']
+        if not partial or not expected:
+            if len(expected) != len(actual):
+                return [f'{path}: expected {len(expected)} items, got {len(actual)}']
+            return [problem for index, (item, other) in enumerate(zip(expected, actual))
+                    for problem in mismatches(item, other, partial, f'{path}.{index}')]
+        return [f'{path}: no item matches {item!r}' for item in expected
+                if all(mismatches(item, other, partial) for other in actual)]
+    if expected != actual or isinstance(expected, bool) != isinstance(actual, bool):
+        return [f'{path}: expected {expected!r}, got {actual!r}']
+    return []
+
+
+def build_event(scenario: dict, index: int) -> dict:
+    body = scenario.get('body')
+    event = make_event(scenario['method'], scenario['path'], body if not isinstance(body, str) else None,
+                       scenario.get('headers'), client_address(index))
+    if isinstance(body, str):
+        event['body'] = body
+    return event
+
+
+def decode_body(response: dict):
+    body = response.get('body') or ''
+    if response.get('isBase64Encoded'):
+        return base64.b64decode(body).decode('latin-1')
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return body
+
+
+def run_scenario(client, function: str, scenario: dict, variables: dict, index: int) -> list:
+    scenario = {**scenario, **substitute({key: scenario[key] for key in ('path', 'body', 'headers') if key in scenario}, variables)}
+    response, _, _ = client.call(scenario.get('function', function), build_event(scenario, index))
+    payload = decode_body(response)
+    headers = response.get('headers') or {}
+    partial = scenario.get('bodyMatcher', 'partial') == 'partial'
+
+    problems = []
+    if response['statusCode'] != scenario['expectedStatus']:
+        problems.append(f'status: expected {scenario["expectedStatus"]}, got {response["statusCode"]}: {payload!r}')
+    if 'expectedBody' in scenario:
+        problems.extend(mismatches(substitute(scenario['expectedBody'], variables), payload, partial))
+    if 'expectedHeaders' in scenario:
+        problems.extend(mismatches(substitute(scenario['expectedHeaders'], variables), headers, True, 'headers'))
+    if problems:
+        return problems
+
+    for name, path in (scenario.get('capture') or {}).items():
+        variables[name] = lookup(payload, path)
+    for name, header in (scenario.get('captureHeaders') or {}).items():
+        variables[name] = headers[header]
+    return []
+
+
+def run_function(client, function: str, variables: dict, offset: int = 0) -> list:
+    results = []
+    for index, scenario in enumerate(load_scenarios(function)):
+        try:
+            problems = run_scenario(client, function, scenario, variables, offset + index)
+        except (KeyError, IndexError, ValueError) as e:
+            problems = [f'{type(e).__name__}: {e}']
+        results.append((f'{function}: {scenario["name"]}', problems))
+    return results
@@ -0,0 +1,78 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+
+from server.app import FanoutLoop, FunctionServer
+from shared.db import ConnectionPool, register_pool
+from shared.functions import discover_functions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m server', description='Serve every function from one long-lived process')
+    parser.add_argument('--host', default=os.environ.get('SERVER_HOST', '0.0.0.0'), help='address to bind')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SERVER_PORT', '8080')), help='port to bind')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='Postgres DSN, defaults to DATABASE_URL')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVER_WORKERS', '64')), help='connections served concurrently')
+    parser.add_argument('--db-pool-size', type=int, default=int(os.environ.get('SERVER_DB_POOL_SIZE', '20')), help='shared Postgres connections')
+    parser.add_argument('--max-long-polls', type=int, default=int(os.environ.get('POLL_MAX_WAITERS', '0')) or None, help='long-polls allowed to wait at once, defaults to three quarters of --workers')
+    parser.add_argument('--keepalive-timeout', type=float, default=5.0, help='seconds an idle keep-alive connection stays open')
+    parser.add_argument('--function-timeout', type=float, default=30.0, help='seconds reported to handlers as their time budget')
+    parser.add_argument('--functions', default=','.join(discover_functions()), help='comma-separated functions to mount')
+    parser.add_argument('--fanout-interval', type=float, default=1.0, help='seconds between fan-out queue drains, 0 disables')
+    parser.add_argument('--drain-timeout', type=float, default=30.0, help='seconds to finish in-flight requests on shutdown')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.dsn:
+        print('DATABASE_URL or --dsn is required', file=sys.stderr)
+        return 2
+
+    names = [name.strip() for name in args.functions.split(',') if name.strip()]
+    unknown = [name for name in names if name not in discover_functions()]
+    if unknown:
+        print(f'Unknown functions: {", ".join(unknown)}', file=sys.stderr)
+        return 2
+
+    os.environ['DATABASE_URL'] = args.dsn
+    os.environ['POLL_MAX_WAITERS'] = str(max(1, min(args.max_long_polls or args.workers * 3 // 4, args.workers - 1)))
+    pool = ConnectionPool(args.dsn, max_size=max(args.db_pool_size, 1))
+    register_pool(args.dsn, pool)
+
+    server = FunctionServer(
+        (args.host, args.port), args.dsn, names, max(args.workers, 1),
+        args.keepalive_timeout, args.function_timeout
+    )
+    fanout = FanoutLoop(args.dsn, args.fanout_interval, max(1, args.db_pool_size // 4)) if args.fanout_interval > 0 else None
+    stopped = threading.Event()
+
+    def stop(signum, frame):
+        stopped.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    serving = threading.Thread(target=server.serve_forever, name='accept', daemon=True)
+    serving.start()
+    if fanout:
+        fanout.start()
+    print(f'Serving {", ".join(names)} on http://{args.host}:{args.port}', file=sys.stderr)
+
+    while not stopped.wait(1):
+        pass
+
+    print('Draining in-flight requests', file=sys.stderr)
+    if fanout:
+        fanout.stop()
+    server.drain(args.drain_timeout)
+    if fanout:
+        fanout.join(args.drain_timeout)
+    pool.closeall()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import base64
+import json
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from shared.db import get_pool
+from shared.fanout import drain_fanout
+from shared.functions import load_function
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class InvocationContext:
+    '''Минимальный контекст вызова, похожий на тот, что передаёт платформа'''
+
+    def __init__(self, function_name: str, request_id: str, deadline: float):
+        self.function_name = function_name
+        self.request_id = request_id
+        self._deadline = deadline
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def build_event(handler: BaseHTTPRequestHandler, path: str, body: bytes) -> dict:
+    parts = urlsplit(handler.path)
+    headers = {key: value for key, value in handler.headers.items()}
+    event = {
+        'httpMethod': handler.command,
+        'path': path or '/',
+        'headers': headers,
+        'queryStringParameters': dict(parse_qsl(parts.query, keep_blank_values=True)),
+        'requestContext': {
+            'requestId': str(uuid.uuid4()),
+            'identity': {'sourceIp': handler.client_address[0]}
+        },
+        'body': None,
+        'isBase64Encoded': False
+    }
+    if body:
+        try:
+            event['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            event['body'] = base64.b64encode(body).decode()
+            event['isBase64Encoded'] = True
+    return event
+
+
+class FunctionRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'OfChat'
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_PUT(self):
+        self._dispatch()
+
+    def do_PATCH(self):
+        self._dispatch()
+
+    def do_DELETE(self):
+        self._dispatch()
+
+    def do_OPTIONS(self):
+        self._dispatch()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        path = urlsplit(self.path).path
+        if path == '/healthz':
+            self._send(200, {'Content-Type': 'application/json'}, json.dumps(self.server.health()).encode())
+            return
+        name, _, rest = path.lstrip('/').partition('/')
+        function = self.server.functions.get(name)
+        if function is None:
+            self._send(404, {'Content-Type': 'application/json'}, json.dumps({'error': 'Function not found'}).encode())
+            return
+        length, status, error = self._content_length()
+        if status:
+            self.close_connection = True
+            self._send(status, {'Content-Type': 'application/json'}, json.dumps({'error': error}).encode())
+            return
+        event = build_event(self, '/' + rest, self.rfile.read(length) if length else b'')
+        context = InvocationContext(name, event['requestContext']['requestId'], time.monotonic() + self.server.function_timeout)
+        try:
+            response = function.handler(event, context)
+        except Exception as e:
+            response = {'statusCode': 500, 'headers': {'Content-Type': 'application/json'}, 'body': json.dumps({'error': str(e)})}
+        body = response.get('body') or ''
+        body = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode()
+        self._send(response.get('statusCode', 200), response.get('headers') or {}, body)
+
+    def _content_length(self) -> tuple:
+        if self.headers.get('Transfer-Encoding', 'identity').strip().lower() != 'identity':
+            return 0, 411, 'Content-Length is required, chunked bodies are not supported'
+        values = {value.strip() for value in self.headers.get_all('Content-Length') or ['0']}
+        value = values.pop()
+        if values or not (value.isascii() and value.isdigit()):
+            return 0, 400, 'Invalid Content-Length'
+        length = int(value)
+        if length > MAX_BODY_BYTES:
+            return 0, 413, 'Request body too large'
+        return length, None, None
+
+    def _send(self, status: int, headers: dict, body: bytes):
+        self.send_response(status)
+        for key, value in headers.items():
+            if key.lower() not in ('content-length', 'connection', 'transfer-encoding'):
+                self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        if self.server.draining.is_set():
+            self.close_connection = True
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FunctionServer(HTTPServer):
+    '''HTTP-сервер, обслуживающий все функции в одном процессе на ограниченном пуле потоков'''
+
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple, dsn: str, function_names: list, workers: int,
+                 keepalive_timeout: float, function_timeout: float):
+        self.dsn = dsn
+        self.functions = {name: load_function(name) for name in function_names}
+        self.function_timeout = function_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.draining = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='function')
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers)
+        self._active = 0
+        self._active_lock = threading.Lock()
+        super().__init__(address, FunctionRequestHandler)
+
+    def process_request(self, request, client_address):
+        request.settimeout(self.keepalive_timeout)
+        self._slots.acquire()
+        with self._active_lock:
+            self._active += 1
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except (socket.timeout, ConnectionError):
+            pass
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._active_lock:
+                self._active -= 1
+            self._slots.release()
+
+    def health(self) -> dict:
+        with self._active_lock:
+            active = self._active
+        return {
+            'status': 'draining' if self.draining.is_set() else 'ok',
+            'functions': sorted(self.functions),
+            'workers': self.workers,
+            'connections': active,
+            'pool': get_pool(self.dsn).stats()
+        }
+
+    def drain(self, timeout: float):
+        self.draining.set()
+        self.shutdown()
+        self.executor.shutdown(wait=False)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._active_lock:
+                if self._active == 0:
+                    break
+            time.sleep(0.05)
+        self.server_close()
+
+
+class FanoutLoop(threading.Thread):
+    '''Фоновый разбор очереди рассылки, заменяющий вызов по расписанию'''
+
+    def __init__(self, dsn: str, interval: float, workers: int):
+        super().__init__(name='fanout', daemon=True)
+        self.dsn = dsn
+        self.interval = interval
+        self.workers = workers
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                result = drain_fanout(self.dsn, self.interval, self.workers)
+                if result['complete']:
+                    self.stopped.wait(self.interval)
+            except Exception:
+                self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
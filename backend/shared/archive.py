@@ -0,0 +1,125 @@
+import json
+import os
+import zlib
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+ARCHIVE_BLOCK_SIZE = int(os.environ.get('MESSAGE_ARCHIVE_BLOCK_SIZE', '500'))
+ARCHIVE_INSERT_BATCH = 100
+ARCHIVE_READ_BLOCKS = 4
+ARCHIVE_FIELDS = ('id', 'chat_id', 'sender_id', 'content', 'message_type', 'created_at', 'edited_at', 'is_archived',
+                  'attachment_sha256', 'attachment_name')
+
+
+def _timestamp(value) -> str:
+    return value.strftime('%Y-%m-%dT%H:%M:%S.%f') if value is not None else None
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _block_values(data) -> list:
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+class BlockWriter:
+    '''Сжимает сообщения месяца в блоки по чатам и пишет их в message_archive_blocks'''
+
+    def __init__(self, cursor, month: str):
+        self.cursor = cursor
+        self.month = month
+        self._chat_id = None
+        self._rows = []
+        self._blocks = []
+        self.count = 0
+
+    def append(self, row: dict):
+        if row['chat_id'] != self._chat_id or len(self._rows) >= ARCHIVE_BLOCK_SIZE:
+            self._close_block()
+            self._chat_id = row['chat_id']
+        self._rows.append(row)
+        self.count += 1
+
+    def close(self):
+        self._close_block()
+        self._insert_blocks()
+
+    def _close_block(self):
+        if not self._rows:
+            return
+        values = [[_timestamp(row[field]) if field in ('created_at', 'edited_at') else row[field] for field in ARCHIVE_FIELDS]
+                  for row in self._rows]
+        data = zlib.compress(json.dumps(values, ensure_ascii=False).encode(), 6)
+        newest, oldest = self._rows[0], self._rows[-1]
+        ids = [row['id'] for row in self._rows]
+        self._blocks.append((self.month, self._chat_id, newest['created_at'], newest['id'], oldest['created_at'],
+                             oldest['id'], min(ids), max(ids), len(ids), data))
+        self._rows = []
+        if len(self._blocks) >= ARCHIVE_INSERT_BATCH:
+            self._insert_blocks()
+
+    def _insert_blocks(self):
+        if not self._blocks:
+            return
+        execute_values(
+            self.cursor,
+            """
+            INSERT INTO message_archive_blocks
+                (month, chat_id, newest_at, newest_id, oldest_at, oldest_id, min_id, max_id, message_count, data)
+            VALUES %s
+            """,
+            self._blocks
+        )
+        self._blocks = []
+
+
+def read_archived_history(cursor, chat_id, before, limit: int, include_archived: bool) -> list:
+    if limit <= 0:
+        return []
+    before_key = (_parse_timestamp(before[0]), int(before[1])) if before else None
+    bound = before_key
+    messages = []
+    while True:
+        cursor.execute(
+            """
+            SELECT oldest_at, oldest_id, data
+            FROM message_archive_blocks
+            WHERE chat_id = %(chat_id)s
+              AND (%(oldest_at)s::timestamp IS NULL OR (oldest_at, oldest_id) < (%(oldest_at)s::timestamp, %(oldest_id)s))
+            ORDER BY oldest_at DESC, oldest_id DESC
+            LIMIT %(blocks)s
+            """,
+            {
+                'chat_id': chat_id,
+                'oldest_at': bound[0] if bound else None,
+                'oldest_id': bound[1] if bound else None,
+                'blocks': ARCHIVE_READ_BLOCKS
+            }
+        )
+        blocks = cursor.fetchall()
+        for block in blocks:
+            for values in _block_values(block['data']):
+                message = dict.fromkeys(ARCHIVE_FIELDS)
+                message.update(zip(ARCHIVE_FIELDS, values))
+                message['created_at'] = _parse_timestamp(message['created_at'])
+                message['edited_at'] = _parse_timestamp(message['edited_at'])
+                if before_key is not None and (message['created_at'], message['id']) >= before_key:
+                    continue
+                if message['is_archived'] and not include_archived:
+                    continue
+                messages.append(message)
+                if len(messages) >= limit:
+                    return messages
+        if len(blocks) < ARCHIVE_READ_BLOCKS:
+            return messages
+        bound = (blocks[-1]['oldest_at'], blocks[-1]['oldest_id'])
+
+
+def archived_message_exists(cursor, chat_id, message_id: int) -> bool:
+    cursor.execute(
+        "SELECT data FROM message_archive_blocks WHERE chat_id = %s AND min_id <= %s AND max_id >= %s",
+        (chat_id, message_id, message_id)
+    )
+    return any(values[0] == message_id for block in cursor.fetchall() for values in _block_values(block['data']))
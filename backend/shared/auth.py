@@ -0,0 +1,102 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+import psycopg2
+
+from shared.db import get_pool
+
+TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', str(7 * 24 * 3600)))
+REVOCATION_CACHE_TTL = float(os.environ.get('AUTH_REVOCATION_CACHE_TTL', '30'))
+REVOCATION_RETRY_DELAY = 5.0
+TOKEN_HEADER = 'x-auth-token'
+
+_revoked = set()
+_revoked_loaded_at = 0.0
+_revoked_lock = threading.Lock()
+
+
+class AuthNotConfigured(Exception):
+    pass
+
+
+def _secret() -> bytes:
+    secret = os.environ.get('AUTH_TOKEN_SECRET')
+    if not secret:
+        raise AuthNotConfigured('AUTH_TOKEN_SECRET is not configured')
+    return secret.encode()
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(_secret(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def issue_token(user_id: int, ttl: int = TOKEN_TTL) -> dict:
+    expires_at = int(time.time()) + ttl
+    payload = f'{user_id}.{expires_at}.{secrets.token_urlsafe(9)}'
+    return {'token': f'{payload}.{_sign(payload)}', 'expires_at': expires_at}
+
+
+def verify_token(token: str):
+    try:
+        payload, signature = token.rsplit('.', 1)
+        user_id, expires_at, token_id = payload.split('.')
+        user_id, expires_at = int(user_id), int(expires_at)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(payload)):
+        return None
+    if expires_at < time.time():
+        return None
+    return {'user_id': user_id, 'expires_at': expires_at, 'token_id': token_id}
+
+
+def is_revoked(token_id: str, dsn: str) -> bool:
+    global _revoked, _revoked_loaded_at
+    if time.monotonic() - _revoked_loaded_at > REVOCATION_CACHE_TTL:
+        with _revoked_lock:
+            if time.monotonic() - _revoked_loaded_at > REVOCATION_CACHE_TTL:
+                try:
+                    _revoked = load_revoked(dsn)
+                    _revoked_loaded_at = time.monotonic()
+                except psycopg2.Error:
+                    _revoked_loaded_at = time.monotonic() - REVOCATION_CACHE_TTL + REVOCATION_RETRY_DELAY
+    return token_id in _revoked
+
+
+def load_revoked(dsn: str) -> set:
+    pool = get_pool(dsn)
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT token_id FROM revoked_tokens WHERE expires_at > CURRENT_TIMESTAMP")
+            return {row[0] for row in cursor.fetchall()}
+    finally:
+        pool.putconn(conn)
+
+
+def revoke_token(cursor, claims: dict):
+    cursor.execute(
+        "INSERT INTO revoked_tokens (token_id, user_id, expires_at) VALUES (%s, %s, to_timestamp(%s)) ON CONFLICT (token_id) DO NOTHING",
+        (claims['token_id'], claims['user_id'], claims['expires_at'])
+    )
+    with _revoked_lock:
+        _revoked.add(claims['token_id'])
+
+
+def authenticate(event: dict, dsn: str, allow_query_token: bool = False):
+    headers = event.get('headers') or {}
+    token = next((value for key, value in headers.items() if key.lower() == TOKEN_HEADER), '')
+    if not token and allow_query_token:
+        token = (event.get('queryStringParameters') or {}).get('token', '')
+    if not token:
+        return None
+    claims = verify_token(token.strip())
+    if claims is None or is_revoked(claims['token_id'], dsn):
+        return None
+    return claims
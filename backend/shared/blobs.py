@@ -0,0 +1,143 @@
+import hashlib
+import os
+import re
+import threading
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ATTACHMENTS_DIR = os.environ.get('ATTACHMENTS_DIR', '/var/lib/ofchat/attachments')
+HASH_READ_SIZE = 1 << 20
+THUMBNAIL_SIZES = (64, 256, 512)
+THUMBNAIL_QUALITY = 80
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def is_sha256(value) -> bool:
+    return isinstance(value, str) and SHA256_PATTERN.match(value) is not None
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(ATTACHMENTS_DIR, 'blobs', sha256[:2], sha256)
+
+
+def upload_path(upload_id: str) -> str:
+    return os.path.join(ATTACHMENTS_DIR, 'uploads', upload_id)
+
+
+def thumbnail_path(sha256: str, size: int) -> str:
+    return os.path.join(ATTACHMENTS_DIR, 'thumbs', sha256[:2], f'{sha256}-{size}.jpg')
+
+
+def has_blob(sha256: str) -> bool:
+    return os.path.isfile(blob_path(sha256))
+
+
+def upload_size(upload_id: str) -> int:
+    try:
+        return os.path.getsize(upload_path(upload_id))
+    except FileNotFoundError:
+        return 0
+
+
+def write_chunk(upload_id: str, offset: int, data: bytes):
+    path = upload_path(upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as target:
+        target.seek(offset)
+        target.write(data)
+        target.truncate()
+        target.flush()
+        os.fsync(target.fileno())
+
+
+def discard_upload(upload_id: str):
+    try:
+        os.remove(upload_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(HASH_READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def commit_upload(upload_id: str, expected_sha256: str = None) -> tuple:
+    path = upload_path(upload_id)
+    sha256 = file_sha256(path)
+    if expected_sha256 and sha256 != expected_sha256:
+        os.remove(path)
+        raise ValueError(f'Upload {upload_id} hashed to {sha256}, expected {expected_sha256}')
+    target = blob_path(sha256)
+    if os.path.isfile(target):
+        os.remove(path)
+        return sha256, True
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+    return sha256, False
+
+
+def fetch_readable_blob(cursor, sha256: str, user_id: int):
+    cursor.execute(
+        """
+        SELECT b.sha256, b.size, b.mime_type
+        FROM attachment_blobs b
+        WHERE b.sha256 = %(sha256)s
+          AND (
+            EXISTS (SELECT 1 FROM attachment_grants g WHERE g.sha256 = b.sha256 AND g.user_id = %(user_id)s)
+            OR EXISTS (
+              SELECT 1
+              FROM messages m
+              JOIN chat_members cm ON cm.chat_id = m.chat_id AND cm.user_id = %(user_id)s
+              WHERE m.attachment_sha256 = b.sha256
+            )
+          )
+        """,
+        {'sha256': sha256, 'user_id': user_id}
+    )
+    return cursor.fetchone()
+
+
+def read_range(sha256: str, start: int, length: int) -> bytes:
+    with open(blob_path(sha256), 'rb') as source:
+        source.seek(start)
+        return source.read(length)
+
+
+def parse_range(header: str, size: int, max_length: int):
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else size - 1
+    else:
+        start = max(0, size - int(match.group(2)))
+        end = size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1, start + max_length - 1)
+
+
+def thumbnail(sha256: str, size: int) -> str:
+    path = thumbnail_path(sha256, size)
+    if os.path.isfile(path):
+        return path
+    if Image is None:
+        raise RuntimeError('Thumbnails need Pillow installed')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with Image.open(blob_path(sha256)) as image:
+        image.thumbnail((size, size))
+        image.convert('RGB').save(temporary, 'JPEG', quality=THUMBNAIL_QUALITY)
+    os.replace(temporary, path)
+    return path
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+
+from shared import telemetry
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+POOL_MAX_AGE = float(os.environ.get('DB_POOL_MAX_AGE', '300'))
+POOL_HEALTHCHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTHCHECK_INTERVAL', '30'))
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get('DB_POOL_ACQUIRE_TIMEOUT', '5'))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    '''Пул соединений, переживающий вызовы в тёплом контейнере'''
+
+    def __init__(self, dsn: str, max_size: int = POOL_MAX_SIZE, max_age: float = POOL_MAX_AGE,
+                 healthcheck_interval: float = POOL_HEALTHCHECK_INTERVAL,
+                 acquire_timeout: float = POOL_ACQUIRE_TIMEOUT, connect=telemetry.connect):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.max_age = max_age
+        self.healthcheck_interval = healthcheck_interval
+        self.acquire_timeout = acquire_timeout
+        self._connect = connect
+        self._idle = deque()
+        self._born = {}
+        self._in_use = set()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._stats = {'hits': 0, 'misses': 0, 'recycled': 0, 'broken': 0, 'timeouts': 0}
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._count('timeouts')
+            raise PoolTimeout('Database pool exhausted')
+        try:
+            conn = self._take_idle()
+            if conn is not None:
+                self._count('hits')
+            else:
+                self._count('misses')
+                conn = self._connect(self.dsn)
+                with self._lock:
+                    self._born[id(conn)] = time.monotonic()
+            with self._lock:
+                self._in_use.add(id(conn))
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close: bool = False):
+        with self._lock:
+            if id(conn) not in self._in_use:
+                return
+            self._in_use.discard(id(conn))
+        try:
+            if close or conn.closed or self._expired(conn):
+                self._discard(conn)
+                return
+            status = conn.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                self._discard(conn, broken=True)
+                return
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    self._discard(conn, broken=True)
+                    return
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._stats)
+            result['idle'] = len(self._idle)
+            result['open'] = len(self._born)
+        result['max_size'] = self.max_size
+        return result
+
+    def closeall(self):
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, last_used = self._idle.pop()
+            if conn.closed or self._expired(conn):
+                self._discard(conn)
+                continue
+            if time.monotonic() - last_used > self.healthcheck_interval and not self._healthy(conn):
+                self._discard(conn, broken=True)
+                continue
+            return conn
+
+    def _healthy(self, conn) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _expired(self, conn) -> bool:
+        born = self._born.get(id(conn))
+        return born is None or time.monotonic() - born > self.max_age
+
+    def _discard(self, conn, broken: bool = False):
+        with self._lock:
+            self._born.pop(id(conn), None)
+            self._stats['broken' if broken else 'recycled'] += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def get_pool(dsn: str) -> ConnectionPool:
+    pool = _pools.get(dsn)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(dsn)
+            if pool is None:
+                pool = ConnectionPool(dsn)
+                _pools[dsn] = pool
+    return pool
+
+
+def register_pool(dsn: str, pool: ConnectionPool):
+    with _pools_lock:
+        previous = _pools.get(dsn)
+        _pools[dsn] = pool
+    if previous is not None:
+        previous.closeall()
@@ -0,0 +1,125 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extras import RealDictCursor
+
+from shared.db import get_pool
+
+FANOUT_INLINE_LIMIT = int(os.environ.get('FANOUT_INLINE_LIMIT', '200'))
+FANOUT_BATCH_SIZE = int(os.environ.get('FANOUT_BATCH_SIZE', '2000'))
+FANOUT_WORKERS = int(os.environ.get('FANOUT_WORKERS', '4'))
+MEMBER_STATE_CHANNEL = 'chat_member_state'
+
+
+def process_batch(conn, batch_size: int = FANOUT_BATCH_SIZE):
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(
+            """
+            SELECT id, chat_id, message_id, message_created_at, sender_id, shard, shards, after_user_id
+            FROM fanout_jobs
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+            """
+        )
+        job = cursor.fetchone()
+        if job is None:
+            conn.rollback()
+            return None
+
+        cursor.execute(
+            """
+            WITH batch AS (
+                SELECT id, user_id
+                FROM chat_members
+                WHERE chat_id = %(chat_id)s AND user_id > %(after_user_id)s AND user_id %% %(shards)s = %(shard)s
+                ORDER BY user_id
+                LIMIT %(batch_size)s
+            ),
+            updated AS (
+                UPDATE chat_members cm
+                SET last_activity_at = GREATEST(cm.last_activity_at, %(created_at)s),
+                    unread_count = cm.unread_count + 1
+                FROM batch
+                WHERE cm.id = batch.id
+                  AND cm.user_id IS DISTINCT FROM %(sender_id)s
+                  AND cm.last_read_message_id < %(message_id)s
+            ),
+            feed AS (
+                SELECT record_user_changes('chat', array_agg(user_id), array_agg(%(chat_id)s::integer),
+                                           array_agg(%(chat_id)s::integer), array_agg(%(message_id)s::integer), false) AS recorded
+                FROM batch
+            )
+            SELECT count(*) AS members, min(user_id) AS first_user_id, max(user_id) AS last_user_id FROM batch, feed
+            """,
+            {
+                'chat_id': job['chat_id'],
+                'after_user_id': job['after_user_id'],
+                'shard': job['shard'],
+                'shards': job['shards'],
+                'batch_size': batch_size,
+                'created_at': job['message_created_at'],
+                'sender_id': job['sender_id'],
+                'message_id': job['message_id']
+            }
+        )
+        batch = cursor.fetchone()
+
+        if batch['members'] < batch_size:
+            cursor.execute("DELETE FROM fanout_jobs WHERE id = %s", (job['id'],))
+        else:
+            cursor.execute(
+                "UPDATE fanout_jobs SET after_user_id = %s, batches = batches + 1 WHERE id = %s",
+                (batch['last_user_id'], job['id'])
+            )
+
+        if batch['members']:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)",
+                (MEMBER_STATE_CHANNEL, json.dumps({
+                    'chat_id': job['chat_id'],
+                    'message_id': job['message_id'],
+                    'from_user_id': batch['first_user_id'],
+                    'to_user_id': batch['last_user_id']
+                }))
+            )
+        conn.commit()
+        return batch['members']
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _drain_worker(dsn: str, deadline: float) -> dict:
+    pool = get_pool(dsn)
+    conn = pool.getconn()
+    stats = {'batches': 0, 'members': 0, 'drained': False}
+    try:
+        while time.monotonic() < deadline:
+            members = process_batch(conn)
+            if members is None:
+                stats['drained'] = True
+                break
+            stats['batches'] += 1
+            stats['members'] += members
+    finally:
+        pool.putconn(conn)
+    return stats
+
+
+def drain_fanout(dsn: str, budget: float, workers: int = FANOUT_WORKERS) -> dict:
+    workers = max(1, min(workers, get_pool(dsn).max_size))
+    deadline = time.monotonic() + budget
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda _: _drain_worker(dsn, deadline), range(workers)))
+    return {
+        'workers': workers,
+        'batches': sum(result['batches'] for result in results),
+        'members': sum(result['members'] for result in results),
+        'complete': all(result['drained'] for result in results)
+    }
@@ -0,0 +1,135 @@
+import base64
+import gzip
+import os
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from shared import telemetry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+GZIP_MIN_BYTES = int(os.environ.get('GZIP_MIN_BYTES', '1024'))
+GZIP_LEVEL = 5
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(payload) -> str:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    def dumps(payload) -> str:
+        return json.dumps(payload, default=_default, separators=(',', ':'))
+
+
+def json_response(status: int, payload, headers: dict = None) -> dict:
+    started = time.perf_counter()
+    body = dumps(payload)
+    telemetry.add_timing('serialize', time.perf_counter() - started)
+    return {
+        'statusCode': status,
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+def error_response(status: int, message: str, headers: dict = None) -> dict:
+    if status >= 500:
+        telemetry.record_error(message)
+    return json_response(status, {'error': message}, headers)
+
+
+def accepts_gzip(event: dict) -> bool:
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'accept-encoding':
+            return 'gzip' in value.lower()
+    return False
+
+
+def compress_response(event: dict, response: dict) -> dict:
+    headers = response.get('headers') or {}
+    body = response.get('body')
+    if (response.get('isBase64Encoded') or not isinstance(body, str) or len(body) < GZIP_MIN_BYTES
+            or headers.get('Content-Type') != 'application/json' or not accepts_gzip(event)):
+        return response
+    started = time.perf_counter()
+    compressed = gzip.compress(body.encode(), compresslevel=GZIP_LEVEL)
+    telemetry.add_timing('serialize', time.perf_counter() - started)
+    return {
+        **response,
+        'headers': {**headers, 'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'},
+        'body': base64.b64encode(compressed).decode(),
+        'isBase64Encoded': True
+    }
+
+
+class Router:
+    '''Таблица действий функции: CORS, проверка DSN, диспетчеризация и сжатие ответа'''
+
+    def __init__(self, name: str, allow_headers: str = 'Content-Type, X-Auth-Token', guard=None):
+        self.name = name
+        self.allow_headers = allow_headers
+        self.guard = guard
+        self._routes = {}
+        self._preflight = None
+
+    def route(self, method: str, action: str):
+        def register(func):
+            self._routes[(method, action)] = func
+            self._preflight = None
+            return func
+        return register
+
+    def preflight(self) -> dict:
+        if self._preflight is None:
+            methods = sorted({method for method, _ in self._routes} | {'OPTIONS'})
+            self._preflight = {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': ', '.join(methods),
+                'Access-Control-Allow-Headers': self.allow_headers
+            }
+        return {'statusCode': 200, 'headers': dict(self._preflight), 'body': '', 'isBase64Encoded': False}
+
+    def __call__(self, event: dict, context) -> dict:
+        method = event.get('httpMethod', 'GET')
+        if method == 'OPTIONS':
+            return self.preflight()
+
+        dsn = os.environ.get('DATABASE_URL')
+        if not dsn:
+            return error_response(500, 'Database connection not configured')
+
+        if self.guard is not None:
+            denied = self.guard(event)
+            if denied is not None:
+                return denied
+
+        action = (event.get('queryStringParameters') or {}).get('action', '')
+        func = self._routes.get((method, action))
+        if func is None:
+            return json_response(200, {
+                'message': self.name,
+                'endpoints': sorted({f'/{name}' for _, name in self._routes})
+            })
+        telemetry.begin_request()
+        status = 500
+        try:
+            response = compress_response(event, func(event, dsn))
+            status = response['statusCode']
+            return response
+        finally:
+            telemetry.log_request(self.name, action, method, status, telemetry.end_request())
@@ -0,0 +1,121 @@
+import json
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+MESSAGES_CHANNEL = 'chat_messages'
+LISTEN_POLL_INTERVAL = 5.0
+RECONNECT_DELAY = 1.0
+
+_hubs = {}
+_hubs_lock = threading.Lock()
+
+
+class Subscription:
+    '''Очередь уведомлений одного long-poll запроса по набору чатов'''
+
+    def __init__(self, chat_ids):
+        self.chat_ids = frozenset(int(chat_id) for chat_id in chat_ids)
+        self.events = queue.Queue()
+
+    def wait(self, timeout: float, coalesce: float = 0.05) -> list:
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + coalesce
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                events.append(self.events.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return events
+
+
+class NotificationHub:
+    '''Одно LISTEN-соединение на контейнер, раздающее уведомления подписчикам по chat_id'''
+
+    def __init__(self, dsn: str, channel: str = MESSAGES_CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self._by_chat = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'listen-{channel}', daemon=True)
+        self._thread.start()
+
+    def subscribe(self, chat_ids) -> Subscription:
+        subscription = Subscription(chat_ids)
+        with self._lock:
+            for chat_id in subscription.chat_ids:
+                self._by_chat.setdefault(chat_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for chat_id in subscription.chat_ids:
+                subscribers = self._by_chat.get(chat_id)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_chat[chat_id]
+
+    def wait_ready(self, timeout: float) -> bool:
+        return self._ready.wait(timeout)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.channel}')
+                self._ready.set()
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], LISTEN_POLL_INTERVAL) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            except (psycopg2.Error, OSError):
+                self._ready.clear()
+                time.sleep(RECONNECT_DELAY)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+    def _dispatch(self, payload: str):
+        try:
+            event = json.loads(payload)
+            chat_id = int(event['chat_id'])
+        except (ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            subscribers = list(self._by_chat.get(chat_id, ()))
+        for subscription in subscribers:
+            subscription.events.put(event)
+
+
+def get_hub(dsn: str, channel: str = MESSAGES_CHANNEL) -> NotificationHub:
+    key = (dsn, channel)
+    hub = _hubs.get(key)
+    if hub is None:
+        with _hubs_lock:
+            hub = _hubs.get(key)
+            if hub is None:
+                hub = NotificationHub(dsn, channel)
+                _hubs[key] = hub
+    return hub
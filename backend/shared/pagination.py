@@ -0,0 +1,19 @@
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(list(values), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(value: str, size: int) -> list:
+    padded = value + '=' * (-len(value) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def clamp_limit(value, default: int, maximum: int) -> int:
+    return min(max(int(value if value is not None else default), 1), maximum)
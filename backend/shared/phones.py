@@ -0,0 +1,5 @@
+def normalize_phone(value: str) -> str:
+    digits = ''.join(ch for ch in str(value) if ch.isdigit())
+    if len(digits) == 11 and digits.startswith('8'):
+        digits = '7' + digits[1:]
+    return '+' + digits if digits else ''
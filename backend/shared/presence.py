@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+PRESENCE_TTL = int(os.environ.get('PRESENCE_TTL', '60'))
+HEARTBEAT_MIN_WRITE_INTERVAL = float(os.environ.get('HEARTBEAT_MIN_WRITE_INTERVAL', '20'))
+HEARTBEAT_BUFFER_LIMIT = 5000
+
+_pending = {}
+_written = {}
+_lock = threading.Lock()
+
+
+def online_column(alias: str = '') -> str:
+    prefix = f'{alias}.' if alias else ''
+    return f"({prefix}last_seen > CURRENT_TIMESTAMP - INTERVAL '{PRESENCE_TTL} seconds') AS is_online"
+
+
+def record_heartbeat(user_id: int) -> bool:
+    now = time.monotonic()
+    with _lock:
+        written = _written.get(user_id)
+        if written is not None and now - written < HEARTBEAT_MIN_WRITE_INTERVAL:
+            return False
+        _pending[user_id] = now
+        return True
+
+
+def flush_heartbeats(cursor) -> int:
+    global _pending
+    with _lock:
+        if not _pending:
+            return 0
+        batch, _pending = _pending, {}
+    now = time.monotonic()
+    try:
+        execute_values(
+            cursor,
+            """
+            UPDATE users AS u SET last_seen = CURRENT_TIMESTAMP - make_interval(secs => v.age)
+            FROM (VALUES %s) AS v(id, age)
+            WHERE u.id = v.id AND COALESCE(u.last_seen, '-infinity') < CURRENT_TIMESTAMP - make_interval(secs => v.age)
+            """,
+            [(user_id, now - seen) for user_id, seen in sorted(batch.items())],
+            template='(%s::integer, %s::float8)',
+            page_size=1000
+        )
+    except Exception:
+        with _lock:
+            for user_id, seen in batch.items():
+                _pending.setdefault(user_id, seen)
+        raise
+    with _lock:
+        for user_id in batch:
+            _written[user_id] = now
+        if len(_written) > HEARTBEAT_BUFFER_LIMIT * 4:
+            cutoff = now - HEARTBEAT_MIN_WRITE_INTERVAL
+            for user_id in [key for key, value in _written.items() if value < cutoff]:
+                del _written[user_id]
+    return len(batch)
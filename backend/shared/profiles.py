@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from psycopg2.extras import RealDictCursor
+
+from shared.db import get_pool
+
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', '5000'))
+PROFILE_CACHE_TTL = float(os.environ.get('PROFILE_CACHE_TTL', '60'))
+PROFILE_COLUMNS = 'id, unique_id, username, avatar_url, bio'
+
+
+class ProfileCache:
+    '''LRU-кэш публичных профилей с ограниченным временем жизни записей'''
+
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get_many(self, ids: list) -> tuple:
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            generation = self._generation
+            for user_id in ids:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(user_id)
+                    found[user_id] = entry[0]
+                else:
+                    if entry is not None:
+                        del self._entries[user_id]
+                    missing.append(user_id)
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(missing)
+        return found, missing, generation
+
+    def put_many(self, profiles: list, generation: int):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if generation != self._generation:
+                return
+            for profile in profiles:
+                self._entries[profile['id']] = (profile, expires)
+                self._entries.move_to_end(profile['id'])
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in ids:
+                if self._entries.pop(user_id, None) is not None:
+                    self._stats['invalidations'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._stats)
+            result['size'] = len(self._entries)
+        result['max_size'] = self.max_size
+        return result
+
+
+_cache = ProfileCache()
+
+
+def load_profiles(dsn: str, ids: list) -> dict:
+    profiles, missing, generation = _cache.get_many(ids)
+    if not missing:
+        return profiles
+    pool = get_pool(dsn)
+    conn = pool.getconn()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(f"SELECT {PROFILE_COLUMNS} FROM users WHERE id = ANY(%s)", (missing,))
+            rows = [dict(row) for row in cursor.fetchall()]
+    finally:
+        pool.putconn(conn)
+    _cache.put_many(rows, generation)
+    profiles.update((row['id'], row) for row in rows)
+    return profiles
+
+
+def invalidate_profiles(*ids):
+    _cache.invalidate(*ids)
+
+
+def profile_cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import psycopg2.extensions
+
+Rule = namedtuple('Rule', ['name', 'capacity', 'period'])
+
+SMS_PER_PHONE = Rule('sms:phone', 1, 60)
+SMS_PER_IP = Rule('sms:ip', 10, 3600)
+LOGIN_PER_IDENTIFIER = Rule('login:id', 5, 300)
+LOGIN_PER_IP = Rule('login:ip', 30, 60)
+SEARCH_PER_IP = Rule('search:ip', 20, 10)
+
+LOCAL_BUCKET_LIMIT = 10000
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def client_ip(event: dict) -> str:
+    if TRUSTED_PROXY_HOPS > 0:
+        headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+        hops = [hop.strip() for hop in headers.get('x-forwarded-for', '').split(',') if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    return identity.get('sourceIp') or 'unknown'
+
+
+def _refill_rate(rule: Rule) -> float:
+    return rule.capacity / rule.period
+
+
+def _take_local(bucket_key: str, rule: Rule, now: float) -> bool:
+    with _local_lock:
+        tokens, updated = _local.pop(bucket_key, (float(rule.capacity), now))
+        tokens = min(rule.capacity, tokens + (now - updated) * _refill_rate(rule))
+        allowed = tokens >= 1
+        _local[bucket_key] = (tokens - 1 if allowed else tokens, now)
+        while len(_local) > LOCAL_BUCKET_LIMIT:
+            _local.popitem(last=False)
+        return allowed
+
+
+def _sync_local(bucket_key: str, tokens: float, now: float):
+    with _local_lock:
+        if bucket_key in _local:
+            _local[bucket_key] = (tokens, now)
+
+
+def check_rate_limit(conn, rule: Rule, key: str) -> tuple:
+    bucket_key = f"{rule.name}:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+    now = time.monotonic()
+    retry_after = max(1, int(round(1 / _refill_rate(rule))))
+    if not _take_local(bucket_key, rule, now):
+        return False, retry_after
+    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        raise RuntimeError('Rate limits must be checked before any other work on the connection')
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO rate_limit_buckets AS b (bucket_key, tokens, updated_at)
+            VALUES (%(key)s, %(capacity)s - 1, clock_timestamp())
+            ON CONFLICT (bucket_key) DO UPDATE SET
+                tokens = LEAST(%(capacity)s, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %(rate)s) - 1,
+                updated_at = clock_timestamp()
+            WHERE LEAST(%(capacity)s, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %(rate)s) >= 1
+            RETURNING tokens
+            """,
+            {'key': bucket_key, 'capacity': rule.capacity, 'rate': _refill_rate(rule)}
+        )
+        row = cursor.fetchone()
+    conn.commit()
+    if row is None:
+        _sync_local(bucket_key, 0.0, now)
+        return False, retry_after
+    _sync_local(bucket_key, float(row[0]), now)
+    return True, 0
+
+
+def check_rate_limits(conn, *checks) -> tuple:
+    for rule, key in checks:
+        allowed, retry_after = check_rate_limit(conn, rule, key)
+        if not allowed:
+            return False, retry_after
+    return True, 0
@@ -0,0 +1,167 @@
+import os
+import time
+
+from psycopg2.extras import RealDictCursor
+
+from shared.db import get_pool
+
+SUGGESTIONS_TOP_K = int(os.environ.get('SUGGESTIONS_TOP_K', '50'))
+SUGGESTION_FANOUT = int(os.environ.get('SUGGESTION_FANOUT', '200'))
+SUGGESTION_REFRESH_BATCH = int(os.environ.get('SUGGESTION_REFRESH_BATCH', '500'))
+
+
+def record_contact_edges(cursor, user_id: int, contact_user_ids: list) -> int:
+    cursor.execute(
+        """
+        WITH added AS (
+            SELECT DISTINCT unnest(%(contact_user_ids)s::integer[]) AS contact_user_id
+        ),
+        introduced AS (
+            SELECT %(user_id)s::integer AS user_id, f.contact_user_id AS candidate_id
+            FROM added a
+            CROSS JOIN LATERAL (
+                SELECT c.contact_user_id
+                FROM contacts c
+                WHERE c.user_id = a.contact_user_id AND c.contact_user_id <> %(user_id)s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM contacts o WHERE o.user_id = %(user_id)s AND o.contact_user_id = c.contact_user_id
+                  )
+                ORDER BY c.added_at DESC, c.id DESC
+                LIMIT %(fanout)s
+            ) f
+        ),
+        followers AS (
+            SELECT f.user_id, a.contact_user_id AS candidate_id
+            FROM added a
+            CROSS JOIN LATERAL (
+                SELECT c.user_id
+                FROM contacts c
+                WHERE c.contact_user_id = %(user_id)s AND c.user_id <> a.contact_user_id
+                  AND NOT EXISTS (
+                      SELECT 1 FROM contacts o WHERE o.user_id = c.user_id AND o.contact_user_id = a.contact_user_id
+                  )
+                LIMIT %(fanout)s
+            ) f
+        ),
+        bumped AS (
+            INSERT INTO contact_suggestions (user_id, candidate_id, mutual_count)
+            SELECT user_id, candidate_id, count(*)
+            FROM (SELECT * FROM introduced UNION ALL SELECT * FROM followers) edges
+            GROUP BY user_id, candidate_id
+            ORDER BY user_id, candidate_id
+            ON CONFLICT (user_id, candidate_id) DO UPDATE
+            SET mutual_count = contact_suggestions.mutual_count + EXCLUDED.mutual_count, refreshed_at = CURRENT_TIMESTAMP
+            RETURNING 1
+        ),
+        resolved AS (
+            DELETE FROM contact_suggestions
+            WHERE user_id = %(user_id)s AND candidate_id IN (SELECT contact_user_id FROM added)
+        )
+        SELECT count(*) AS bumped FROM bumped
+        """,
+        {'user_id': user_id, 'contact_user_ids': list(contact_user_ids), 'fanout': SUGGESTION_FANOUT}
+    )
+    return cursor.fetchone()['bumped']
+
+
+def refresh_batch(conn, batch_size: int = SUGGESTION_REFRESH_BATCH):
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute("SELECT last_user_id FROM contact_suggestion_progress FOR UPDATE SKIP LOCKED")
+        progress = cursor.fetchone()
+        if progress is None:
+            conn.rollback()
+            return None
+
+        cursor.execute(
+            """
+            WITH batch AS (
+                SELECT id FROM users WHERE id > %(after_user_id)s ORDER BY id LIMIT %(batch_size)s
+            ),
+            scored AS (
+                SELECT b.id AS user_id, f.contact_user_id AS candidate_id, count(*) AS mutual_count
+                FROM batch b
+                JOIN contacts c ON c.user_id = b.id
+                CROSS JOIN LATERAL (
+                    SELECT contact_user_id
+                    FROM contacts
+                    WHERE user_id = c.contact_user_id
+                    ORDER BY added_at DESC, id DESC
+                    LIMIT %(fanout)s
+                ) f
+                WHERE f.contact_user_id <> b.id
+                  AND NOT EXISTS (SELECT 1 FROM contacts o WHERE o.user_id = b.id AND o.contact_user_id = f.contact_user_id)
+                GROUP BY b.id, f.contact_user_id
+            ),
+            ranked AS (
+                SELECT user_id, candidate_id, mutual_count
+                FROM (
+                    SELECT user_id, candidate_id, mutual_count,
+                           row_number() OVER (PARTITION BY user_id ORDER BY mutual_count DESC, candidate_id) AS position
+                    FROM scored
+                ) s
+                WHERE position <= %(top_k)s
+            ),
+            stale AS (
+                DELETE FROM contact_suggestions s
+                USING batch b
+                WHERE s.user_id = b.id
+                  AND NOT EXISTS (SELECT 1 FROM ranked r WHERE r.user_id = s.user_id AND r.candidate_id = s.candidate_id)
+            ),
+            stored AS (
+                INSERT INTO contact_suggestions (user_id, candidate_id, mutual_count)
+                SELECT user_id, candidate_id, mutual_count FROM ranked
+                ORDER BY user_id, candidate_id
+                ON CONFLICT (user_id, candidate_id) DO UPDATE
+                SET mutual_count = EXCLUDED.mutual_count, refreshed_at = CURRENT_TIMESTAMP
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM batch) AS users,
+                   (SELECT max(id) FROM batch) AS last_user_id,
+                   (SELECT count(*) FROM stored) AS suggestions
+            """,
+            {
+                'after_user_id': progress['last_user_id'],
+                'batch_size': batch_size,
+                'fanout': SUGGESTION_FANOUT,
+                'top_k': SUGGESTIONS_TOP_K
+            }
+        )
+        batch = cursor.fetchone()
+
+        finished = batch['users'] < batch_size
+        cursor.execute(
+            """
+            UPDATE contact_suggestion_progress
+            SET last_user_id = %s, passes = passes + %s, updated_at = CURRENT_TIMESTAMP
+            """,
+            (0 if finished else batch['last_user_id'], 1 if finished else 0)
+        )
+        conn.commit()
+        return {'users': batch['users'], 'suggestions': batch['suggestions'], 'finished': finished}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def refresh_suggestions(dsn: str, budget: float) -> dict:
+    deadline = time.monotonic() + budget
+    pool = get_pool(dsn)
+    conn = pool.getconn()
+    stats = {'batches': 0, 'users': 0, 'suggestions': 0, 'passes': 0}
+    try:
+        while time.monotonic() < deadline:
+            batch = refresh_batch(conn)
+            if batch is None:
+                break
+            stats['batches'] += 1
+            stats['users'] += batch['users']
+            stats['suggestions'] += batch['suggestions']
+            if batch['finished']:
+                stats['passes'] += 1
+                break
+    finally:
+        pool.putconn(conn)
+    return stats
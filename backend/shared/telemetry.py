@@ -0,0 +1,284 @@
+import contextlib
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+REQUEST_LOG_ENABLED = os.environ.get('REQUEST_LOG_ENABLED', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', '0.1'))
+SLOW_QUERY_MAX_LENGTH = 2000
+EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+PLACEHOLDER_PATTERN = re.compile(r'%(?:\((\w+)\)s|s|%)')
+GENERIC_PLAN_MIN_VERSION = 160000
+
+_local = threading.local()
+
+
+class RequestStats:
+    '''Разбивка времени и счётчики обращений к БД за один вызов'''
+
+    __slots__ = ('started', 'connect', 'execute', 'fetch', 'commit', 'serialize', 'connects', 'statements',
+                 'commits', 'rows_fetched', 'rows_affected', 'slow_statements', 'error', 'total')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.connect = self.execute = self.fetch = self.commit = self.serialize = 0.0
+        self.connects = self.statements = self.commits = 0
+        self.rows_fetched = self.rows_affected = self.slow_statements = 0
+        self.error = None
+        self.total = None
+
+    @property
+    def round_trips(self) -> int:
+        return self.connects + self.statements + self.commits
+
+    @property
+    def db_time(self) -> float:
+        return self.connect + self.execute + self.fetch + self.commit
+
+    def as_dict(self) -> dict:
+        total = self.total if self.total is not None else time.perf_counter() - self.started
+        return {
+            'total_ms': _ms(total),
+            'connect_ms': _ms(self.connect),
+            'execute_ms': _ms(self.execute),
+            'fetch_ms': _ms(self.fetch),
+            'commit_ms': _ms(self.commit),
+            'serialize_ms': _ms(self.serialize),
+            'other_ms': _ms(max(0.0, total - self.db_time - self.serialize)),
+            'connects': self.connects,
+            'statements': self.statements,
+            'commits': self.commits,
+            'rows_fetched': self.rows_fetched,
+            'rows_affected': self.rows_affected,
+            'slow_statements': self.slow_statements
+        }
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def current_request():
+    return getattr(_local, 'stats', None)
+
+
+def last_request():
+    return getattr(_local, 'last', None)
+
+
+def begin_request() -> RequestStats:
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def end_request() -> RequestStats:
+    stats = current_request()
+    if stats is not None:
+        stats.total = time.perf_counter() - stats.started
+    _local.stats = None
+    _local.last = stats
+    return stats
+
+
+@contextlib.contextmanager
+def capture_statements():
+    captured = []
+    _local.captured = captured
+    try:
+        yield captured
+    finally:
+        _local.captured = None
+
+
+def add_timing(kind: str, seconds: float):
+    stats = current_request()
+    if stats is not None:
+        setattr(stats, kind, getattr(stats, kind) + seconds)
+
+
+def record_error(message: str):
+    stats = current_request()
+    if stats is not None and stats.error is None:
+        stats.error = message
+
+
+def emit(record: dict):
+    print(json.dumps(record, default=str, ensure_ascii=False, separators=(',', ':')), flush=True)
+
+
+def log_request(function: str, action: str, method: str, status: int, stats: RequestStats):
+    if not REQUEST_LOG_ENABLED or stats is None:
+        return
+    record = {'event': 'request', 'function': function, 'action': action, 'method': method, 'status': status}
+    record.update(stats.as_dict())
+    if stats.error:
+        record['error'] = stats.error
+    emit(record)
+
+
+def statement_template(cursor, query) -> str:
+    if isinstance(query, bytes):
+        return query.decode(errors='replace')
+    if isinstance(query, str):
+        return query
+    return query.as_string(cursor)
+
+
+def server_placeholders(template: str) -> tuple:
+    numbers = {}
+
+    def replace(match):
+        if match.group(0) == '%%':
+            return '%'
+        key = match.group(1) if match.group(1) is not None else len(numbers)
+        return f'${numbers.setdefault(key, len(numbers) + 1)}'
+
+    return PLACEHOLDER_PATTERN.sub(replace, template), len(numbers)
+
+
+def _explain(conn, statement: str, params: int):
+    plain = psycopg2.extensions.connection.cursor(conn)
+    prepared = False
+    try:
+        plain.execute('SAVEPOINT telemetry_explain')
+        try:
+            if not params:
+                plain.execute('EXPLAIN (FORMAT JSON) ' + statement)
+            elif conn.server_version >= GENERIC_PLAN_MIN_VERSION:
+                plain.execute('EXPLAIN (GENERIC_PLAN, FORMAT JSON) ' + statement)
+            else:
+                plain.execute('PREPARE telemetry_explain AS ' + statement)
+                prepared = True
+                plain.execute('SET LOCAL plan_cache_mode = force_generic_plan')
+                plain.execute(f"EXPLAIN (FORMAT JSON) EXECUTE telemetry_explain ({', '.join(['NULL'] * params)})")
+            plan = plain.fetchone()[0]
+        except psycopg2.Error as e:
+            plan = f'EXPLAIN failed: {e}'.strip()
+        plain.execute('ROLLBACK TO SAVEPOINT telemetry_explain')
+        plain.execute('RELEASE SAVEPOINT telemetry_explain')
+        if prepared:
+            plain.execute('DEALLOCATE telemetry_explain')
+        return plan
+    finally:
+        plain.close()
+
+
+def _report_slow(cursor, query, vars, elapsed: float):
+    stats = current_request()
+    if stats is not None:
+        stats.slow_statements += 1
+    statement = statement_template(cursor, query)
+    record = {'event': 'slow_query', 'duration_ms': _ms(elapsed), 'statement': statement[:SLOW_QUERY_MAX_LENGTH]}
+    conn = cursor.connection
+    if (cursor.name is None and not conn.autocommit and statement.lstrip().lower().startswith(EXPLAINABLE)
+            and conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+            and random.random() < SLOW_QUERY_EXPLAIN_RATE):
+        record['plan'] = _explain(conn, *(server_placeholders(statement) if vars is not None else (statement, 0)))
+    emit(record)
+
+
+def _count_rows(rows) -> int:
+    if rows is None:
+        return 0
+    return len(rows) if isinstance(rows, list) else 1
+
+
+@functools.lru_cache(maxsize=None)
+def instrumented_cursor(base):
+    class InstrumentedCursor(base):
+        def execute(self, query, vars=None):
+            captured = getattr(_local, 'captured', None)
+            if captured is not None:
+                captured.append((statement_template(self, query), vars))
+            started = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                self._observe(query, vars, time.perf_counter() - started)
+
+        def executemany(self, query, vars_list):
+            started = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                self._observe(query, None, time.perf_counter() - started)
+
+        def fetchone(self):
+            return self._fetch(super().fetchone)
+
+        def fetchmany(self, size=None):
+            return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+        def fetchall(self):
+            return self._fetch(super().fetchall)
+
+        def _fetch(self, method, *args):
+            started = time.perf_counter()
+            rows = method(*args)
+            stats = current_request()
+            if stats is not None:
+                stats.fetch += time.perf_counter() - started
+                stats.rows_fetched += _count_rows(rows)
+            return rows
+
+        def _observe(self, query, vars, elapsed: float):
+            stats = current_request()
+            if stats is not None:
+                stats.execute += elapsed
+                stats.statements += 1
+                if self.description is None and self.rowcount > 0:
+                    stats.rows_affected += self.rowcount
+            if elapsed * 1000 >= SLOW_QUERY_MS and not self.connection.closed:
+                try:
+                    _report_slow(self, query, vars, elapsed)
+                except Exception:
+                    pass
+
+    InstrumentedCursor.__name__ = f'Instrumented{base.__name__}'
+    return InstrumentedCursor
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    '''Соединение, которое замеряет запросы, выборки и фиксации текущего вызова'''
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = instrumented_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        return self._finish(super().commit)
+
+    def rollback(self):
+        return self._finish(super().rollback)
+
+    def _finish(self, method):
+        if self.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return method()
+        started = time.perf_counter()
+        try:
+            return method()
+        finally:
+            stats = current_request()
+            if stats is not None:
+                stats.commit += time.perf_counter() - started
+                stats.commits += 1
+
+
+def connect(dsn: str):
+    started = time.perf_counter()
+    try:
+        return psycopg2.connect(dsn, connection_factory=InstrumentedConnection)
+    finally:
+        stats = current_request()
+        if stats is not None:
+            stats.connect += time.perf_counter() - started
+            stats.connects += 1
@@ -1,219 +1,135 @@
 import json
 import os
+import sys
 import random
-import psycopg2
 from psycopg2.extras import RealDictCursor
-from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import get_pool
+from shared.http import Router, json_response, error_response
+from shared.phones import normalize_phone
+from shared.ratelimit import SMS_PER_IP, SMS_PER_PHONE, check_rate_limits, client_ip
+
+MAX_VERIFY_ATTEMPTS = 3
+CODE_TTL_MINUTES = 5
+
+router = Router('OfChat SMS Verification API', allow_headers='Content-Type')
 
 def handler(event: dict, context) -> dict:
     '''API для отправки и проверки SMS-кодов подтверждения'''
-    
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    dsn = os.environ.get('DATABASE_URL')
-    if not dsn:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Database connection not configured'}),
-            'isBase64Encoded': False
-        }
-    
-    query_params = event.get('queryStringParameters', {}) or {}
-    action = query_params.get('action', '')
-    
-    if method == 'POST' and action == 'send':
-        return send_verification_code(event, dsn)
-    elif method == 'POST' and action == 'verify':
-        return verify_code(event, dsn)
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'message': 'OfChat SMS Verification API'}),
-        'isBase64Encoded': False
-    }
+    return router(event, context)
 
 def generate_code() -> str:
     return str(random.randint(100000, 999999))
 
+@router.route('POST', 'send')
 def send_verification_code(event: dict, dsn: str) -> dict:
+    conn = None
     try:
         body = json.loads(event.get('body', '{}'))
         phone = body.get('phone', '').strip()
         
         if not phone:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Phone number is required'}),
-                'isBase64Encoded': False
-            }
-        
-        conn = psycopg2.connect(dsn)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+            return error_response(400, 'Phone number is required')
         
-        cursor.execute(
-            "SELECT COUNT(*) as count FROM verification_codes WHERE phone = %s AND created_at > NOW() - INTERVAL '1 minute'",
-            (phone,)
-        )
-        recent_codes = cursor.fetchone()
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        if recent_codes and recent_codes['count'] > 0:
+        allowed, retry_after = check_rate_limits(conn, (SMS_PER_IP, client_ip(event)), (SMS_PER_PHONE, normalize_phone(phone) or phone))
+        if not allowed:
             cursor.close()
-            conn.close()
-            return {
-                'statusCode': 429,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Please wait before requesting a new code'}),
-                'isBase64Encoded': False
-            }
+            get_pool(dsn).putconn(conn)
+            return error_response(429, 'Please wait before requesting a new code', {'Retry-After': str(retry_after)})
         
         code = generate_code()
-        expires_at = datetime.now() + timedelta(minutes=5)
         
         cursor.execute(
-            "INSERT INTO verification_codes (phone, code, expires_at) VALUES (%s, %s, %s) RETURNING id",
-            (phone, code, expires_at)
+            "INSERT INTO verification_codes (phone, code, expires_at) VALUES (%s, %s, CURRENT_TIMESTAMP + make_interval(mins => %s)) RETURNING id",
+            (phone, code, CODE_TTL_MINUTES)
         )
         
         verification_id = cursor.fetchone()['id']
         conn.commit()
         
         cursor.close()
-        conn.close()
+        get_pool(dsn).putconn(conn)
         
         print(f"SMS Code for {phone}: {code}")
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'message': f'Verification code sent to {phone}',
-                'verification_id': verification_id,
-                'dev_code': code
-            }),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {
+            'success': True,
+            'message': f'Verification code sent to {phone}',
+            'verification_id': verification_id,
+            'dev_code': code
+        })
         
     except Exception as e:
         if conn:
-            conn.close()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
 
+@router.route('POST', 'verify')
 def verify_code(event: dict, dsn: str) -> dict:
+    conn = None
     try:
         body = json.loads(event.get('body', '{}'))
         phone = body.get('phone', '').strip()
         code = body.get('code', '').strip()
         
         if not phone or not code:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Phone and code are required'}),
-                'isBase64Encoded': False
-            }
-        
-        conn = psycopg2.connect(dsn)
+            return error_response(400, 'Phone and code are required')
+        
+        conn = get_pool(dsn).getconn()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         cursor.execute(
-            "SELECT id, code, expires_at, verified, attempts FROM verification_codes WHERE phone = %s AND verified = false ORDER BY created_at DESC LIMIT 1",
-            (phone,)
+            """
+            WITH target AS (
+                SELECT id, attempts, expires_at > CURRENT_TIMESTAMP AS fresh
+                FROM verification_codes
+                WHERE phone = %(phone)s AND verified = false
+                ORDER BY created_at DESC
+                LIMIT 1
+                FOR UPDATE
+            ),
+            attempt AS (
+                UPDATE verification_codes v
+                SET attempts = v.attempts + 1, verified = (v.code = %(code)s)
+                FROM target t
+                WHERE v.id = t.id AND t.attempts < %(max_attempts)s AND t.fresh
+                RETURNING v.verified
+            )
+            SELECT t.attempts, t.fresh, a.verified
+            FROM target t
+            LEFT JOIN attempt a ON true
+            """,
+            {'phone': phone, 'code': code, 'max_attempts': MAX_VERIFY_ATTEMPTS}
         )
         
         verification = cursor.fetchone()
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
         
         if not verification:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'No verification code found'}),
-                'isBase64Encoded': False
-            }
-        
-        if verification['attempts'] >= 3:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 403,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Too many attempts. Request a new code'}),
-                'isBase64Encoded': False
-            }
-        
-        if datetime.now() > verification['expires_at']:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 410,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Verification code expired'}),
-                'isBase64Encoded': False
-            }
+            return error_response(404, 'No verification code found')
         
-        cursor.execute(
-            "UPDATE verification_codes SET attempts = attempts + 1 WHERE id = %s",
-            (verification['id'],)
-        )
+        if verification['attempts'] >= MAX_VERIFY_ATTEMPTS:
+            return error_response(403, 'Too many attempts. Request a new code')
         
-        if verification['code'] != code:
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Invalid verification code'}),
-                'isBase64Encoded': False
-            }
+        if not verification['fresh']:
+            return error_response(410, 'Verification code expired')
         
-        cursor.execute(
-            "UPDATE verification_codes SET verified = true WHERE id = %s",
-            (verification['id'],)
-        )
-        conn.commit()
+        if not verification['verified']:
+            return error_response(401, 'Invalid verification code')
         
-        cursor.close()
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'message': 'Phone number verified successfully'
-            }),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {
+            'success': True,
+            'message': 'Phone number verified successfully'
+        })
         
     except Exception as e:
         if conn:
-            conn.close()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
@@ -0,0 +1,330 @@
+import os
+import sys
+import threading
+import time
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import get_pool
+from shared.http import Router, json_response, error_response, dumps
+from shared.auth import authenticate
+from shared.notify import get_hub
+from shared.pagination import encode_cursor, decode_cursor, clamp_limit
+from shared.profiles import load_profiles
+
+POLL_TIMEOUT = 25
+POLL_MAX_TIMEOUT = 28
+POLL_BATCH_SIZE = 100
+POLL_SETTLE_SECONDS = 30
+POLL_MAX_SEEN = 200
+LISTENER_READY_TIMEOUT = 2
+SSE_RETRY_MS = 1000
+POLL_MAX_WAITERS = int(os.environ.get('POLL_MAX_WAITERS', '48'))
+POLL_BUSY_RETRY_SECONDS = 2
+UPDATE_COLUMNS = "id, chat_id, sender_id, content, message_type, created_at, edited_at, attachment_sha256, attachment_name"
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+SNAPSHOT_PHASES = ('chats', 'contacts')
+
+router = Router('OfChat Updates API', allow_headers='Content-Type, Last-Event-ID, X-Auth-Token')
+_waiters = threading.BoundedSemaphore(max(POLL_MAX_WAITERS, 1))
+
+def handler(event: dict, context) -> dict:
+    '''API для доставки новых сообщений по long-poll или server-sent events и синхронизации изменений после офлайна'''
+    return router(event, context)
+
+def fetch_user_chat_ids(cursor, user_id) -> list:
+    cursor.execute("SELECT chat_id FROM chat_members WHERE user_id = %s", (user_id,))
+    return [row['chat_id'] for row in cursor.fetchall()]
+
+def fetch_updates(cursor, chat_ids: list, watermark: int, seen: list) -> list:
+    cursor.execute(
+        f"""
+        SELECT {UPDATE_COLUMNS}
+        FROM messages
+        WHERE chat_id = ANY(%s) AND id > %s AND id <> ALL(%s) AND is_archived = false
+        ORDER BY id
+        LIMIT %s
+        """,
+        (chat_ids, watermark, [entry[0] for entry in seen], POLL_BATCH_SIZE)
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+def fetch_settled_watermark(cursor) -> int:
+    cursor.execute(
+        "SELECT COALESCE(MAX(id), 0) AS last_id FROM messages WHERE created_at < CURRENT_TIMESTAMP - make_interval(secs => %s)",
+        (POLL_SETTLE_SECONDS,)
+    )
+    return cursor.fetchone()['last_id']
+
+def parse_poll_cursor(value: str) -> tuple:
+    if value.isdigit():
+        return int(value), []
+    watermark, seen = decode_cursor(value, 2)
+    return int(watermark), [[int(message_id), int(delivered_at)] for message_id, delivered_at in seen]
+
+def advance_poll_cursor(watermark: int, seen: list, messages: list) -> tuple:
+    now = int(time.time())
+    seen = seen + [[message['id'], now] for message in messages]
+    settled = [message_id for message_id, delivered_at in seen if delivered_at <= now - POLL_SETTLE_SECONDS]
+    if settled:
+        ceiling = messages[-1]['id'] if len(messages) >= POLL_BATCH_SIZE else None
+        watermark = max(watermark, min(max(settled), ceiling) if ceiling else max(settled))
+    seen = [entry for entry in seen if entry[0] > watermark]
+    return watermark, seen[-POLL_MAX_SEEN:]
+
+def updates_response(messages: list, next_cursor: str, as_sse: bool, retry_ms: int = SSE_RETRY_MS) -> dict:
+    if as_sse:
+        chunks = [f'retry: {retry_ms}\n\n']
+        for message in messages:
+            chunks.append(f"event: message\ndata: {dumps(message)}\n\n")
+        chunks.append(f'id: {next_cursor}\n: {"cursor" if messages else "keep-alive"}\n\n')
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': ''.join(chunks),
+            'isBase64Encoded': False
+        }
+    return json_response(200, {
+        'success': True,
+        'messages': messages,
+        'count': len(messages),
+        'cursor': next_cursor
+    })
+
+@router.route('GET', 'poll')
+def poll_updates(event: dict, dsn: str) -> dict:
+    conn = None
+    subscription = None
+    try:
+        query_params = event.get('queryStringParameters', {}) or {}
+        headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+        as_sse = query_params.get('format', '') == 'sse' or 'text/event-stream' in headers.get('accept', '')
+        claims = authenticate(event, dsn, allow_query_token=as_sse)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        user_id = claims['user_id']
+        since = query_params.get('since') or headers.get('last-event-id')
+        
+        try:
+            timeout = min(max(float(query_params.get('timeout', POLL_TIMEOUT)), 0), POLL_MAX_TIMEOUT)
+            since = parse_poll_cursor(since) if since else None
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid timeout or since')
+        
+        hub = get_hub(dsn)
+        hub.wait_ready(LISTENER_READY_TIMEOUT)
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        chat_ids = fetch_user_chat_ids(cursor, user_id)
+        subscription = hub.subscribe(chat_ids)
+        
+        if since is None:
+            watermark = fetch_settled_watermark(cursor)
+            seen = advance_poll_cursor(watermark, [], fetch_updates(cursor, chat_ids, watermark, []) if chat_ids else [])[1]
+            messages = []
+        else:
+            watermark, seen = since
+            messages = fetch_updates(cursor, chat_ids, watermark, seen) if chat_ids else []
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        conn = None
+        
+        waiting = bool(not messages and chat_ids and timeout > 0)
+        if waiting and not _waiters.acquire(blocking=False):
+            hub.unsubscribe(subscription)
+            if as_sse:
+                return updates_response([], encode_cursor(watermark, seen), as_sse, POLL_BUSY_RETRY_SECONDS * 1000)
+            return error_response(503, 'Too many open long-polls, retry shortly', {'Retry-After': str(POLL_BUSY_RETRY_SECONDS)})
+        
+        deadline = time.monotonic() + timeout
+        try:
+            while not messages and chat_ids:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not subscription.wait(remaining):
+                    break
+                conn = get_pool(dsn).getconn()
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                messages = fetch_updates(cursor, chat_ids, watermark, seen)
+                cursor.close()
+                get_pool(dsn).putconn(conn)
+                conn = None
+        finally:
+            if waiting:
+                _waiters.release()
+        
+        hub.unsubscribe(subscription)
+        
+        watermark, seen = advance_poll_cursor(watermark, seen, messages)
+        return updates_response(messages, encode_cursor(watermark, seen), as_sse)
+        
+    except Exception as e:
+        if subscription:
+            get_hub(dsn).unsubscribe(subscription)
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+def fetch_change_head(cursor, user_id) -> dict:
+    cursor.execute("SELECT last_seq, snapshot_seq FROM user_change_heads WHERE user_id = %s", (user_id,))
+    return cursor.fetchone() or {'last_seq': 0, 'snapshot_seq': 0}
+
+def fetch_snapshot_page(cursor, user_id, phase: str, after_id: int, limit: int) -> tuple:
+    entries = {'chats': [], 'contacts': []}
+    while phase is not None and limit > 0:
+        if phase == 'chats':
+            cursor.execute(
+                """
+                SELECT cm.chat_id, c.last_message_id, cm.unread_count, cm.last_read_message_id
+                FROM chat_members cm
+                JOIN chats c ON c.id = cm.chat_id
+                WHERE cm.user_id = %s AND cm.chat_id > %s
+                ORDER BY cm.chat_id
+                LIMIT %s
+                """,
+                (user_id, after_id, limit)
+            )
+            rows = [dict(row, removed=False) for row in cursor.fetchall()]
+            key = 'chat_id'
+        else:
+            cursor.execute(
+                """
+                SELECT contact_user_id AS user_id
+                FROM contacts
+                WHERE user_id = %s AND contact_user_id > %s
+                ORDER BY contact_user_id
+                LIMIT %s
+                """,
+                (user_id, after_id, limit)
+            )
+            rows = [dict(row, removed=False) for row in cursor.fetchall()]
+            key = 'user_id'
+        entries[phase].extend(rows)
+        limit -= len(rows)
+        if limit <= 0:
+            return entries, phase, rows[-1][key]
+        following = SNAPSHOT_PHASES.index(phase) + 1
+        phase = SNAPSHOT_PHASES[following] if following < len(SNAPSHOT_PHASES) else None
+        after_id = 0
+    return entries, phase, after_id
+
+def fetch_change_page(cursor, user_id, since: int, limit: int) -> tuple:
+    cursor.execute(
+        """
+        SELECT uc.seq, uc.kind, uc.entity_id, uc.chat_id, uc.message_id, uc.removed,
+               cm.unread_count, cm.last_read_message_id
+        FROM user_changes uc
+        LEFT JOIN chat_members cm ON uc.kind = 'chat' AND cm.chat_id = uc.entity_id AND cm.user_id = uc.user_id
+        WHERE uc.user_id = %s AND uc.seq > %s
+        ORDER BY uc.seq
+        LIMIT %s
+        """,
+        (user_id, since, limit + 1)
+    )
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    entries = {'chats': [], 'contacts': [], 'edits': []}
+    edits = {}
+    for row in rows:
+        if row['kind'] == 'chat':
+            entries['chats'].append({
+                'chat_id': row['entity_id'],
+                'last_message_id': row['message_id'],
+                'unread_count': row['unread_count'],
+                'last_read_message_id': row['last_read_message_id'],
+                'removed': row['removed'],
+                'seq': row['seq']
+            })
+        elif row['kind'] == 'contact':
+            entries['contacts'].append({'user_id': row['entity_id'], 'removed': row['removed'], 'seq': row['seq']})
+        elif row['kind'] == 'edit':
+            edits[row['entity_id']] = row
+    if edits:
+        cursor.execute(
+            f"""
+            SELECT {UPDATE_COLUMNS}
+            FROM messages
+            WHERE id = ANY(%s) AND chat_id = ANY(%s)
+            """,
+            (list(edits), list({row['chat_id'] for row in edits.values()}))
+        )
+        for message in cursor.fetchall():
+            entries['edits'].append(dict(message, seq=edits[message['id']]['seq']))
+        entries['edits'].sort(key=lambda message: message['seq'])
+    last_seq = rows[-1]['seq'] if rows else since
+    return entries, last_seq, has_more
+
+@router.route('GET', 'sync')
+def sync_changes(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        user_id = claims['user_id']
+        snapshot_cursor = query_params.get('cursor', '')
+        
+        try:
+            since = int(query_params.get('since') or 0)
+            limit = clamp_limit(query_params.get('limit'), SYNC_PAGE_SIZE, SYNC_MAX_PAGE_SIZE)
+            snapshot_seq, phase, after_id = decode_cursor(snapshot_cursor, 3) if snapshot_cursor else (None, None, None)
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid since, limit or cursor')
+        
+        if snapshot_cursor and (phase not in SNAPSHOT_PHASES or not isinstance(after_id, int)):
+            return error_response(400, 'Invalid since, limit or cursor')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        head = fetch_change_head(cursor, user_id)
+        
+        if not snapshot_cursor and 0 < since and head['snapshot_seq'] <= since:
+            entries, last_seq, has_more = fetch_change_page(cursor, user_id, since, limit)
+            next_cursor = None
+            snapshot = False
+        else:
+            if not snapshot_cursor:
+                snapshot_seq, phase, after_id = head['last_seq'], SNAPSHOT_PHASES[0], 0
+            entries, phase, after_id = fetch_snapshot_page(cursor, user_id, phase, after_id, limit)
+            entries['edits'] = []
+            last_seq = snapshot_seq
+            next_cursor = encode_cursor(snapshot_seq, phase, after_id) if phase is not None else None
+            has_more = next_cursor is not None or head['last_seq'] > snapshot_seq
+            snapshot = True
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        conn = None
+        
+        added = [entry['user_id'] for entry in entries['contacts'] if not entry['removed']]
+        profiles = load_profiles(dsn, added) if added else {}
+        for entry in entries['contacts']:
+            entry['profile'] = profiles.get(entry['user_id'])
+        
+        return json_response(200, {
+            'success': True,
+            'snapshot': snapshot,
+            'seq': last_seq,
+            'cursor': next_cursor,
+            'has_more': has_more,
+            **entries
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
@@ -1,134 +1,208 @@
 import json
 import os
+import sys
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import get_pool
+from shared.http import Router, json_response, error_response
+from shared.auth import authenticate
+from shared.pagination import encode_cursor, decode_cursor, clamp_limit
+from shared.phones import normalize_phone
+from shared.ratelimit import SEARCH_PER_IP, check_rate_limits, client_ip
+from shared.presence import PRESENCE_TTL, online_column, record_heartbeat, flush_heartbeats
+from shared.suggestions import SUGGESTIONS_TOP_K, record_contact_edges
+
+PRESENCE_MAX_IDS = 500
+SYNC_MAX_ENTRIES = 5000
+CONTACTS_PAGE_SIZE = 200
+CONTACTS_MAX_PAGE_SIZE = 500
+SUGGESTIONS_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+SEARCH_MIN_SIMILARITY_LENGTH = 3
+SEARCH_MAX_CANDIDATES = 1000
+SEARCH_TIER_EXACT = 0
+SEARCH_TIER_PREFIX = 1
+SEARCH_TIER_SIMILAR = 2
+SEARCH_COLUMNS = f"id, unique_id, username, avatar_url, bio, {online_column()}"
+USERNAME_KEY = 'lower(username) COLLATE "C"'
+
+router = Router('OfChat Users API', allow_headers='Content-Type, X-Auth-Token, If-None-Match')
+
 def handler(event: dict, context) -> dict:
-    '''API для поиска пользователей и управления контактами'''
-    
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    dsn = os.environ.get('DATABASE_URL')
-    if not dsn:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Database connection not configured'}),
-            'isBase64Encoded': False
+    '''API для поиска пользователей, управления контактами и рекомендаций знакомых'''
+    return router(event, context)
+
+def escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def decode_search_cursor(value: str) -> tuple:
+    if not value:
+        return SEARCH_TIER_EXACT, None, None
+    tier, key, last_id = decode_cursor(value, 3)
+    return int(tier), key, last_id
+
+def search_tiers(search_query: str) -> tuple:
+    if search_query.startswith('#'):
+        return search_query[1:].strip(), [SEARCH_TIER_EXACT], False
+    if search_query.startswith('@'):
+        term = search_query[1:].strip()
+        tiers = [SEARCH_TIER_PREFIX]
+        if len(term) >= SEARCH_MIN_SIMILARITY_LENGTH:
+            tiers.append(SEARCH_TIER_SIMILAR)
+        return term, tiers, False
+    tiers = [SEARCH_TIER_EXACT, SEARCH_TIER_PREFIX]
+    if len(search_query) >= SEARCH_MIN_SIMILARITY_LENGTH:
+        tiers.append(SEARCH_TIER_SIMILAR)
+    return search_query, tiers, True
+
+def fetch_search_tier(cursor, tier: int, term: str, match_unique_id: bool, key, last_id, limit: int) -> list:
+    lowered = term.lower()
+    unique_id = term.upper()
+    prefix = escape_like(lowered) + '%'
+    exact_clause = "AND unique_id <> %(unique_id)s" if match_unique_id else ""
+    if tier == SEARCH_TIER_EXACT:
+        cursor.execute(
+            f"SELECT {SEARCH_COLUMNS} FROM users WHERE unique_id = %s AND id > %s",
+            (unique_id, last_id or 0)
+        )
+        return [(row, None) for row in cursor.fetchall()]
+    if tier == SEARCH_TIER_PREFIX:
+        cursor.execute(
+            f"""
+            SELECT {SEARCH_COLUMNS}, {USERNAME_KEY} AS sort_key
+            FROM users
+            WHERE {USERNAME_KEY} LIKE %(prefix)s {exact_clause}
+              AND ({USERNAME_KEY}, id) > (%(key)s, %(last_id)s)
+            ORDER BY {USERNAME_KEY}, id
+            LIMIT %(limit)s
+            """,
+            {'prefix': prefix, 'unique_id': unique_id, 'key': key or '', 'last_id': last_id or 0, 'limit': limit}
+        )
+        return [(row, row.pop('sort_key')) for row in cursor.fetchall()]
+    contains = '%' + escape_like(lowered) + '%'
+    unique_id_clause = "OR unique_id LIKE %(unique_id_contains)s" if match_unique_id else ""
+    keyset_clause = ""
+    if key is not None:
+        keyset_clause = "WHERE score < %(score)s::real OR (score = %(score)s::real AND id > %(last_id)s)"
+    cursor.execute(
+        f"""
+        WITH candidates AS (
+            SELECT {SEARCH_COLUMNS}, similarity(lower(username), %(term)s) AS score
+            FROM users
+            WHERE (lower(username) %% %(term)s OR lower(username) LIKE %(contains)s {unique_id_clause})
+              AND {USERNAME_KEY} NOT LIKE %(prefix)s {exact_clause}
+            ORDER BY score DESC, id
+            LIMIT %(candidates)s
+        )
+        SELECT * FROM candidates
+        {keyset_clause}
+        ORDER BY score DESC, id
+        LIMIT %(limit)s
+        """,
+        {
+            'term': lowered,
+            'contains': contains,
+            'unique_id_contains': '%' + escape_like(unique_id) + '%',
+            'prefix': prefix,
+            'unique_id': unique_id,
+            'candidates': SEARCH_MAX_CANDIDATES,
+            'score': key,
+            'last_id': last_id,
+            'limit': limit
         }
-    
-    query_params = event.get('queryStringParameters', {}) or {}
-    action = query_params.get('action', '')
-    
-    if method == 'GET' and action == 'search':
-        return search_users(event, dsn)
-    elif method == 'POST' and action == 'add_contact':
-        return add_contact(event, dsn)
-    elif method == 'GET' and action == 'contacts':
-        return get_contacts(event, dsn)
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'message': 'OfChat Users API'}),
-        'isBase64Encoded': False
-    }
+    )
+    return [(row, row.pop('score')) for row in cursor.fetchall()]
+
+def find_users(cursor, search_query: str, limit: int, page_cursor: str) -> tuple:
+    term, tiers, match_unique_id = search_tiers(search_query)
+    start_tier, key, last_id = decode_search_cursor(page_cursor)
+    users = []
+    next_cursor = None
+    for position, tier in enumerate(tiers):
+        if tier < start_tier:
+            continue
+        if tier > start_tier:
+            key, last_id = None, None
+        remaining = limit - len(users)
+        rows = fetch_search_tier(cursor, tier, term, match_unique_id, key, last_id, remaining + 1)
+        if len(rows) > remaining:
+            rows = rows[:remaining]
+            users.extend(dict(row) for row, _ in rows)
+            last_row, last_key = rows[-1]
+            next_cursor = encode_cursor(tier, last_key, last_row['id'])
+            break
+        users.extend(dict(row) for row, _ in rows)
+        if len(users) == limit and position + 1 < len(tiers):
+            next_cursor = encode_cursor(tiers[position + 1], None, None)
+            break
+    return users, next_cursor
 
+@router.route('GET', 'search')
 def search_users(event: dict, dsn: str) -> dict:
+    conn = None
     try:
         query_params = event.get('queryStringParameters', {}) or {}
         search_query = query_params.get('q', '').strip()
+        page_cursor = query_params.get('cursor', '')
         
-        if not search_query:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Search query is required'}),
-                'isBase64Encoded': False
-            }
+        if not search_query or search_query in ('#', '@'):
+            return error_response(400, 'Search query is required')
         
-        conn = psycopg2.connect(dsn)
+        try:
+            limit = clamp_limit(query_params.get('limit'), SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+            decode_search_cursor(page_cursor)
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid limit or cursor')
+        
+        conn = get_pool(dsn).getconn()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        if search_query.startswith('#'):
-            unique_id = search_query[1:].upper()
-            cursor.execute(
-                "SELECT id, unique_id, username, avatar_url, bio, is_online FROM users WHERE unique_id = %s",
-                (unique_id,)
-            )
-        elif search_query.startswith('@'):
-            username = search_query[1:]
-            cursor.execute(
-                "SELECT id, unique_id, username, avatar_url, bio, is_online FROM users WHERE username ILIKE %s LIMIT 20",
-                (f'%{username}%',)
-            )
-        else:
-            cursor.execute(
-                "SELECT id, unique_id, username, avatar_url, bio, is_online FROM users WHERE username ILIKE %s OR unique_id ILIKE %s LIMIT 20",
-                (f'%{search_query}%', f'%{search_query}%')
-            )
+        allowed, retry_after = check_rate_limits(conn, (SEARCH_PER_IP, client_ip(event)))
+        if not allowed:
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+            return error_response(429, 'Too many search requests. Slow down', {'Retry-After': str(retry_after)})
         
-        users = [dict(row) for row in cursor.fetchall()]
+        users, next_cursor = find_users(cursor, search_query, limit, page_cursor)
         
         cursor.close()
-        conn.close()
+        get_pool(dsn).putconn(conn)
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'users': users,
-                'count': len(users)
-            }),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {
+            'success': True,
+            'users': users,
+            'count': len(users),
+            'next_cursor': next_cursor
+        })
         
     except Exception as e:
         if conn:
-            conn.close()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
 
+@router.route('POST', 'add_contact')
 def add_contact(event: dict, dsn: str) -> dict:
+    conn = None
     try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
         body = json.loads(event.get('body', '{}'))
-        user_id = body.get('user_id')
+        user_id = claims['user_id']
         contact_user_id = body.get('contact_user_id')
         
-        if not user_id or not contact_user_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'user_id and contact_user_id are required'}),
-                'isBase64Encoded': False
-            }
+        if not contact_user_id:
+            return error_response(400, 'contact_user_id is required')
         
-        if user_id == contact_user_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Cannot add yourself as contact'}),
-                'isBase64Encoded': False
-            }
+        if str(user_id) == str(contact_user_id):
+            return error_response(400, 'Cannot add yourself as contact')
         
-        conn = psycopg2.connect(dsn)
+        conn = get_pool(dsn).getconn()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         cursor.execute(
@@ -137,91 +211,352 @@ def add_contact(event: dict, dsn: str) -> dict:
         )
         
         result = cursor.fetchone()
+        if result:
+            record_contact_edges(cursor, user_id, [contact_user_id])
         conn.commit()
         
         cursor.close()
-        conn.close()
+        get_pool(dsn).putconn(conn)
         
         if result:
-            return {
-                'statusCode': 201,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': True,
-                    'message': 'Contact added successfully'
-                }),
-                'isBase64Encoded': False
-            }
+            return json_response(201, {
+                'success': True,
+                'message': 'Contact added successfully'
+            })
         else:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': True,
-                    'message': 'Contact already exists'
-                }),
-                'isBase64Encoded': False
-            }
+            return json_response(200, {
+                'success': True,
+                'message': 'Contact already exists'
+            })
+        
+    except psycopg2.IntegrityError:
+        if conn:
+            conn.rollback()
+            get_pool(dsn).putconn(conn)
+        return error_response(404, 'User not found')
         
     except Exception as e:
         if conn:
-            conn.close()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
 
+@router.route('POST', 'remove_contact')
+def remove_contact(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        body = json.loads(event.get('body', '{}'))
+        contact_user_id = body.get('contact_user_id')
+        
+        if not contact_user_id:
+            return error_response(400, 'contact_user_id is required')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            "DELETE FROM contacts WHERE user_id = %s AND contact_user_id = %s RETURNING id",
+            (claims['user_id'], contact_user_id)
+        )
+        
+        result = cursor.fetchone()
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {
+            'success': True,
+            'message': 'Contact removed' if result else 'Contact not found'
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('POST', 'sync_contacts')
+def sync_contacts(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        body = json.loads(event.get('body', '{}'))
+        hashed = 'phone_hashes' in body
+        entries = body.get('phone_hashes' if hashed else 'phones') or []
+        
+        if not isinstance(entries, list) or not entries:
+            return error_response(400, 'phones or phone_hashes list is required')
+        
+        if len(entries) > SYNC_MAX_ENTRIES:
+            return error_response(413, f'At most {SYNC_MAX_ENTRIES} entries per sync')
+        
+        if hashed:
+            keys = sorted({str(entry).strip().lower() for entry in entries if str(entry).strip()})
+            match_column = 'phone_hash'
+        else:
+            keys = sorted({normalize_phone(entry) for entry in entries} - {''})
+            match_column = 'phone'
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            f"""
+            WITH matched AS (
+                SELECT id, unique_id, username, avatar_url, bio, {match_column} AS match_key
+                FROM users
+                WHERE {match_column} = ANY(%s) AND id <> %s
+            ),
+            inserted AS (
+                INSERT INTO contacts (user_id, contact_user_id)
+                SELECT %s, id FROM matched
+                ON CONFLICT (user_id, contact_user_id) DO NOTHING
+                RETURNING contact_user_id
+            )
+            SELECT m.*, (i.contact_user_id IS NOT NULL) AS added
+            FROM matched m
+            LEFT JOIN inserted i ON i.contact_user_id = m.id
+            ORDER BY m.username
+            """,
+            (keys, claims['user_id'], claims['user_id'])
+        )
+        
+        matches = [dict(row) for row in cursor.fetchall()]
+        added = [match['id'] for match in matches if match['added']]
+        if added:
+            record_contact_edges(cursor, claims['user_id'], added)
+        conn.commit()
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        for match in matches:
+            match[match_column] = match.pop('match_key').strip()
+        
+        return json_response(200, {
+            'success': True,
+            'matches': matches,
+            'matched': len(matches),
+            'added': len(added)
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'suggestions')
+def get_suggestions(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        
+        try:
+            limit = clamp_limit(query_params.get('limit'), SUGGESTIONS_PAGE_SIZE, SUGGESTIONS_TOP_K)
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid limit')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(
+            f"""
+            SELECT u.id, u.unique_id, u.username, u.avatar_url, u.bio, {online_column('u')}, s.mutual_count
+            FROM contact_suggestions s
+            JOIN users u ON u.id = s.candidate_id
+            WHERE s.user_id = %s
+              AND NOT EXISTS (SELECT 1 FROM contacts c WHERE c.user_id = s.user_id AND c.contact_user_id = s.candidate_id)
+            ORDER BY s.mutual_count DESC, s.candidate_id
+            LIMIT %s
+            """,
+            (claims['user_id'], limit)
+        )
+        
+        suggestions = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {
+            'success': True,
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'contacts')
 def get_contacts(event: dict, dsn: str) -> dict:
+    conn = None
     try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        user_id = claims['user_id']
         query_params = event.get('queryStringParameters', {}) or {}
-        user_id = query_params.get('user_id')
+        headers = {key.lower(): value for key, value in (event.get('headers') or {}).items()}
+        after = query_params.get('cursor', '')
+        
+        try:
+            limit = clamp_limit(query_params.get('limit'), CONTACTS_PAGE_SIZE, CONTACTS_MAX_PAGE_SIZE)
+            after_added_at, after_id = decode_cursor(after, 2) if after else (None, None)
+        except (ValueError, TypeError):
+            return error_response(400, 'Invalid limit or cursor')
         
-        if not user_id:
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute("SELECT version FROM contact_list_versions WHERE user_id = %s", (user_id,))
+        row = cursor.fetchone()
+        version = row['version'] if row else 0
+        etag = f'W/"contacts-{user_id}-{version}"'
+        
+        if headers.get('if-none-match') == etag:
+            cursor.close()
+            get_pool(dsn).putconn(conn)
             return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'user_id is required'}),
+                'statusCode': 304,
+                'headers': {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Access-Control-Allow-Origin': '*', 'Access-Control-Expose-Headers': 'ETag'},
+                'body': '',
                 'isBase64Encoded': False
             }
         
-        conn = psycopg2.connect(dsn)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        conditions = ["c.user_id = %s"]
+        params = [user_id]
+        if after_id is not None:
+            conditions.append("(c.added_at, c.id) < (%s, %s)")
+            params.extend([after_added_at, after_id])
+        params.append(limit + 1)
         
         cursor.execute(
-            """
-            SELECT u.id, u.unique_id, u.username, u.avatar_url, u.bio, u.is_online, u.last_seen, c.added_at
+            f"""
+            SELECT u.id, u.unique_id, u.username, u.avatar_url, u.bio, c.added_at, c.id AS contact_id
             FROM contacts c
             JOIN users u ON c.contact_user_id = u.id
-            WHERE c.user_id = %s
-            ORDER BY c.added_at DESC
+            WHERE {' AND '.join(conditions)}
+            ORDER BY c.added_at DESC, c.id DESC
+            LIMIT %s
             """,
-            (user_id,)
+            params
         )
         
         contacts = [dict(row) for row in cursor.fetchall()]
         
         cursor.close()
-        conn.close()
+        get_pool(dsn).putconn(conn)
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'contacts': contacts,
-                'count': len(contacts)
-            }, default=str),
-            'isBase64Encoded': False
-        }
+        next_cursor = None
+        if len(contacts) > limit:
+            contacts = contacts[:limit]
+            next_cursor = encode_cursor(contacts[-1]['added_at'].isoformat(), contacts[-1]['contact_id'])
+        for contact in contacts:
+            del contact['contact_id']
+        
+        return json_response(200, {
+            'success': True,
+            'contacts': contacts,
+            'count': len(contacts),
+            'version': version,
+            'next_cursor': next_cursor
+        }, {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Access-Control-Expose-Headers': 'ETag'})
         
     except Exception as e:
         if conn:
-            conn.close()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('POST', 'heartbeat')
+def send_heartbeat(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        if record_heartbeat(claims['user_id']):
+            conn = get_pool(dsn).getconn()
+            cursor = conn.cursor()
+            flush_heartbeats(cursor)
+            conn.commit()
+            cursor.close()
+            get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {'success': True, 'ttl': PRESENCE_TTL})
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
+
+@router.route('GET', 'presence')
+def get_presence(event: dict, dsn: str) -> dict:
+    conn = None
+    try:
+        claims = authenticate(event, dsn)
+        
+        if not claims:
+            return error_response(401, 'Authentication required')
+        
+        query_params = event.get('queryStringParameters', {}) or {}
+        
+        try:
+            ids = [int(value) for value in query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return error_response(400, 'ids must be a comma-separated list of integers')
+        
+        if len(ids) > PRESENCE_MAX_IDS:
+            return error_response(400, f'At most {PRESENCE_MAX_IDS} ids are allowed')
+        
+        conn = get_pool(dsn).getconn()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        
+        if ids:
+            cursor.execute(
+                f"SELECT id, last_seen, {online_column()} FROM users WHERE id = ANY(%s)",
+                (ids,)
+            )
+        else:
+            cursor.execute(
+                f"""
+                SELECT u.id, u.last_seen, {online_column('u')}
+                FROM contacts c
+                JOIN users u ON c.contact_user_id = u.id
+                WHERE c.user_id = %s
+                """,
+                (claims['user_id'],)
+            )
+        
+        presence = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.close()
+        get_pool(dsn).putconn(conn)
+        
+        return json_response(200, {
+            'success': True,
+            'presence': presence,
+            'ttl': PRESENCE_TTL
+        })
+        
+    except Exception as e:
+        if conn:
+            get_pool(dsn).putconn(conn)
+        return error_response(500, str(e))
@@ -0,0 +1,5 @@
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX idx_users_username_prefix ON users ((lower(username) COLLATE "C"), id);
+CREATE INDEX idx_users_username_trgm ON users USING GIN (lower(username) gin_trgm_ops);
+CREATE INDEX idx_users_unique_id_trgm ON users USING GIN (unique_id gin_trgm_ops);
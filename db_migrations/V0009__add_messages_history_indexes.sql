@@ -0,0 +1,2 @@
+CREATE INDEX idx_messages_chat_history ON messages (chat_id, created_at DESC, id DESC);
+CREATE INDEX idx_messages_chat_history_active ON messages (chat_id, created_at DESC, id DESC) WHERE is_archived = false;
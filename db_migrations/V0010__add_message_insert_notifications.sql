@@ -0,0 +1,15 @@
+CREATE INDEX idx_chat_members_user_id ON chat_members(user_id);
+
+CREATE OR REPLACE FUNCTION notify_message_inserted() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify(
+    'chat_messages',
+    json_build_object('id', NEW.id, 'chat_id', NEW.chat_id, 'sender_id', NEW.sender_id)::text
+  );
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_messages_notify
+  AFTER INSERT ON messages
+  FOR EACH ROW EXECUTE FUNCTION notify_message_inserted();
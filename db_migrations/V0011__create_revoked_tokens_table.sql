@@ -0,0 +1,8 @@
+CREATE TABLE revoked_tokens (
+  token_id VARCHAR(32) PRIMARY KEY,
+  user_id INTEGER NOT NULL,
+  expires_at TIMESTAMP NOT NULL,
+  revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
@@ -0,0 +1,3 @@
+ALTER TABLE users ADD COLUMN phone_hash CHAR(64) GENERATED ALWAYS AS (encode(sha256(convert_to(phone, 'UTF8')), 'hex')) STORED;
+
+CREATE INDEX idx_users_phone_hash ON users(phone_hash);
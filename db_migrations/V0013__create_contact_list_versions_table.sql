@@ -0,0 +1,43 @@
+CREATE TABLE contact_list_versions (
+  user_id INTEGER PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE INDEX idx_contacts_contact_user_id ON contacts(contact_user_id);
+CREATE INDEX idx_contacts_user_added ON contacts(user_id, added_at DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION bump_contact_list_versions_from_contacts() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO contact_list_versions (user_id, version)
+  SELECT DISTINCT user_id, 1 FROM changed_contacts
+  ON CONFLICT (user_id) DO UPDATE SET version = contact_list_versions.version + 1;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_contacts_insert_version
+  AFTER INSERT ON contacts
+  REFERENCING NEW TABLE AS changed_contacts
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_contact_list_versions_from_contacts();
+
+CREATE TRIGGER trg_contacts_delete_version
+  AFTER DELETE ON contacts
+  REFERENCING OLD TABLE AS changed_contacts
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_contact_list_versions_from_contacts();
+
+CREATE OR REPLACE FUNCTION bump_contact_list_versions_from_profile() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO contact_list_versions (user_id, version)
+  SELECT user_id, 1 FROM contacts WHERE contact_user_id = NEW.id
+  ON CONFLICT (user_id) DO UPDATE SET version = contact_list_versions.version + 1;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_users_profile_version
+  AFTER UPDATE OF username, avatar_url, bio ON users
+  FOR EACH ROW
+  WHEN (OLD.username IS DISTINCT FROM NEW.username
+     OR OLD.avatar_url IS DISTINCT FROM NEW.avatar_url
+     OR OLD.bio IS DISTINCT FROM NEW.bio)
+  EXECUTE FUNCTION bump_contact_list_versions_from_profile();
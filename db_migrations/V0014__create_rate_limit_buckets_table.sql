@@ -0,0 +1,7 @@
+CREATE UNLOGGED TABLE rate_limit_buckets (
+  bucket_key VARCHAR(160) PRIMARY KEY,
+  tokens DOUBLE PRECISION NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX idx_rate_limit_buckets_updated_at ON rate_limit_buckets(updated_at);
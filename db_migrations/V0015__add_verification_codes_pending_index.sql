@@ -0,0 +1,3 @@
+CREATE INDEX idx_verification_phone_pending ON verification_codes (phone, created_at DESC) WHERE verified = false;
+
+DROP INDEX idx_verification_phone;
@@ -0,0 +1,53 @@
+ALTER TABLE messages RENAME TO messages_legacy;
+ALTER SEQUENCE messages_id_seq OWNED BY NONE;
+
+CREATE TABLE messages (
+  id INTEGER NOT NULL DEFAULT nextval('messages_id_seq'),
+  chat_id INTEGER,
+  sender_id INTEGER,
+  content TEXT NOT NULL,
+  message_type VARCHAR(20) DEFAULT 'text',
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  edited_at TIMESTAMP,
+  is_archived BOOLEAN DEFAULT false,
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE messages_id_seq OWNED BY messages.id;
+
+CREATE TABLE messages_default PARTITION OF messages DEFAULT;
+
+CREATE OR REPLACE FUNCTION ensure_messages_partition(month DATE) RETURNS TEXT AS $$
+DECLARE
+  start_at DATE := date_trunc('month', month)::DATE;
+  partition_name TEXT := 'messages_p' || to_char(start_at, 'YYYYMM');
+BEGIN
+  IF to_regclass(partition_name) IS NULL THEN
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+      partition_name, start_at, (start_at + INTERVAL '1 month')::DATE
+    );
+  END IF;
+  RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_messages_partition(month::DATE)
+FROM generate_series(
+  date_trunc('month', LEAST(COALESCE((SELECT MIN(created_at) FROM messages_legacy), CURRENT_TIMESTAMP), CURRENT_TIMESTAMP)),
+  date_trunc('month', CURRENT_TIMESTAMP + INTERVAL '2 months'),
+  INTERVAL '1 month'
+) AS month;
+
+INSERT INTO messages (id, chat_id, sender_id, content, message_type, created_at, edited_at, is_archived)
+SELECT id, chat_id, sender_id, content, message_type, COALESCE(created_at, CURRENT_TIMESTAMP), edited_at, is_archived
+FROM messages_legacy;
+
+DROP TABLE messages_legacy;
+
+CREATE INDEX idx_messages_chat_history ON messages (chat_id, created_at DESC, id DESC);
+CREATE INDEX idx_messages_chat_history_active ON messages (chat_id, created_at DESC, id DESC) WHERE is_archived = false;
+
+CREATE TRIGGER trg_messages_notify
+  AFTER INSERT ON messages
+  FOR EACH ROW EXECUTE FUNCTION notify_message_inserted();
@@ -0,0 +1,30 @@
+ALTER TABLE chats
+  ADD COLUMN last_message_id INTEGER,
+  ADD COLUMN last_message_at TIMESTAMP,
+  ADD COLUMN last_activity_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+ALTER TABLE chat_members
+  ADD COLUMN last_read_message_id INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN unread_count INTEGER NOT NULL DEFAULT 0,
+  ADD COLUMN last_activity_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE chats c
+SET last_message_id = m.id,
+    last_message_at = m.created_at,
+    last_activity_at = m.created_at
+FROM (
+  SELECT DISTINCT ON (chat_id) chat_id, id, created_at
+  FROM messages
+  ORDER BY chat_id, created_at DESC, id DESC
+) m
+WHERE m.chat_id = c.id;
+
+UPDATE chats SET last_activity_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE last_message_id IS NULL;
+
+UPDATE chat_members cm
+SET last_read_message_id = COALESCE(c.last_message_id, 0),
+    last_activity_at = c.last_activity_at
+FROM chats c
+WHERE c.id = cm.chat_id;
+
+CREATE INDEX idx_chat_members_inbox ON chat_members (user_id, last_activity_at DESC, chat_id DESC);
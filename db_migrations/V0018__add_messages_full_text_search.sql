@@ -0,0 +1,7 @@
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+ALTER TABLE messages
+  ADD COLUMN search_vector tsvector
+  GENERATED ALWAYS AS (to_tsvector('russian', content) || to_tsvector('simple', content)) STORED;
+
+CREATE INDEX idx_messages_search ON messages USING GIN (chat_id, search_vector);
@@ -0,0 +1,46 @@
+CREATE TABLE call_daily_stats (
+  user_id INTEGER NOT NULL,
+  day DATE NOT NULL,
+  direction VARCHAR(8) NOT NULL,
+  call_type VARCHAR(20) NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  calls INTEGER NOT NULL DEFAULT 0,
+  duration BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day, direction, call_type, status)
+);
+
+CREATE INDEX idx_calls_caller_history ON calls (caller_id, started_at DESC, id DESC);
+CREATE INDEX idx_calls_receiver_history ON calls (receiver_id, started_at DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION rollup_finished_call() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO call_daily_stats AS s (user_id, day, direction, call_type, status, calls, duration)
+  SELECT participant.user_id, COALESCE(NEW.started_at, NEW.ended_at)::DATE, participant.direction,
+         NEW.call_type, NEW.status, 1, COALESCE(NEW.duration, 0)
+  FROM (VALUES (NEW.caller_id, 'outgoing'), (NEW.receiver_id, 'incoming')) AS participant(user_id, direction)
+  WHERE participant.user_id IS NOT NULL
+  ON CONFLICT (user_id, day, direction, call_type, status) DO UPDATE
+  SET calls = s.calls + 1, duration = s.duration + EXCLUDED.duration;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_calls_insert_rollup
+  AFTER INSERT ON calls
+  FOR EACH ROW
+  WHEN (NEW.ended_at IS NOT NULL)
+  EXECUTE FUNCTION rollup_finished_call();
+
+CREATE TRIGGER trg_calls_end_rollup
+  AFTER UPDATE OF ended_at ON calls
+  FOR EACH ROW
+  WHEN (OLD.ended_at IS NULL AND NEW.ended_at IS NOT NULL)
+  EXECUTE FUNCTION rollup_finished_call();
+
+INSERT INTO call_daily_stats (user_id, day, direction, call_type, status, calls, duration)
+SELECT participant.user_id, COALESCE(c.started_at, c.ended_at)::DATE, participant.direction,
+       c.call_type, c.status, count(*), COALESCE(sum(c.duration), 0)
+FROM calls c
+CROSS JOIN LATERAL (VALUES (c.caller_id, 'outgoing'), (c.receiver_id, 'incoming')) AS participant(user_id, direction)
+WHERE c.ended_at IS NOT NULL AND participant.user_id IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5;
@@ -0,0 +1,44 @@
+ALTER TABLE chats ADD COLUMN member_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE chats c
+SET member_count = m.members
+FROM (SELECT chat_id, count(*) AS members FROM chat_members GROUP BY chat_id) m
+WHERE m.chat_id = c.id;
+
+CREATE OR REPLACE FUNCTION bump_chat_member_counts() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE chats c SET member_count = c.member_count + d.members
+    FROM (SELECT chat_id, count(*) AS members FROM changed_members GROUP BY chat_id) d
+    WHERE c.id = d.chat_id;
+  ELSE
+    UPDATE chats c SET member_count = GREATEST(0, c.member_count - d.members)
+    FROM (SELECT chat_id, count(*) AS members FROM changed_members GROUP BY chat_id) d
+    WHERE c.id = d.chat_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_chat_members_insert_count
+  AFTER INSERT ON chat_members
+  REFERENCING NEW TABLE AS changed_members
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_chat_member_counts();
+
+CREATE TRIGGER trg_chat_members_delete_count
+  AFTER DELETE ON chat_members
+  REFERENCING OLD TABLE AS changed_members
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_chat_member_counts();
+
+CREATE TABLE fanout_jobs (
+  id BIGSERIAL PRIMARY KEY,
+  chat_id INTEGER NOT NULL,
+  message_id INTEGER NOT NULL,
+  message_created_at TIMESTAMP NOT NULL,
+  sender_id INTEGER,
+  shard INTEGER NOT NULL DEFAULT 0,
+  shards INTEGER NOT NULL DEFAULT 1,
+  after_user_id INTEGER NOT NULL DEFAULT 0,
+  batches INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,56 @@
+DELETE FROM chat_members cm
+WHERE NOT EXISTS (SELECT 1 FROM chats c WHERE c.id = cm.chat_id)
+   OR NOT EXISTS (SELECT 1 FROM users u WHERE u.id = cm.user_id);
+
+DELETE FROM contacts ct
+WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = ct.user_id)
+   OR NOT EXISTS (SELECT 1 FROM users u WHERE u.id = ct.contact_user_id);
+
+DELETE FROM call_daily_stats s
+WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = s.user_id);
+
+DELETE FROM fanout_jobs j
+WHERE NOT EXISTS (SELECT 1 FROM chats c WHERE c.id = j.chat_id);
+
+DELETE FROM messages m
+WHERE m.chat_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM chats c WHERE c.id = m.chat_id);
+
+UPDATE messages m SET sender_id = NULL
+WHERE m.sender_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = m.sender_id);
+
+UPDATE chats c SET created_by = NULL
+WHERE c.created_by IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = c.created_by);
+
+UPDATE calls c SET caller_id = NULL
+WHERE c.caller_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = c.caller_id);
+
+UPDATE calls c SET receiver_id = NULL
+WHERE c.receiver_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users u WHERE u.id = c.receiver_id);
+
+CREATE INDEX idx_chats_created_by ON chats(created_by);
+CREATE INDEX idx_messages_sender_id ON messages(sender_id);
+
+ALTER TABLE chats
+  ADD CONSTRAINT fk_chats_created_by FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE chat_members
+  ADD CONSTRAINT fk_chat_members_chat FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE CASCADE,
+  ADD CONSTRAINT fk_chat_members_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+
+ALTER TABLE messages
+  ADD CONSTRAINT fk_messages_chat FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE CASCADE,
+  ADD CONSTRAINT fk_messages_sender FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE calls
+  ADD CONSTRAINT fk_calls_caller FOREIGN KEY (caller_id) REFERENCES users(id) ON DELETE SET NULL,
+  ADD CONSTRAINT fk_calls_receiver FOREIGN KEY (receiver_id) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE contacts
+  ADD CONSTRAINT fk_contacts_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+  ADD CONSTRAINT fk_contacts_contact_user FOREIGN KEY (contact_user_id) REFERENCES users(id) ON DELETE CASCADE;
+
+ALTER TABLE call_daily_stats
+  ADD CONSTRAINT fk_call_daily_stats_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+
+ALTER TABLE fanout_jobs
+  ADD CONSTRAINT fk_fanout_jobs_chat FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE CASCADE;
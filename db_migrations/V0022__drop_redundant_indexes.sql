@@ -0,0 +1,8 @@
+DROP INDEX IF EXISTS idx_users_unique_id;
+DROP INDEX IF EXISTS idx_users_username;
+DROP INDEX IF EXISTS idx_users_email;
+DROP INDEX IF EXISTS idx_users_phone;
+DROP INDEX IF EXISTS idx_contacts_user_id;
+DROP INDEX IF EXISTS idx_calls_caller_id;
+DROP INDEX IF EXISTS idx_calls_receiver_id;
+DROP INDEX IF EXISTS idx_chat_members_user_id;
@@ -0,0 +1,37 @@
+CREATE TABLE attachment_blobs (
+  sha256 CHAR(64) PRIMARY KEY,
+  size BIGINT NOT NULL,
+  mime_type VARCHAR(100) NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE attachment_grants (
+  sha256 CHAR(64) NOT NULL REFERENCES attachment_blobs(sha256) ON DELETE CASCADE,
+  user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  file_name VARCHAR(255),
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (sha256, user_id)
+);
+
+CREATE INDEX idx_attachment_grants_user ON attachment_grants(user_id);
+
+CREATE TABLE attachment_uploads (
+  id VARCHAR(32) PRIMARY KEY,
+  user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  size BIGINT NOT NULL,
+  received BIGINT NOT NULL DEFAULT 0,
+  mime_type VARCHAR(100) NOT NULL,
+  file_name VARCHAR(255),
+  expected_sha256 CHAR(64),
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_attachment_uploads_updated_at ON attachment_uploads(updated_at);
+
+ALTER TABLE messages
+  ADD COLUMN attachment_sha256 CHAR(64),
+  ADD COLUMN attachment_name VARCHAR(255),
+  ADD CONSTRAINT fk_messages_attachment FOREIGN KEY (attachment_sha256) REFERENCES attachment_blobs(sha256);
+
+CREATE INDEX idx_messages_attachment ON messages (attachment_sha256, chat_id) WHERE attachment_sha256 IS NOT NULL;
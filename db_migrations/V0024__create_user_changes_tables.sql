@@ -0,0 +1,176 @@
+CREATE TABLE user_change_heads (
+  user_id INTEGER PRIMARY KEY,
+  last_seq BIGINT NOT NULL DEFAULT 0,
+  snapshot_seq BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE user_changes (
+  user_id INTEGER NOT NULL,
+  kind VARCHAR(10) NOT NULL,
+  entity_id INTEGER NOT NULL,
+  chat_id INTEGER,
+  message_id INTEGER,
+  removed BOOLEAN NOT NULL DEFAULT false,
+  seq BIGINT NOT NULL,
+  changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (user_id, kind, entity_id)
+);
+
+CREATE UNIQUE INDEX idx_user_changes_seq ON user_changes (user_id, seq);
+CREATE INDEX idx_user_changes_changed_at ON user_changes (changed_at);
+
+CREATE OR REPLACE FUNCTION record_user_changes(
+  p_kind TEXT,
+  p_user_ids INTEGER[],
+  p_entity_ids INTEGER[],
+  p_chat_ids INTEGER[],
+  p_message_ids INTEGER[],
+  p_removed BOOLEAN
+) RETURNS INTEGER AS $$
+DECLARE
+  recorded INTEGER;
+BEGIN
+  IF p_user_ids IS NULL OR cardinality(p_user_ids) = 0 THEN
+    RETURN 0;
+  END IF;
+
+  INSERT INTO user_change_heads (user_id)
+  SELECT DISTINCT user_id FROM unnest(p_user_ids) AS user_id ORDER BY user_id
+  ON CONFLICT (user_id) DO NOTHING;
+
+  WITH entries AS (
+    SELECT DISTINCT ON (user_id, entity_id) user_id, entity_id, chat_id, message_id
+    FROM unnest(p_user_ids, p_entity_ids, p_chat_ids, p_message_ids) AS e(user_id, entity_id, chat_id, message_id)
+    ORDER BY user_id, entity_id, message_id DESC NULLS LAST
+  ),
+  locked AS (
+    SELECT h.user_id, h.last_seq
+    FROM user_change_heads h
+    WHERE h.user_id IN (SELECT user_id FROM entries)
+    ORDER BY h.user_id
+    FOR UPDATE
+  ),
+  numbered AS (
+    SELECT e.user_id, e.entity_id, e.chat_id, e.message_id,
+           l.last_seq + row_number() OVER (PARTITION BY e.user_id ORDER BY e.entity_id) AS seq
+    FROM entries e
+    JOIN locked l ON l.user_id = e.user_id
+  ),
+  bumped AS (
+    UPDATE user_change_heads h
+    SET last_seq = n.seq
+    FROM (SELECT user_id, max(seq) AS seq FROM numbered GROUP BY user_id) n
+    WHERE h.user_id = n.user_id
+  )
+  INSERT INTO user_changes (user_id, kind, entity_id, chat_id, message_id, removed, seq)
+  SELECT user_id, p_kind, entity_id, chat_id, message_id, p_removed, seq FROM numbered
+  ON CONFLICT (user_id, kind, entity_id) DO UPDATE
+  SET chat_id = EXCLUDED.chat_id,
+      message_id = CASE WHEN EXCLUDED.removed THEN user_changes.message_id
+                        ELSE GREATEST(user_changes.message_id, EXCLUDED.message_id) END,
+      removed = EXCLUDED.removed,
+      seq = EXCLUDED.seq,
+      changed_at = CURRENT_TIMESTAMP;
+
+  GET DIAGNOSTICS recorded = ROW_COUNT;
+  RETURN recorded;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION record_membership_changes() RETURNS trigger AS $$
+BEGIN
+  PERFORM record_user_changes(
+    'chat',
+    array_agg(m.user_id),
+    array_agg(m.chat_id),
+    array_agg(m.chat_id),
+    array_agg(c.last_message_id),
+    TG_OP = 'DELETE'
+  )
+  FROM changed_members m
+  LEFT JOIN chats c ON c.id = m.chat_id
+  WHERE m.user_id IS NOT NULL AND m.chat_id IS NOT NULL;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_chat_members_insert_changes
+  AFTER INSERT ON chat_members
+  REFERENCING NEW TABLE AS changed_members
+  FOR EACH STATEMENT EXECUTE FUNCTION record_membership_changes();
+
+CREATE TRIGGER trg_chat_members_delete_changes
+  AFTER DELETE ON chat_members
+  REFERENCING OLD TABLE AS changed_members
+  FOR EACH STATEMENT EXECUTE FUNCTION record_membership_changes();
+
+CREATE OR REPLACE FUNCTION record_contact_changes() RETURNS trigger AS $$
+BEGIN
+  PERFORM record_user_changes(
+    'contact',
+    array_agg(user_id),
+    array_agg(contact_user_id),
+    NULL,
+    NULL,
+    TG_OP = 'DELETE'
+  )
+  FROM changed_contacts;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_contacts_insert_changes
+  AFTER INSERT ON contacts
+  REFERENCING NEW TABLE AS changed_contacts
+  FOR EACH STATEMENT EXECUTE FUNCTION record_contact_changes();
+
+CREATE TRIGGER trg_contacts_delete_changes
+  AFTER DELETE ON contacts
+  REFERENCING OLD TABLE AS changed_contacts
+  FOR EACH STATEMENT EXECUTE FUNCTION record_contact_changes();
+
+CREATE OR REPLACE FUNCTION record_contact_profile_changes() RETURNS trigger AS $$
+BEGIN
+  PERFORM record_user_changes(
+    'contact',
+    array_agg(user_id),
+    array_agg(contact_user_id),
+    NULL,
+    NULL,
+    false
+  )
+  FROM contacts
+  WHERE contact_user_id = NEW.id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_users_profile_changes
+  AFTER UPDATE OF username, avatar_url, bio ON users
+  FOR EACH ROW
+  WHEN (OLD.username IS DISTINCT FROM NEW.username
+     OR OLD.avatar_url IS DISTINCT FROM NEW.avatar_url
+     OR OLD.bio IS DISTINCT FROM NEW.bio)
+  EXECUTE FUNCTION record_contact_profile_changes();
+
+CREATE OR REPLACE FUNCTION record_message_edit_changes() RETURNS trigger AS $$
+BEGIN
+  PERFORM record_user_changes(
+    'edit',
+    array_agg(user_id),
+    array_fill(NEW.id, ARRAY[count(*)::INTEGER]),
+    array_fill(NEW.chat_id, ARRAY[count(*)::INTEGER]),
+    array_fill(NEW.id, ARRAY[count(*)::INTEGER]),
+    false
+  )
+  FROM chat_members
+  WHERE chat_id = NEW.chat_id;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_messages_edit_changes
+  AFTER UPDATE OF edited_at ON messages
+  FOR EACH ROW
+  WHEN (NEW.edited_at IS DISTINCT FROM OLD.edited_at)
+  EXECUTE FUNCTION record_message_edit_changes();
@@ -0,0 +1,19 @@
+CREATE TABLE contact_suggestions (
+  user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  candidate_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  mutual_count INTEGER NOT NULL,
+  refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (user_id, candidate_id)
+);
+
+CREATE INDEX idx_contact_suggestions_rank ON contact_suggestions (user_id, mutual_count DESC, candidate_id);
+CREATE INDEX idx_contact_suggestions_candidate ON contact_suggestions (candidate_id);
+
+CREATE TABLE contact_suggestion_progress (
+  id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+  last_user_id INTEGER NOT NULL DEFAULT 0,
+  passes INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO contact_suggestion_progress DEFAULT VALUES;
@@ -0,0 +1,48 @@
+CREATE OR REPLACE FUNCTION ensure_messages_partition(month DATE) RETURNS TEXT AS $$
+DECLARE
+  start_at DATE := date_trunc('month', month)::DATE;
+  end_at DATE := (date_trunc('month', month) + INTERVAL '1 month')::DATE;
+  partition_name TEXT := 'messages_p' || to_char(start_at, 'YYYYMM');
+  columns TEXT;
+BEGIN
+  IF to_regclass(partition_name) IS NOT NULL THEN
+    RETURN partition_name;
+  END IF;
+
+  LOCK TABLE messages_default IN EXCLUSIVE MODE;
+
+  IF NOT EXISTS (SELECT 1 FROM messages_default WHERE created_at >= start_at AND created_at < end_at) THEN
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+      partition_name, start_at, end_at
+    );
+    RETURN partition_name;
+  END IF;
+
+  SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO columns
+  FROM pg_attribute
+  WHERE attrelid = 'messages'::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+
+  EXECUTE format(
+    'CREATE TABLE %I (LIKE messages INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS)',
+    partition_name
+  );
+  EXECUTE format(
+    'WITH moved AS (DELETE FROM messages_default WHERE created_at >= %L AND created_at < %L RETURNING %s) '
+    'INSERT INTO %I (%s) SELECT %s FROM moved',
+    start_at, end_at, columns, partition_name, columns, columns
+  );
+  EXECUTE format(
+    'ALTER TABLE messages ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+    partition_name, start_at, end_at
+  );
+  RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_messages_partition(month::DATE)
+FROM generate_series(
+  date_trunc('month', LEAST(COALESCE((SELECT MIN(created_at) FROM messages_default), CURRENT_TIMESTAMP), CURRENT_TIMESTAMP)),
+  date_trunc('month', GREATEST(COALESCE((SELECT MAX(created_at) FROM messages_default), CURRENT_TIMESTAMP), CURRENT_TIMESTAMP) + INTERVAL '12 months'),
+  INTERVAL '1 month'
+) AS month;
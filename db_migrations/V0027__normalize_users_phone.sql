@@ -0,0 +1,18 @@
+WITH normalized AS (
+  SELECT id,
+         CASE
+           WHEN regexp_replace(phone, '\D', '', 'g') ~ '^8[0-9]{10}$'
+             THEN '+7' || substr(regexp_replace(phone, '\D', '', 'g'), 2)
+           ELSE '+' || regexp_replace(phone, '\D', '', 'g')
+         END AS phone
+  FROM users
+  WHERE phone ~ '[0-9]' AND length(regexp_replace(phone, '\D', '', 'g')) < 20
+),
+unambiguous AS (
+  SELECT phone FROM normalized GROUP BY phone HAVING count(*) = 1
+)
+UPDATE users u
+SET phone = n.phone
+FROM normalized n
+JOIN unambiguous a ON a.phone = n.phone
+WHERE u.id = n.id AND u.phone <> n.phone;
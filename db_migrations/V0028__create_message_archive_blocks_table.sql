@@ -0,0 +1,17 @@
+CREATE TABLE message_archive_blocks (
+  id BIGSERIAL PRIMARY KEY,
+  month CHAR(6) NOT NULL,
+  chat_id INTEGER,
+  newest_at TIMESTAMP NOT NULL,
+  newest_id INTEGER NOT NULL,
+  oldest_at TIMESTAMP NOT NULL,
+  oldest_id INTEGER NOT NULL,
+  min_id INTEGER NOT NULL,
+  max_id INTEGER NOT NULL,
+  message_count INTEGER NOT NULL,
+  data BYTEA NOT NULL
+);
+
+ALTER TABLE message_archive_blocks ALTER COLUMN data SET STORAGE EXTERNAL;
+
+CREATE INDEX idx_message_archive_blocks_chat ON message_archive_blocks (chat_id, oldest_at DESC, oldest_id DESC);
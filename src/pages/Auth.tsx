@@ -140,7 +140,7 @@ const Auth = ({ onSuccess }: AuthProps) => {
           title: 'Успешно!',
           description: `Добро пожаловать, ${data.user.username}! Ваш ID: ${data.user.unique_id}`
         });
-        onSuccess(data.user);
+        onSuccess({ ...data.user, token: data.token });
       } else {
         toast({
           title: 'Ошибка регистрации',
@@ -203,7 +203,7 @@ const Auth = ({ onSuccess }: AuthProps) => {
           title: 'Успешно!',
           description: `С возвращением, ${data.user.username}!`
         });
-        onSuccess(data.user);
+        onSuccess({ ...data.user, token: data.token });
       } else {
         toast({
           title: 'Ошибка входа',
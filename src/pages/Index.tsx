@@ -95,10 +95,10 @@ const Index = ({ user, onLogout }: IndexProps) => {
       const response = await fetch(`${USERS_API_URL}?action=add_contact`, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          'X-Auth-Token': user.token
         },
         body: JSON.stringify({
-          user_id: user.id,
           contact_user_id: contactUserId
         })
       });